@@ -1,8 +1,19 @@
+from app.api.http_caching import conditional_json_response, redirect_cache_control
+from app.api.lean_redirect import lean_redirect
+from app.config import (
+    BULK_SHORTEN_MAX_RECORDS, CLICK_TOP_SIZE, LIST_URLS_MAX_AGE_SECONDS, LIST_URLS_MAX_PAGE_SIZE,
+    LIST_URLS_STREAM_PAGE_SIZE, REDIRECT_STATUS_CODE
+)
 from app.models.pydantic_models import PostURL
-from app.service.database import add_custom_url_to_db, add_random_url_to_db, get_all_urls, get_one_url
-from fastapi import APIRouter, Path, Body
+from app.service.analytics import click_aggregator, get_click_stats_async, get_top_urls_async
+from app.service.async_database import (
+    add_custom_url_to_db_async, add_random_url_to_db_async, add_urls_to_db_async, get_all_urls_async, get_one_url_async,
+    get_url_page_async, iter_url_pages_async
+)
+from fastapi import APIRouter, Path, Body, Header, Query
+from json import dumps
 from typing import Annotated
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, StreamingResponse
 
 
 # Temporary return messages
@@ -16,11 +27,13 @@ router = APIRouter(prefix="/api", tags=["url_actions"])
 async def shorten_url(record: Annotated[PostURL, Body(title="Pydantic Model for URL")]):
     if record.custom_url:
         # Custom url provided, attempt to add custom url to DB
-        response = add_custom_url_to_db(custom_url=record.custom_url, original_url=record.original_url)
+        response = await add_custom_url_to_db_async(
+            custom_url=record.custom_url, original_url=record.original_url, expires_at=record.expires_at
+        )
 
     else:
         # No custom url provided, attempt to add randomly generated short url to DB
-        response = add_random_url_to_db(original_url=record.original_url)
+        response = await add_random_url_to_db_async(original_url=record.original_url, expires_at=record.expires_at)
 
     if response["status_code"] == 200:
         response["message"] = SUCCESS_MESSAGE
@@ -30,9 +43,15 @@ async def shorten_url(record: Annotated[PostURL, Body(title="Pydantic Model for
     return response
 
 
-@router.get("/list_urls")
-async def list_urls():
-    response = get_all_urls()
+@router.post("/shorten_urls")
+async def shorten_urls(records: Annotated[list[PostURL], Body(title="List of Pydantic Models for URL")]):
+    if len(records) > BULK_SHORTEN_MAX_RECORDS:
+        # Too many records for one request, client should split the batch
+        response = {"short_url": None, "status_code": 413, "payload": f"Maximum {BULK_SHORTEN_MAX_RECORDS} records"}
+
+    else:
+        # Attempt to add all urls to DB in batches, custom urls are kept and the rest get random urls
+        response = await add_urls_to_db_async(records=[record.model_dump() for record in records])
 
     if response["status_code"] == 200:
         response["message"] = SUCCESS_MESSAGE
@@ -42,22 +61,119 @@ async def list_urls():
     return response
 
 
+async def stream_urls_ndjson():
+    """
+    Yields every url in the DB as one JSON object per line, reading the table page by page.
+    If a page fails mid-stream, a final line with the error response is sent instead, as headers are already out.
+    """
+    async for response in iter_url_pages_async(page_size=LIST_URLS_STREAM_PAGE_SIZE):
+        if response["status_code"] != 200:
+            response["message"] = ERROR_MESSAGE + f" Error code: {response['status_code']} - {response['payload']}"
+            yield dumps(response) + "\n"
+            return
+
+        for url in response["payload"]:
+            yield dumps(url) + "\n"
+
+
+@router.get("/list_urls")
+async def list_urls(
+        limit: Annotated[int | None, Query(title="Page size", ge=1, le=LIST_URLS_MAX_PAGE_SIZE)] = None,
+        cursor: Annotated[str | None, Query(title="Cursor returned with the previous page")] = None,
+        stream: Annotated[bool, Query(title="Stream all urls as NDJSON")] = False,
+        if_none_match: Annotated[str | None, Header(title="ETag of a copy the client already has")] = None
+):
+    if stream:
+        # Stream whole table, memory use stays constant regardless of table size
+        return StreamingResponse(stream_urls_ndjson(), media_type="application/x-ndjson")
+
+    if limit or cursor:
+        # Paginated request, return a single page and the cursor for the next one
+        response = await get_url_page_async(limit=limit or LIST_URLS_MAX_PAGE_SIZE, cursor=cursor)
+
+    else:
+        # No pagination requested, return all urls
+        response = await get_all_urls_async()
+
+    if response["status_code"] == 200:
+        response["message"] = SUCCESS_MESSAGE
+    else:
+        response["message"] = ERROR_MESSAGE + f" Error code: {response['status_code']} - {response['payload']}"
+        return response
+
+    # Tagged by content, a client or CDN holding the same page gets an empty 304 instead
+    return conditional_json_response(response, if_none_match, max_age=LIST_URLS_MAX_AGE_SECONDS)
+
+
 @router.get("/redirect/{short_url}")
-async def redirect(short_url: Annotated[str, Path(title="Short URL")] = None):
+async def redirect(short_url: Annotated[str, Path(title="Short URL")]):
     if not short_url:
         return {"status_code": 400, "payload": "Bad Input"}
 
     # Check DB for short_url key
-    response = get_one_url(short_url)
+    response = await get_one_url_async(short_url)
 
     if response["status_code"] == 200:
         response["message"] = SUCCESS_MESSAGE
         url_item = response["payload"]
         if url_item and type(url_item) != str:
             url_to_go_to = url_item.original_url
-            return RedirectResponse(url=url_to_go_to, status_code=303)
+
+            # Count click in memory, written to DB in the background
+            click_aggregator.record(short_url)
+
+            expires_at = url_item.expires_at.timestamp() if url_item.expires_at else None
+            cache_control = redirect_cache_control(expires_at)
+
+            return RedirectResponse(
+                url=url_to_go_to,
+                status_code=REDIRECT_STATUS_CODE,
+                headers={"Cache-Control": cache_control} if cache_control is not None else None
+            )
 
     else:
         response["message"] = ERROR_MESSAGE + f" Error code: {response['status_code']} - {response['payload']}"
 
     return response
+
+
+# Declared before /stats/{short_url}, which would otherwise take "top" for a short url
+@router.get("/stats/top")
+async def top_urls(
+        resolution: Annotated[str, Query(title="Bucket length", pattern="^(hour|day)$")] = "hour",
+        start: Annotated[int | None, Query(title="Any time in the bucket, in seconds since the epoch")] = None,
+        limit: Annotated[int, Query(title="Number of short urls", ge=1, le=CLICK_TOP_SIZE)] = 10
+):
+    # Most clicked short urls of one precomputed bucket, the latest complete one by default
+    response = await get_top_urls_async(resolution=resolution, start=start, limit=limit)
+
+    if response["status_code"] == 200:
+        response["message"] = SUCCESS_MESSAGE
+    else:
+        response["message"] = ERROR_MESSAGE + f" Error code: {response['status_code']} - {response['payload']}"
+
+    return response
+
+
+@router.get("/stats/{short_url}")
+async def click_stats(
+        short_url: Annotated[str, Path(title="Short URL")],
+        resolution: Annotated[str, Query(title="Bucket length", pattern="^(minute|hour|day)$")] = "hour",
+        start: Annotated[int | None, Query(title="Range start, in seconds since the epoch")] = None,
+        end: Annotated[int | None, Query(title="Range end (exclusive), in seconds since the epoch")] = None
+):
+    # Clicks per bucket from precomputed rollups, never reads raw clicks or scans
+    response = await get_click_stats_async(short_url=short_url, resolution=resolution, start=start, end=end)
+
+    if response["status_code"] == 200:
+        response["message"] = SUCCESS_MESSAGE
+    else:
+        response["message"] = ERROR_MESSAGE + f" Error code: {response['status_code']} - {response['payload']}"
+
+    return response
+
+
+# Lean redirect for redirect heavy traffic, a plain ASGI route without FastAPI request validation
+# Plain routes do not get the router prefix added, so it is part of the path
+router.add_route(router.prefix + "/r/{short_url}", lean_redirect, methods=["GET", "HEAD"], include_in_schema=False)
+lean_redirect.route = router.routes[-1]
@@ -0,0 +1,70 @@
+from app.config import REDIRECT_MAX_AGE_SECONDS, REDIRECT_STATUS_CODE
+from fastapi.responses import JSONResponse, Response
+from hashlib import blake2b
+from time import time
+
+# Redirect status codes clients can be sent
+REDIRECT_STATUS_CODES = (301, 302, 303, 307, 308)
+# Redirects browsers cache without a time limit when sent without Cache-Control
+PERMANENT_REDIRECT_STATUS_CODES = (301, 308)
+
+if REDIRECT_STATUS_CODE not in REDIRECT_STATUS_CODES:
+    raise ValueError(f"Unsupported redirect status code: {REDIRECT_STATUS_CODE}")
+
+
+def redirect_cache_control(expires_at, now=None, max_age=REDIRECT_MAX_AGE_SECONDS, status_code=REDIRECT_STATUS_CODE):
+    """
+    Function returns the Cache-Control value of a redirect to a link expiring at expires_at (None for never),
+    or None if no header is needed. Caches never keep a redirect past the expiry of its link.
+    Browsers cache permanent redirects without a time limit unless told otherwise, so those, like redirects to
+    expiring links, always get an explicit max-age or no-store.
+    """
+    if expires_at is not None:
+        max_age = min(max_age, int(expires_at - (time() if now is None else now)))
+
+    if max_age > 0:
+        return f"public, max-age={max_age}"
+
+    if status_code in PERMANENT_REDIRECT_STATUS_CODES or expires_at is not None:
+        return "no-store"
+
+    # Temporary redirects to links that never expire are not cached without a header
+    return None
+
+
+def entity_tag(body):
+    """
+    Function returns a strong ETag of a response body.
+    """
+    return '"' + blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Function returns whether an If-None-Match header value matches etag, using the weak comparison it calls for.
+    """
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    opaque_tag = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque_tag for tag in if_none_match.split(","))
+
+
+def conditional_json_response(content, if_none_match, max_age):
+    """
+    Function returns content as a JSON response tagged with the ETag of its body, or an empty 304 response if the
+    client sent that ETag in If-None-Match. Without max_age clients must revalidate before every reuse.
+    """
+    response = JSONResponse(content)
+    etag = entity_tag(response.body)
+    headers = {"ETag": etag, "Cache-Control": f"max-age={max_age}" if max_age > 0 else "no-cache"}
+
+    if etag_matches(if_none_match, etag):
+        # Not Modified, client already has this body
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return response
@@ -0,0 +1,89 @@
+from app.api.http_caching import redirect_cache_control
+from app.config import REDIRECT_CACHE_MAX_SIZE, REDIRECT_STATUS_CODE
+from app.service.analytics import click_aggregator
+from app.service.async_database import ServerBusy, find_redirect_target_async
+from app.service.storage import is_expired
+from fastapi.responses import JSONResponse
+from functools import lru_cache
+from pynamodb.exceptions import PynamoDBConnectionError
+from urllib.parse import quote
+
+# Error responses are built once and sent as is, bodies match the envelope of the other endpoints
+NOT_FOUND_RESPONSE = JSONResponse(
+    {"short_url": None, "status_code": 404, "payload": "DoesNotExist"}, status_code=404
+)
+DB_ERROR_RESPONSE = JSONResponse(
+    {"short_url": None, "status_code": 500, "payload": "DBConnectionError"}, status_code=500
+)
+GONE_RESPONSE = JSONResponse(
+    {"short_url": None, "status_code": 410, "payload": "Expired"}, status_code=410
+)
+SERVER_BUSY_RESPONSE = JSONResponse(
+    {"short_url": None, "status_code": 503, "payload": "ServerBusy"}, status_code=503
+)
+
+EMPTY_BODY = {"type": "http.response.body", "body": b""}
+CONTENT_LENGTH_ZERO = (b"content-length", b"0")
+
+
+@lru_cache(maxsize=REDIRECT_CACHE_MAX_SIZE)
+def location_header(original_url):
+    """
+    Function returns the encoded Location header value for original_url, quoted the same way as RedirectResponse.
+    Cached, so hot urls are only encoded once.
+    """
+    return quote(original_url, safe=":/%#?=@[]!$&'()*+,;").encode("latin-1")
+
+
+class LeanRedirect:
+    """
+    Plain ASGI endpoint for GET and HEAD /api/r/{short_url}, a lighter twin of /api/redirect/{short_url}.
+    Skips request parsing, parameter validation, response dicts and model instances. Cache hits never leave the
+    event loop and only the OriginalUrl and ExpiresAt attributes are read from the DB. Unlike /api/redirect,
+    failures are sent with their real HTTP status code.
+    """
+
+    # Route this endpoint is registered with, set by the router
+    route = None
+
+    async def __call__(self, scope, receive, send):
+        # Plain ASGI routes leave scope["route"] unset, MetricsMiddleware labels requests with its path
+        scope["route"] = self.route
+
+        short_url = scope["path_params"]["short_url"]
+
+        try:
+            target = await find_redirect_target_async(short_url)
+
+        except ServerBusy:
+            await SERVER_BUSY_RESPONSE(scope, receive, send)
+            return
+
+        except PynamoDBConnectionError:
+            await DB_ERROR_RESPONSE(scope, receive, send)
+            return
+
+        if target is None:
+            await NOT_FOUND_RESPONSE(scope, receive, send)
+            return
+
+        original_url, expires_at = target
+
+        if is_expired(expires_at):
+            await GONE_RESPONSE(scope, receive, send)
+            return
+
+        # Count click in memory, written to DB in the background
+        click_aggregator.record(short_url)
+
+        headers = [(b"location", location_header(original_url)), CONTENT_LENGTH_ZERO]
+
+        cache_control = redirect_cache_control(expires_at)
+        if cache_control is not None:
+            headers.append((b"cache-control", cache_control.encode()))
+
+        await send({"type": "http.response.start", "status": REDIRECT_STATUS_CODE, "headers": headers})
+        await send(EMPTY_BODY)
+
+
+lean_redirect = LeanRedirect()
@@ -0,0 +1,294 @@
+import zlib
+from app.config import COMPRESSION_ENCODINGS, COMPRESSION_MINIMUM_SIZE, RATE_LIMIT_TRUST_FORWARDED_FOR
+from app.service.metrics import http_request_duration
+from app.service.ratelimit import rate_limiter
+from math import ceil
+from time import perf_counter
+
+# Route groups sharing a rate limit, by method and path (exact, or a prefix ending in "/")
+ROUTE_GROUPS = (
+    ("POST", "/api/shorten_url", "shorten"),
+    ("POST", "/api/shorten_urls", "shorten"),
+    ("GET", "/api/list_urls", "list"),
+    ("GET", "/api/redirect/", "redirect"),
+    ("GET", "/api/r/", "redirect"),
+    ("HEAD", "/api/r/", "redirect")
+)
+
+# Bodies of rejected requests, match the envelope of the other endpoints
+TOO_MANY_REQUESTS_BODY = b'{"short_url":null,"status_code":429,"payload":"TooManyRequests"}'
+SERVER_BUSY_BODY = b'{"short_url":null,"status_code":503,"payload":"ServerBusy"}'
+
+# Content types worth compressing, anything else is sent as is
+COMPRESSIBLE_CONTENT_TYPES = (b"application/json", b"application/x-ndjson", b"text/")
+# Compression effort, both favour speed as responses are compressed on the event loop
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the latency of every HTTP request in http_request_duration.
+    Requests are labelled with their route template (e.g. /api/redirect/{short_url}), not the raw path,
+    so the number of series stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+        # endpoint --> route template, filled on first use once all routes are registered
+        self._route_paths = None
+
+    def _route_path(self, scope):
+        route = scope.get("route")
+        if route is not None:
+            return route.path
+
+        if self._route_paths is None:
+            self._route_paths = {
+                route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")
+            }
+
+        return self._route_paths.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+
+        finally:
+            http_request_duration.observe(
+                perf_counter() - start, self._route_path(scope), scope["method"], str(status[0])
+            )
+
+
+def route_group(method, path):
+    """
+    Function returns the rate limited route group of a request, or None if the route is not limited.
+    """
+    for group_method, group_path, group in ROUTE_GROUPS:
+        if method != group_method:
+            continue
+
+        if path == group_path or (group_path.endswith("/") and path.startswith(group_path)):
+            return group
+
+    return None
+
+
+def client_address(scope):
+    """
+    Function returns the address of the client sending the request, used to tell rate limit buckets apart.
+    """
+    if RATE_LIMIT_TRUST_FORWARDED_FOR:
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+async def send_rejection(send, status, body, retry_after):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, ceil(retry_after))).encode())
+        ]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware applying the limits of rate_limiter to the route groups in ROUTE_GROUPS.
+    Requests over a limit are answered before any parsing or DB work, so abusive clients cost next to nothing:
+    429 when the client used up its token bucket, 503 when the group is at its concurrency limit in this worker.
+    Both carry a Retry-After header.
+    """
+
+    def __init__(self, app, limiter=rate_limiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        group = route_group(scope["method"], scope["path"])
+
+        if group is None:
+            await self.app(scope, receive, send)
+            return
+
+        retry_after = await self.limiter.take(client_address(scope), group)
+
+        if retry_after:
+            await send_rejection(send, 429, TOO_MANY_REQUESTS_BODY, retry_after)
+            return
+
+        concurrency_limit = self.limiter.try_start(group)
+
+        if concurrency_limit is False:
+            await send_rejection(send, 503, SERVER_BUSY_BODY, 1)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+
+        finally:
+            if concurrency_limit is not None:
+                concurrency_limit.release()
+
+
+def accepted_encoding(accept_encoding, encodings):
+    """
+    Function returns the first of encodings an Accept-Encoding header value allows (q > 0), None if there is none.
+    """
+    qualities = {}
+
+    for part in accept_encoding.split(","):
+        name, _, parameters = part.partition(";")
+        quality = 1.0
+        parameters = parameters.strip()
+
+        if parameters.startswith("q="):
+            try:
+                quality = float(parameters[2:])
+            except ValueError:
+                quality = 0.0
+
+        qualities[name.strip().lower()] = quality
+
+    for encoding in encodings:
+        if qualities.get(encoding, qualities.get("*", 0.0)) > 0:
+            return encoding
+
+    return None
+
+
+def _load_brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+
+    return brotli
+
+
+class _Compressor:
+    """
+    Incremental gzip or brotli compressor of one response body.
+    """
+
+    def __init__(self, encoding, brotli):
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._compress, self._flush, self._finish = compressor.process, compressor.flush, compressor.finish
+        else:
+            compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._compress = compressor.compress
+            self._flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = compressor.flush
+
+    def compress(self, data, more_data):
+        # Chunks of a stream are flushed, so each one reaches the client without waiting for the next
+        return self._compress(data) + (self._flush() if more_data else self._finish())
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing JSON and text responses with brotli (if the brotli package is installed) or gzip,
+    whichever the client accepts first in the configured order. Complete bodies below minimum_size are sent as is,
+    streamed bodies are compressed chunk by chunk. ETags of compressed responses are made weak, as the bytes differ.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESSION_MINIMUM_SIZE, encodings=COMPRESSION_ENCODINGS):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.brotli = _load_brotli()
+        self.encodings = tuple(
+            encoding for encoding in encodings if encoding == "gzip" or (encoding == "br" and self.brotli is not None)
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = next((value for name, value in scope["headers"] if name == b"accept-encoding"), b"")
+        encoding = accepted_encoding(accept_encoding.decode("latin-1"), self.encodings) if accept_encoding else None
+
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        # Start message is held back until the first body chunk shows whether compressing is worth it
+        start_message = None
+        compressor = None
+
+        async def compressing_send(message):
+            nonlocal start_message, compressor
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or (start_message is None and compressor is None):
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is not None:
+                await send({
+                    "type": "http.response.body", "body": compressor.compress(body, more_body), "more_body": more_body
+                })
+                return
+
+            start, start_message = start_message, None
+            headers = start.get("headers", [])
+            content_type = next((value for name, value in headers if name == b"content-type"), b"")
+
+            if (
+                not content_type.startswith(COMPRESSIBLE_CONTENT_TYPES)
+                or any(name == b"content-encoding" for name, _ in headers)
+                or (not more_body and len(body) < max(1, self.minimum_size))
+            ):
+                await send(start)
+                await send(message)
+                return
+
+            compressor = _Compressor(encoding, self.brotli)
+            data = compressor.compress(body, more_body)
+
+            vary = b", ".join([value for name, value in headers if name == b"vary"] + [b"Accept-Encoding"])
+            headers = [
+                (name, b"W/" + value if name == b"etag" and not value.startswith(b"W/") else value)
+                for name, value in headers if name not in (b"content-length", b"vary")
+            ]
+            headers.append((b"content-encoding", encoding.encode()))
+            headers.append((b"vary", vary))
+            if not more_body:
+                headers.append((b"content-length", str(len(data)).encode()))
+
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, compressing_send)
@@ -0,0 +1,103 @@
+"""
+Microbenchmark of decoding DynamoDB URL table items, no DB needed.
+
+Decodes the same raw GetItem/Scan items (attribute name --> {type: value}) both as Thread model instances, the way
+Thread.get and Thread.scan do, and as the projected UrlRecords read by the DynamoDB backend, then prints the CPU time
+per item of each as JSON. Every item is also turned into a listing entry, like list_urls does.
+
+    python -m app.benchmarks.decode_items --items 10000 --repeat 5
+"""
+import argparse
+import json
+import sys
+from time import process_time
+
+from app.models.pynamo_models import Thread
+from app.service.storage_dynamodb import URL_RECORD_ATTRIBUTES, url_record
+
+DECODERS = {
+    "model": Thread.from_raw_data,
+    "record": url_record
+}
+
+
+def raw_items(count, expiring_fraction=0.5):
+    """
+    Function returns count raw items as DynamoDB sends them, with a hash and an expiry on a share of them.
+    """
+    items = []
+
+    for index in range(count):
+        item = {
+            "ShortUrl": {"S": f"bench{index:07}"},
+            "OriginalUrl": {"S": f"https://www.example.com/articles/{index}?utm_source=benchmark&page={index % 50}"},
+            "OriginalUrlHash": {"S": f"{index:064x}"}
+        }
+
+        if index < count * expiring_fraction:
+            item["ExpiresAt"] = {"N": str(1900000000 + index)}
+
+        items.append(item)
+
+    return items
+
+
+def project(items, attributes):
+    """
+    Function returns the items with only the given attributes, as DynamoDB returns them for a ProjectionExpression.
+    """
+    return [{name: value for name, value in item.items() if name in attributes} for item in items]
+
+
+def decode_seconds(decoder, items, repeat):
+    """
+    Function returns the least CPU seconds out of repeat runs of decoding and listing all items.
+    """
+    best = None
+
+    for _ in range(repeat):
+        entries = []
+        started = process_time()
+
+        for item in items:
+            url_item = decoder(item)
+            expires_at = url_item.expires_at
+            entries.append({
+                "short_url": url_item.short_url,
+                "original_url": url_item.original_url,
+                "expires_at": int(expires_at.timestamp()) if expires_at is not None else None
+            })
+
+        elapsed = process_time() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def run(item_count, repeat):
+    items = raw_items(item_count)
+    inputs = {"model": items, "record": project(items, URL_RECORD_ATTRIBUTES)}
+
+    seconds = {name: decode_seconds(decoder, inputs[name], repeat) for name, decoder in DECODERS.items()}
+
+    return {
+        "config": {"items": item_count, "repeat": repeat},
+        "microseconds_per_item": {name: round(seconds[name] / item_count * 1e6, 3) for name in DECODERS},
+        "speedup": round(seconds["model"] / seconds["record"], 2) if seconds["record"] else None
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=10000, help="Number of items decoded per run")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per decoder, the fastest one is reported")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print(json.dumps(run(args.items, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
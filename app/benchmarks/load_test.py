@@ -0,0 +1,242 @@
+"""
+Load-testing benchmark for the URL shortener API.
+
+Drives POST /api/shorten_url, GET /api/redirect/{short_url} and GET /api/list_urls at a fixed concurrency with
+uniform or Zipfian (hot key) redirect traffic, then prints throughput and latency percentiles as JSON.
+Redirects can go to the lean /api/r/{short_url} route instead with --redirect-route r.
+
+Run against the app in-process (no server, storage backend picked with --backend):
+    python -m app.benchmarks.load_test --backend memory --concurrency 64 --requests 20000 --distribution zipf
+
+Run against a running server (e.g. uvicorn backed by DynamoDB Local):
+    python -m app.benchmarks.load_test --base-url http://localhost:8080 --concurrency 32 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+from itertools import accumulate
+from math import ceil
+from time import perf_counter
+
+import httpx
+
+OPERATIONS = ("shorten", "redirect", "list")
+
+
+def percentile(sorted_values, fraction):
+    """
+    Function returns the nearest-rank percentile of an already sorted list, None for an empty list.
+    """
+    if not sorted_values:
+        return None
+
+    rank = max(1, ceil(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class KeySampler:
+    """
+    Picks indexes into a list of keys, either uniformly or following a Zipf distribution where rank 1 is hottest.
+    """
+
+    def __init__(self, key_count, distribution, zipf_exponent, rng):
+        self.key_count = key_count
+        self.rng = rng
+        self.cum_weights = None
+
+        if distribution == "zipf":
+            # Weight of the key at rank r is 1 / r**s, cumulative weights allow O(log n) sampling
+            self.cum_weights = list(accumulate(1 / rank ** zipf_exponent for rank in range(1, key_count + 1)))
+
+    def sample(self):
+        if self.cum_weights is None:
+            return self.rng.randrange(self.key_count)
+
+        return self.rng.choices(range(self.key_count), cum_weights=self.cum_weights)[0]
+
+
+def parse_mix(mix):
+    """
+    Function turns "redirect=90,shorten=8,list=2" into operation weights.
+    """
+    weights = {}
+
+    for part in mix.split(","):
+        operation, _, weight = part.partition("=")
+        operation = operation.strip()
+
+        if operation not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation in mix: {operation}")
+
+        weights[operation] = float(weight)
+
+    return weights
+
+
+def summarize(latencies, errors, elapsed):
+    """
+    Function returns count, error count, throughput and latency percentiles (in milliseconds) for one operation.
+    """
+    latencies = sorted(latencies)
+    count = len(latencies)
+
+    return {
+        "count": count,
+        "errors": errors,
+        "throughput_rps": round(count / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "mean": round(sum(latencies) / count * 1000, 3) if count else None,
+            "p50": round(percentile(latencies, 0.50) * 1000, 3) if count else None,
+            "p95": round(percentile(latencies, 0.95) * 1000, 3) if count else None,
+            "p99": round(percentile(latencies, 0.99) * 1000, 3) if count else None,
+            "max": round(latencies[-1] * 1000, 3) if count else None
+        }
+    }
+
+
+async def seed_keys(client, key_count, concurrency):
+    """
+    Creates key_count short urls to redirect to, returns their short urls.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def create(index):
+        async with semaphore:
+            response = await client.post("/api/shorten_url", json={"original_url": f"https://example.com/{index}"})
+            return response.json().get("short_url")
+
+    short_urls = await asyncio.gather(*(create(index) for index in range(key_count)))
+    return [short_url for short_url in short_urls if short_url]
+
+
+async def run_load(client, args, short_urls):
+    """
+    Runs the mixed workload with args.concurrency workers, returns per operation latencies, errors and elapsed time.
+    """
+    rng = random.Random(args.seed)
+    sampler = KeySampler(len(short_urls), args.distribution, args.zipf_exponent, rng)
+
+    operations = list(args.mix)
+    operation_weights = [args.mix[operation] for operation in operations]
+
+    latencies = {operation: [] for operation in OPERATIONS}
+    errors = {operation: 0 for operation in OPERATIONS}
+
+    # Workers stop once either the request budget or the time budget is used up
+    remaining = [args.requests]
+    deadline = perf_counter() + args.duration if args.duration else None
+
+    async def worker():
+        while remaining[0] > 0 and (deadline is None or perf_counter() < deadline):
+            remaining[0] -= 1
+            operation = rng.choices(operations, weights=operation_weights)[0]
+
+            start = perf_counter()
+
+            if operation == "redirect":
+                response = await client.get(f"/api/{args.redirect_route}/{short_urls[sampler.sample()]}")
+                ok = response.is_redirect
+            elif operation == "shorten":
+                response = await client.post("/api/shorten_url", json={"original_url": "https://example.com/new"})
+                ok = response.status_code == 200 and response.json().get("status_code") == 200
+            else:
+                response = await client.get("/api/list_urls", params={"limit": args.list_limit})
+                ok = response.status_code == 200 and response.json().get("status_code") == 200
+
+            latencies[operation].append(perf_counter() - start)
+            if not ok:
+                errors[operation] += 1
+
+    start = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = perf_counter() - start
+
+    return latencies, errors, elapsed
+
+
+async def main_async(args):
+    if args.base_url:
+        transport = None
+        base_url = args.base_url
+    else:
+        # Storage backend is picked when the app is imported, so set it first
+        os.environ["STORAGE_BACKEND"] = args.backend
+        from app.main import app
+
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://benchmark"
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url=base_url, limits=limits, timeout=args.timeout, follow_redirects=False
+    ) as client:
+        short_urls = await seed_keys(client, args.keys, args.concurrency)
+
+        if not short_urls:
+            raise SystemExit("Could not create any short urls to benchmark against")
+
+        latencies, errors, elapsed = await run_load(client, args, short_urls)
+
+    all_latencies = [latency for operation in OPERATIONS for latency in latencies[operation]]
+
+    return {
+        "config": {
+            "target": args.base_url or f"in-process ({args.backend})",
+            "concurrency": args.concurrency,
+            "keys": len(short_urls),
+            "distribution": args.distribution,
+            "zipf_exponent": args.zipf_exponent if args.distribution == "zipf" else None,
+            "mix": args.mix,
+            "redirect_route": args.redirect_route,
+            "seed": args.seed
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        "operations": {
+            operation: summarize(latencies[operation], errors[operation], elapsed)
+            for operation in OPERATIONS if latencies[operation]
+        },
+        "total": summarize(all_latencies, sum(errors.values()), elapsed)
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="URL of a running server, benchmarks the app in-process if omitted")
+    parser.add_argument("--backend", default="memory", choices=["memory", "sqlite", "dynamodb"],
+                        help="Storage backend for in-process runs")
+    parser.add_argument("--concurrency", type=int, default=32, help="Number of concurrent clients")
+    parser.add_argument("--requests", type=int, default=10000, help="Total number of requests to send")
+    parser.add_argument("--duration", type=float, default=0, help="Stop after this many seconds, 0 for no limit")
+    parser.add_argument("--keys", type=int, default=1000, help="Number of short urls created before the run")
+    parser.add_argument("--distribution", default="uniform", choices=["uniform", "zipf"],
+                        help="How redirect keys are picked")
+    parser.add_argument("--zipf-exponent", type=float, default=1.1, help="Skew of the zipf distribution")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("redirect=90,shorten=8,list=2"),
+                        help="Operation weights, e.g. redirect=90,shorten=8,list=2")
+    parser.add_argument("--redirect-route", default="redirect", choices=["redirect", "r"],
+                        help="Redirect endpoint, /api/redirect or the lean /api/r")
+    parser.add_argument("--list-limit", type=int, default=100, help="Page size of /api/list_urls requests")
+    parser.add_argument("--timeout", type=float, default=30, help="Per request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed, makes key and operation choices repeatable")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = asyncio.run(main_async(args))
+
+    report_json = json.dumps(report, indent=2)
+    print(report_json)
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(report_json + "\n")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Bulk import and export of short urls, streaming CSV or NDJSON files with the columns short_url, original_url and
+expires_at (ISO 8601, empty for links that never expire). The storage backend is picked from the environment the
+same way as for the app.
+
+Export every unexpired url, reading scan segments in parallel:
+    python -m app.cli export urls.ndjson --segments 8
+
+Import a file in the same layout, rows without short_url get a random one and existing short urls are kept:
+    python -m app.cli import urls.csv --workers 8 --write-capacity-per-second 100 --rejects rejects.ndjson
+
+Both save their progress to FILE.checkpoint while running. Running the same command again after an interruption
+resumes from the checkpoint, which is removed once the job completes.
+"""
+import argparse
+import json
+import sys
+from app.config import (
+    SCAN_READ_CAPACITY_PER_SECOND, SCAN_TOTAL_SEGMENTS, TRANSFER_CHECKPOINT_INTERVAL_SECONDS,
+    TRANSFER_EXPORT_PAGE_SIZE, TRANSFER_IMPORT_CHUNK_SIZE, TRANSFER_IMPORT_WORKERS, TRANSFER_WRITE_CAPACITY_PER_SECOND
+)
+from app.service.transfer import export_urls, import_urls
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for command, help_text in (("import", "Import urls from a file"), ("export", "Export all urls to a file")):
+        command_parser = commands.add_parser(command, help=help_text)
+        command_parser.add_argument("path", help="CSV or NDJSON file")
+        command_parser.add_argument("--format", choices=["csv", "ndjson"],
+                                    help="File format, picked from the file extension if omitted")
+        command_parser.add_argument("--checkpoint", help="Checkpoint file, defaults to PATH.checkpoint")
+        command_parser.add_argument("--checkpoint-interval", type=float, default=TRANSFER_CHECKPOINT_INTERVAL_SECONDS,
+                                    help="Seconds between checkpoints")
+
+        if command == "import":
+            command_parser.add_argument("--workers", type=int, default=TRANSFER_IMPORT_WORKERS,
+                                        help="Number of threads writing chunks")
+            command_parser.add_argument("--chunk-size", type=int, default=TRANSFER_IMPORT_CHUNK_SIZE,
+                                        help="Rows handed to a worker at a time")
+            command_parser.add_argument("--write-capacity-per-second", type=float,
+                                        default=TRANSFER_WRITE_CAPACITY_PER_SECOND,
+                                        help="Write capacity units per second used by all workers, 0 for unlimited")
+            command_parser.add_argument("--rejects", help="NDJSON file receiving rows that were not imported")
+
+        else:
+            command_parser.add_argument("--segments", type=int, default=SCAN_TOTAL_SEGMENTS,
+                                        help="Number of scan segments read in parallel")
+            command_parser.add_argument("--page-size", type=int, default=TRANSFER_EXPORT_PAGE_SIZE,
+                                        help="Items read per scan request")
+            command_parser.add_argument("--read-capacity-per-second", type=float,
+                                        default=SCAN_READ_CAPACITY_PER_SECOND,
+                                        help="Read capacity units per second used by all segments, 0 for unlimited")
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    checkpoint_path = args.checkpoint or args.path + ".checkpoint"
+
+    try:
+        if args.command == "import":
+            counts = import_urls(
+                args.path,
+                file_format=args.format,
+                checkpoint_path=checkpoint_path,
+                rejects_path=args.rejects,
+                workers=args.workers,
+                chunk_size=args.chunk_size,
+                write_capacity_per_second=args.write_capacity_per_second,
+                checkpoint_interval=args.checkpoint_interval
+            )
+
+        else:
+            counts = export_urls(
+                args.path,
+                file_format=args.format,
+                checkpoint_path=checkpoint_path,
+                total_segments=args.segments,
+                page_size=args.page_size,
+                read_capacity_per_second=args.read_capacity_per_second,
+                checkpoint_interval=args.checkpoint_interval
+            )
+
+    except ValueError as error:
+        # Checkpoint of a different job
+        raise SystemExit(str(error))
+
+    print(json.dumps(counts, indent=2))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
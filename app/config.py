@@ -0,0 +1,197 @@
+import os
+
+# Redirect lookup cache, sits in front of get_one_url
+# Maximum number of short urls kept in memory before least recently used entries are evicted
+REDIRECT_CACHE_MAX_SIZE = int(os.environ.get("REDIRECT_CACHE_MAX_SIZE", "10000"))
+# Seconds a found short url stays cached
+REDIRECT_CACHE_TTL_SECONDS = float(os.environ.get("REDIRECT_CACHE_TTL_SECONDS", "300"))
+# Seconds a missing short url (DoesNotExist) stays cached, kept short so new urls show up quickly
+REDIRECT_CACHE_NEGATIVE_TTL_SECONDS = float(os.environ.get("REDIRECT_CACHE_NEGATIVE_TTL_SECONDS", "5"))
+
+# Cache invalidation from the DynamoDB stream of the URL table, changes made by any node or service reach every
+# worker within about a poll interval, so the cache TTLs above can be long. Needs the "dynamodb" storage backend.
+# Every worker reads every shard of the stream once per poll interval
+STREAM_INVALIDATION_ENABLED = os.environ.get("STREAM_INVALIDATION_ENABLED", "false").lower() in ("1", "true", "yes")
+# Seconds between reads of the stream, a random share of up to STREAM_POLL_JITTER is added to each wait
+STREAM_POLL_INTERVAL_SECONDS = float(os.environ.get("STREAM_POLL_INTERVAL_SECONDS", "1"))
+STREAM_POLL_JITTER = float(os.environ.get("STREAM_POLL_JITTER", "0.2"))
+# Workers reading the stream across all hosts together, the WEB_CONCURRENCY of one host when not set
+STREAM_READERS = int(os.environ.get("STREAM_READERS", os.environ.get("WEB_CONCURRENCY", "1")))
+# Reads per second DynamoDB serves per shard to all readers together, workers refuse to start when STREAM_READERS
+# polling every STREAM_POLL_INTERVAL_SECONDS would go over it and get throttled
+STREAM_SHARD_READS_PER_SECOND = float(os.environ.get("STREAM_SHARD_READS_PER_SECOND", "5"))
+# Seconds between looks for new stream shards, shards that close are followed up right away
+STREAM_SHARD_REFRESH_SECONDS = float(os.environ.get("STREAM_SHARD_REFRESH_SECONDS", "60"))
+
+# Thread pool that runs blocking DB calls off the event loop
+# Number of DB calls that can run at the same time in one worker
+DB_EXECUTOR_MAX_WORKERS = int(os.environ.get("DB_EXECUTOR_MAX_WORKERS", "32"))
+# Number of DB calls allowed to wait for a free thread before new calls are turned away
+DB_EXECUTOR_MAX_PENDING = int(os.environ.get("DB_EXECUTOR_MAX_PENDING", "256"))
+# Seconds a DB call waits to be admitted before the request fails with 503
+DB_EXECUTOR_ADMISSION_TIMEOUT_SECONDS = float(os.environ.get("DB_EXECUTOR_ADMISSION_TIMEOUT_SECONDS", "1"))
+
+# Paginated and streamed url listings
+# Largest page a client may request from /api/list_urls
+LIST_URLS_MAX_PAGE_SIZE = int(os.environ.get("LIST_URLS_MAX_PAGE_SIZE", "1000"))
+# Items fetched per DB round trip when streaming /api/list_urls as NDJSON
+LIST_URLS_STREAM_PAGE_SIZE = int(os.environ.get("LIST_URLS_STREAM_PAGE_SIZE", "500"))
+
+# Parallel segmented scans used for full-table operations (listing all urls, resets, exports)
+# Number of DynamoDB scan segments read concurrently
+SCAN_TOTAL_SEGMENTS = int(os.environ.get("SCAN_TOTAL_SEGMENTS", "4"))
+# Read capacity units per second shared by all segments of one scan, 0 means unlimited
+SCAN_READ_CAPACITY_PER_SECOND = float(os.environ.get("SCAN_READ_CAPACITY_PER_SECOND", "0"))
+
+# Bulk url shortening
+# Most records accepted by one /api/shorten_urls request
+BULK_SHORTEN_MAX_RECORDS = int(os.environ.get("BULK_SHORTEN_MAX_RECORDS", "10000"))
+# Records written per DynamoDB transaction, DynamoDB allows at most 100
+BULK_SHORTEN_CHUNK_SIZE = int(os.environ.get("BULK_SHORTEN_CHUNK_SIZE", "25"))
+
+# Short url allocation for urls without a custom url
+# "random" draws base62 codes at random, "counter" hands out codes from leased ranges of a global DB counter
+SHORT_URL_ALLOCATOR = os.environ.get("SHORT_URL_ALLOCATOR", "random")
+# Length of generated short urls
+SHORT_URL_LENGTH = int(os.environ.get("SHORT_URL_LENGTH", "8"))
+# Counter values leased from the DB at a time by the "counter" allocator
+SHORT_URL_COUNTER_LEASE_SIZE = int(os.environ.get("SHORT_URL_COUNTER_LEASE_SIZE", "1000"))
+
+# Bulk import and export of urls with python -m app.cli
+# Threads writing import chunks at the same time
+TRANSFER_IMPORT_WORKERS = int(os.environ.get("TRANSFER_IMPORT_WORKERS", "8"))
+# Records handed to one worker at a time, also the unit of import progress kept in checkpoints
+TRANSFER_IMPORT_CHUNK_SIZE = int(os.environ.get("TRANSFER_IMPORT_CHUNK_SIZE", "500"))
+# Write capacity units per second shared by all import workers, 0 means unlimited
+TRANSFER_WRITE_CAPACITY_PER_SECOND = float(os.environ.get("TRANSFER_WRITE_CAPACITY_PER_SECOND", "0"))
+# Items read per scan request of an export
+TRANSFER_EXPORT_PAGE_SIZE = int(os.environ.get("TRANSFER_EXPORT_PAGE_SIZE", "1000"))
+# Seconds between checkpoints, an interrupted job resumes from its last checkpoint
+TRANSFER_CHECKPOINT_INTERVAL_SECONDS = float(os.environ.get("TRANSFER_CHECKPOINT_INTERVAL_SECONDS", "10"))
+
+# Click analytics, redirects are counted in memory and flushed to the DB in the background
+# Seconds between flushes of aggregated click counts
+CLICK_FLUSH_INTERVAL_SECONDS = float(os.environ.get("CLICK_FLUSH_INTERVAL_SECONDS", "10"))
+# Most (short url, minute) counters held in memory between flushes, clicks on new keys beyond that are dropped
+CLICK_MAX_PENDING_KEYS = int(os.environ.get("CLICK_MAX_PENDING_KEYS", "100000"))
+# Run the compaction job folding minute buckets into hour and day buckets in this worker
+CLICK_ROLLUP_ENABLED = os.environ.get("CLICK_ROLLUP_ENABLED", "true").lower() in ("1", "true", "yes")
+# Seconds between compaction runs
+CLICK_ROLLUP_INTERVAL_SECONDS = float(os.environ.get("CLICK_ROLLUP_INTERVAL_SECONDS", "300"))
+# Seconds after the end of a bucket before it is folded, must cover the flush interval and flush retries
+CLICK_ROLLUP_GRACE_SECONDS = int(os.environ.get("CLICK_ROLLUP_GRACE_SECONDS", "120"))
+# Most clicked short urls kept per hour and day bucket, the largest limit /api/stats/top accepts
+CLICK_TOP_SIZE = int(os.environ.get("CLICK_TOP_SIZE", "100"))
+# Most buckets one /api/stats request may cover
+STATS_MAX_BUCKETS = int(os.environ.get("STATS_MAX_BUCKETS", "1500"))
+
+# HTTP caching and compression, lets browsers and CDNs absorb repeat traffic
+# Status code of redirects: 301 and 308 are permanent and cached by browsers, 302, 303 and 307 are not
+REDIRECT_STATUS_CODE = int(os.environ.get("REDIRECT_STATUS_CODE", "303"))
+# Seconds browsers and CDNs may cache a redirect, capped at the expiry of the link. With 0 only permanent redirects
+# and redirects to expiring links get a Cache-Control header, no-store
+# Redirects served from a cache are not counted as clicks, deleted links keep redirecting there until max-age is up
+REDIRECT_MAX_AGE_SECONDS = int(os.environ.get("REDIRECT_MAX_AGE_SECONDS", "0"))
+# Seconds browsers and CDNs may reuse a /api/list_urls response before revalidating it with its ETag
+LIST_URLS_MAX_AGE_SECONDS = int(os.environ.get("LIST_URLS_MAX_AGE_SECONDS", "0"))
+# Compress responses to clients that accept it
+COMPRESSION_ENABLED = os.environ.get("COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes")
+# Smallest response body in bytes that is compressed, streamed responses are always compressed
+COMPRESSION_MINIMUM_SIZE = int(os.environ.get("COMPRESSION_MINIMUM_SIZE", "1024"))
+# Encodings in order of preference, "br" needs the brotli package and is skipped without it
+COMPRESSION_ENCODINGS = tuple(
+    encoding.strip() for encoding in os.environ.get("COMPRESSION_ENCODINGS", "br,gzip").split(",") if encoding.strip()
+)
+
+# Rate limiting, requests over a limit get an immediate 429 (per client) or 503 (per worker) with Retry-After
+# Token bucket limits per client and route group, off unless enabled
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "false").lower() in ("1", "true", "yes")
+# Tokens added per second (0 disables the limit) and bucket size, i.e. the largest burst a client can send
+RATE_LIMIT_SHORTEN_PER_SECOND = float(os.environ.get("RATE_LIMIT_SHORTEN_PER_SECOND", "1"))
+RATE_LIMIT_SHORTEN_BURST = float(os.environ.get("RATE_LIMIT_SHORTEN_BURST", "10"))
+RATE_LIMIT_LIST_PER_SECOND = float(os.environ.get("RATE_LIMIT_LIST_PER_SECOND", "0.2"))
+RATE_LIMIT_LIST_BURST = float(os.environ.get("RATE_LIMIT_LIST_BURST", "5"))
+RATE_LIMIT_REDIRECT_PER_SECOND = float(os.environ.get("RATE_LIMIT_REDIRECT_PER_SECOND", "0"))
+RATE_LIMIT_REDIRECT_BURST = float(os.environ.get("RATE_LIMIT_REDIRECT_BURST", "100"))
+# Where buckets are kept: "memory" (per worker) or "redis" (shared by all workers, needs the redis package)
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_REDIS_URL = os.environ.get("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+# Most client buckets kept by the "memory" backend, least recently used buckets are dropped first
+RATE_LIMIT_MAX_CLIENTS = int(os.environ.get("RATE_LIMIT_MAX_CLIENTS", "100000"))
+# Identify clients by the first X-Forwarded-For address, only safe behind a proxy that sets the header
+RATE_LIMIT_TRUST_FORWARDED_FOR = (
+    os.environ.get("RATE_LIMIT_TRUST_FORWARDED_FOR", "false").lower() in ("1", "true", "yes")
+)
+# Most /api/list_urls requests one worker serves at a time, 0 means unlimited, only applied with RATE_LIMIT_ENABLED
+LIST_URLS_MAX_CONCURRENCY = int(os.environ.get("LIST_URLS_MAX_CONCURRENCY", "4"))
+
+# Storage backend holding the urls: "dynamodb", "memory" (single process, not persisted) or "sqlite"
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "dynamodb")
+# Database file used by the "sqlite" backend
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "urls.db")
+
+# Metrics exposed on /metrics
+# Seconds between event loop lag measurements
+EVENT_LOOP_LAG_INTERVAL_SECONDS = float(os.environ.get("EVENT_LOOP_LAG_INTERVAL_SECONDS", "0.5"))
+
+# Random shortening of an original url that was shortened before returns the existing short url
+DEDUP_ENABLED = os.environ.get("DEDUP_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# Hot link snapshot, a file holding the most clicked urls that every worker of a host maps into memory
+# Lookups check it after the redirect cache and before the DB, its urls are picked from the hourly top lists
+# Snapshot file, empty disables it, workers of one host must use the same path (e.g. /dev/shm/hot_links.snapshot)
+HOT_LINK_SNAPSHOT_PATH = os.environ.get("HOT_LINK_SNAPSHOT_PATH", "")
+# Seconds between rebuilds, also how long a url deleted or changed by another worker may still be served
+HOT_LINK_SNAPSHOT_INTERVAL_SECONDS = float(os.environ.get("HOT_LINK_SNAPSHOT_INTERVAL_SECONDS", "60"))
+# Seconds between checks for a snapshot published by another worker
+HOT_LINK_SNAPSHOT_CHECK_SECONDS = float(os.environ.get("HOT_LINK_SNAPSHOT_CHECK_SECONDS", "5"))
+# Most urls in the snapshot
+HOT_LINK_SNAPSHOT_SIZE = int(os.environ.get("HOT_LINK_SNAPSHOT_SIZE", "10000"))
+# Seconds of hourly top lists the hottest urls are picked from
+HOT_LINK_SNAPSHOT_WINDOW_SECONDS = int(os.environ.get("HOT_LINK_SNAPSHOT_WINDOW_SECONDS", "86400"))
+
+# Bloom filter over all short urls, lets redirects of never created short urls skip the DB
+# Only safe when this worker sees every write, urls added by other workers are found at the next rebuild unless
+# STREAM_INVALIDATION_ENABLED passes them on
+SHORT_URL_FILTER_ENABLED = os.environ.get("SHORT_URL_FILTER_ENABLED", "false").lower() in ("1", "true", "yes")
+# Target false positive rate, i.e. share of missing short urls that still reach the DB
+SHORT_URL_FILTER_FALSE_POSITIVE_RATE = float(os.environ.get("SHORT_URL_FILTER_FALSE_POSITIVE_RATE", "0.01"))
+# Upper bound of the filter size, the false positive rate rises above the target once it is reached
+SHORT_URL_FILTER_MAX_BYTES = int(os.environ.get("SHORT_URL_FILTER_MAX_BYTES", str(64 * 1024 * 1024)))
+# Number of short urls a filter is sized for at least, rebuilds size it for twice the urls found
+SHORT_URL_FILTER_MIN_CAPACITY = int(os.environ.get("SHORT_URL_FILTER_MIN_CAPACITY", "100000"))
+SHORT_URL_FILTER_REBUILD_INTERVAL_SECONDS = float(os.environ.get("SHORT_URL_FILTER_REBUILD_INTERVAL_SECONDS", "3600"))
+
+# DynamoDB client, shared by every PynamoDB model
+# DynamoDB endpoint, empty to use the AWS endpoint of the region
+DYNAMODB_HOST = os.environ.get("DYNAMODB_HOST", "http://localhost:8000") or None
+DYNAMODB_REGION = os.environ.get("DYNAMODB_REGION", "us-east-2")
+# Provisioned capacity of the URL table and its index, used when the table is created
+URL_TABLE_READ_CAPACITY_UNITS = int(os.environ.get("URL_TABLE_READ_CAPACITY_UNITS", "5"))
+URL_TABLE_WRITE_CAPACITY_UNITS = int(os.environ.get("URL_TABLE_WRITE_CAPACITY_UNITS", "10"))
+# HTTP connections kept open per table, below DB_EXECUTOR_MAX_WORKERS busy threads would open and drop connections
+DYNAMODB_MAX_POOL_CONNECTIONS = int(os.environ.get("DYNAMODB_MAX_POOL_CONNECTIONS", str(DB_EXECUTOR_MAX_WORKERS)))
+DYNAMODB_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("DYNAMODB_CONNECT_TIMEOUT_SECONDS", "15"))
+DYNAMODB_READ_TIMEOUT_SECONDS = float(os.environ.get("DYNAMODB_READ_TIMEOUT_SECONDS", "30"))
+# Retries of throttled or failed requests by the DynamoDB client, with its own exponential backoff
+DYNAMODB_MAX_RETRY_ATTEMPTS = int(os.environ.get("DYNAMODB_MAX_RETRY_ATTEMPTS", "3"))
+# Connections to the URL table opened at startup, before the worker accepts requests
+DYNAMODB_WARM_CONNECTIONS = int(os.environ.get("DYNAMODB_WARM_CONNECTIONS", "8"))
+# Longest startup is held up by warming connections, e.g. when DynamoDB is unreachable
+DYNAMODB_WARM_UP_TIMEOUT_SECONDS = float(os.environ.get("DYNAMODB_WARM_UP_TIMEOUT_SECONDS", "10"))
+
+# Retries of throttled or failed DB calls, on top of the retries of the DynamoDB client
+# Attempts per DB call: reads are retried on throttling and transient errors, writes only on throttling
+DB_RETRY_MAX_ATTEMPTS = int(os.environ.get("DB_RETRY_MAX_ATTEMPTS", "3"))
+# Backoff before a retry is a random time up to min(max, base * 2**retry), "full jitter"
+DB_RETRY_BASE_BACKOFF_SECONDS = float(os.environ.get("DB_RETRY_BASE_BACKOFF_SECONDS", "0.05"))
+DB_RETRY_MAX_BACKOFF_SECONDS = float(os.environ.get("DB_RETRY_MAX_BACKOFF_SECONDS", "1"))
+# Seconds the DB calls of one request may take including retries, no call or retry starts after that
+DB_REQUEST_DEADLINE_SECONDS = float(os.environ.get("DB_REQUEST_DEADLINE_SECONDS", "3"))
+# Consecutive failed DB calls that open the circuit breaker, DB calls then fail fast
+DB_CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.environ.get("DB_CIRCUIT_BREAKER_FAILURE_THRESHOLD", "5"))
+# Seconds the circuit breaker stays open before a single trial call is let through
+DB_CIRCUIT_BREAKER_RESET_SECONDS = float(os.environ.get("DB_CIRCUIT_BREAKER_RESET_SECONDS", "10"))
+
+# Seconds until urls added without a custom url expire unless the client sets expires_at, 0 means never
+RANDOM_URL_DEFAULT_TTL_SECONDS = int(os.environ.get("RANDOM_URL_DEFAULT_TTL_SECONDS", "0"))
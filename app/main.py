@@ -1,9 +1,69 @@
+import asyncio
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from app.api import api_handlers
+from app.api.middleware import CompressionMiddleware, MetricsMiddleware, RateLimitMiddleware
+from app.config import CLICK_ROLLUP_ENABLED, COMPRESSION_ENABLED
+from app.service.analytics import (
+    flush_clicks, run_click_flusher, run_click_rollup_compactor, run_hot_link_snapshot_refresher
+)
+from app.service.async_database import (
+    change_feed, run_change_feed_consumer, run_short_url_filter_rebuilder, warm_up_storage
+)
+from app.service.database import hot_link_snapshot, short_url_filter
+from app.service.metrics import monitor_event_loop_lag, registry
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open DB connections before the worker starts accepting requests, so its first requests skip connection setup
+    await warm_up_storage()
+
+    # Start background flushing of click analytics and event loop monitoring
+    click_flusher = asyncio.create_task(run_click_flusher())
+    loop_monitor = asyncio.create_task(monitor_event_loop_lag())
+
+    # Fold minute click buckets into hour and day buckets, can be left to some workers only
+    rollup_compactor = asyncio.create_task(run_click_rollup_compactor()) if CLICK_ROLLUP_ENABLED else None
+
+    # Build short url filter in the background, lookups go to the DB until it is ready
+    filter_rebuilder = asyncio.create_task(run_short_url_filter_rebuilder()) if short_url_filter is not None else None
+
+    # Apply changes made by other nodes and services to the caches of this worker
+    change_feed_consumer = (
+        asyncio.create_task(run_change_feed_consumer(change_feed)) if change_feed is not None else None
+    )
+
+    # Map the hot link snapshot shared by the workers of this host, rebuilt by whichever worker gets to it first
+    snapshot_refresher = (
+        asyncio.create_task(run_hot_link_snapshot_refresher()) if hot_link_snapshot is not None else None
+    )
+
+    yield
+
+    # Stop background flushing and write out clicks counted since the last flush
+    if filter_rebuilder is not None:
+        filter_rebuilder.cancel()
+    if rollup_compactor is not None:
+        rollup_compactor.cancel()
+    if snapshot_refresher is not None:
+        snapshot_refresher.cancel()
+    if change_feed_consumer is not None:
+        change_feed_consumer.cancel()
+    loop_monitor.cancel()
+    click_flusher.cancel()
+    await flush_clicks()
+
+
+app = FastAPI(lifespan=lifespan)
+# Compression runs innermost, so the metrics include its time and rejections are sent uncompressed
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+# Rate limits run inside the metrics middleware, so rejected requests are measured too
+app.add_middleware(RateLimitMiddleware)
+app.add_middleware(MetricsMiddleware)
 app.include_router(api_handlers.router)
 
 
@@ -11,5 +71,11 @@ app.include_router(api_handlers.router)
 async def root():
     return {"message": "Welcome to the URL Shortener App, the free and easy way to shorten long and unseemly URLs."}
 
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     uvicorn.run("app.main:app", port=8000, reload=True)
@@ -1,6 +1,8 @@
-from pydantic import BaseModel
+from pydantic import AwareDatetime, BaseModel
 
 
 class PostURL(BaseModel):
     original_url: str
     custom_url: str | None = None
+    # Link stops redirecting after this time, must include a timezone
+    expires_at: AwareDatetime | None = None
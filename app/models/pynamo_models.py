@@ -1,18 +1,90 @@
+from app.config import (
+    DYNAMODB_CONNECT_TIMEOUT_SECONDS, DYNAMODB_HOST, DYNAMODB_MAX_POOL_CONNECTIONS, DYNAMODB_MAX_RETRY_ATTEMPTS,
+    DYNAMODB_READ_TIMEOUT_SECONDS, DYNAMODB_REGION, URL_TABLE_READ_CAPACITY_UNITS, URL_TABLE_WRITE_CAPACITY_UNITS
+)
+from pynamodb.constants import STREAM_KEYS_ONLY
+from pynamodb.indexes import GlobalSecondaryIndex, IncludeProjection
 from pynamodb.models import Model
-from pynamodb.attributes import UnicodeAttribute
+from pynamodb.attributes import JSONAttribute, NumberAttribute, TTLAttribute, UnicodeAttribute, UnicodeSetAttribute
 
 
-class Thread(Model):
+class ConnectionMeta:
+    """
+    Client settings shared by the Meta of every model, taken from the config.
+    """
+    # Specifies the region
+    region = DYNAMODB_REGION
+    # Optional: Specify the hostname only if it needs to be changed from the default AWS setting
+    host = DYNAMODB_HOST
+    # HTTP connection pool and timeouts of the model's client
+    max_pool_connections = DYNAMODB_MAX_POOL_CONNECTIONS
+    connect_timeout_seconds = DYNAMODB_CONNECT_TIMEOUT_SECONDS
+    read_timeout_seconds = DYNAMODB_READ_TIMEOUT_SECONDS
+    # Retries with exponential backoff
+    max_retry_attempts = DYNAMODB_MAX_RETRY_ATTEMPTS
+
+
+class OriginalUrlIndex(GlobalSecondaryIndex):
     class Meta:
+        index_name = 'OriginalUrlHashIndex'
+        # Short url is projected as the table key, original url to rule out hash collisions, expiry to skip expired urls
+        projection = IncludeProjection(["OriginalUrl", "ExpiresAt"])
+        # Specifies the write capacity
+        write_capacity_units = URL_TABLE_WRITE_CAPACITY_UNITS
+        # Specifies the read capacity
+        read_capacity_units = URL_TABLE_READ_CAPACITY_UNITS
+
+    # Sparse index, only urls added while dedup mode is enabled have a hash
+    original_url_hash = UnicodeAttribute(hash_key=True, attr_name="OriginalUrlHash")
+
+
+class Thread(Model):
+    class Meta(ConnectionMeta):
         table_name = 'URL'
-        # Specifies the region
-        region = 'us-east-2'
-        # Optional: Specify the hostname only if it needs to be changed from the default AWS setting
-        host = 'http://localhost:8000'
+        # Stream of changed keys, read by the cache invalidation of app/service/streams.py
+        stream_view_type = STREAM_KEYS_ONLY
         # Specifies the write capacity
-        write_capacity_units = 10
+        write_capacity_units = URL_TABLE_WRITE_CAPACITY_UNITS
         # Specifies the read capacity
-        read_capacity_units = 5
+        read_capacity_units = URL_TABLE_READ_CAPACITY_UNITS
 
     short_url = UnicodeAttribute(hash_key=True, attr_name="ShortUrl")
     original_url = UnicodeAttribute(attr_name="OriginalUrl")
+    # SHA-256 of the normalized original url, set on random urls when dedup mode is enabled
+    original_url_hash = UnicodeAttribute(null=True, attr_name="OriginalUrlHash")
+    # DynamoDB TTL attribute, expired urls are deleted by DynamoDB in the background, up to days later
+    expires_at = TTLAttribute(null=True, attr_name="ExpiresAt")
+
+    original_url_index = OriginalUrlIndex()
+
+
+class Counter(Model):
+    class Meta(ConnectionMeta):
+        table_name = 'URLCounter'
+        # Specifies the write capacity
+        write_capacity_units = 1
+        # Specifies the read capacity
+        read_capacity_units = 1
+
+    counter_name = UnicodeAttribute(hash_key=True, attr_name="CounterName")
+    value = NumberAttribute(default=0, attr_name="Value")
+
+
+class ClickCount(Model):
+    class Meta(ConnectionMeta):
+        table_name = 'URLClicks'
+        # Specifies the write capacity
+        write_capacity_units = 10
+        # Specifies the read capacity
+        read_capacity_units = 5
+
+    # "<short_url>#<resolution>", e.g. "existing_url#minute"
+    stat_key = UnicodeAttribute(hash_key=True, attr_name="StatKey")
+    # Start of the time bucket, in seconds since the epoch
+    bucket_start = NumberAttribute(range_key=True, attr_name="BucketStart")
+    clicks = NumberAttribute(default=0, attr_name="Clicks")
+    # Only set on the rollup bookkeeping items of app/service/analytics.py, whose stat keys end in "#rollup"
+    # Short urls with clicks in a bucket that is yet to be folded into a coarser resolution
+    short_urls = UnicodeSetAttribute(null=True, attr_name="ShortUrls")
+    # Most clicked short urls of a bucket as [[short_url, clicks], ...]
+    top = JSONAttribute(null=True, attr_name="Top")
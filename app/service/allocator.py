@@ -0,0 +1,134 @@
+from app.config import SHORT_URL_ALLOCATOR, SHORT_URL_COUNTER_LEASE_SIZE, SHORT_URL_LENGTH
+from functools import partial
+from secrets import choice
+from threading import Lock
+
+BASE62_ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+# Name of the counter item that hands out short url numbers
+SHORT_URL_COUNTER_NAME = "short_url"
+
+# Odd prime not divisible by 31, so multiplying by it permutes every 62**length code space
+SCRAMBLE_MULTIPLIER = 2654435761
+
+
+def encode_base62(number, length):
+    """
+    Function encodes a non-negative integer as a base62 string, left padded to `length` characters.
+    """
+    digits = []
+
+    while number:
+        number, remainder = divmod(number, 62)
+        digits.append(BASE62_ALPHABET[remainder])
+
+    return "".join(reversed(digits)).rjust(length, BASE62_ALPHABET[0])
+
+
+def lease_counter_range(storage, lease_size):
+    """
+    Function atomically reserves the next `lease_size` counter values in storage, returns them as (start, end).
+    """
+    end = storage.increment_counter(SHORT_URL_COUNTER_NAME, lease_size)
+
+    return end - lease_size, end
+
+
+class CodeAllocator:
+    """
+    Base class for short url allocators. Keeps counts of allocated codes and of codes that were already taken.
+    """
+
+    def __init__(self):
+        self._stats_lock = Lock()
+        self.allocated = 0
+        self.retries = 0
+
+    def next_code(self):
+        """
+        Returns a new short url code.
+        """
+        code = self._next_code()
+
+        with self._stats_lock:
+            self.allocated += 1
+
+        return code
+
+    def _next_code(self):
+        raise NotImplementedError
+
+    def record_retry(self):
+        """
+        Counts a code that turned out to be taken and had to be replaced.
+        """
+        with self._stats_lock:
+            self.retries += 1
+
+    def stats(self):
+        """
+        Returns a snapshot of the allocator counters.
+        """
+        with self._stats_lock:
+            return {"allocated": self.allocated, "retries": self.retries}
+
+
+class RandomCodeAllocator(CodeAllocator):
+    """
+    Draws codes uniformly at random from the base62 alphabet, 62**8 possible codes at the default length.
+    """
+
+    def __init__(self, length):
+        super().__init__()
+        self.length = length
+
+    def _next_code(self):
+        return "".join(choice(BASE62_ALPHABET) for _ in range(self.length))
+
+
+class CounterCodeAllocator(CodeAllocator):
+    """
+    Hands out codes from ranges of a global DB counter leased `lease_size` values at a time, so allocation only
+    touches the DB once per lease and codes never collide with each other.
+    Counter values are scrambled within their code space so consecutive codes are not guessable.
+    """
+
+    def __init__(self, length, lease_size, lease_range):
+        super().__init__()
+        self.length = length
+        self.lease_size = lease_size
+        self.lease_range = lease_range
+
+        self._lock = Lock()
+        self._next = 0
+        self._end = 0
+
+    def _next_code(self):
+        with self._lock:
+            if self._next >= self._end:
+                # Current lease used up, reserve a new range
+                self._next, self._end = self.lease_range(self.lease_size)
+
+            value = self._next
+            self._next += 1
+
+        # Grow past the configured length only once its code space is used up
+        length = self.length
+        while value >= 62 ** length:
+            length += 1
+
+        return encode_base62((value * SCRAMBLE_MULTIPLIER) % 62 ** length, length)
+
+
+def create_code_allocator(storage):
+    """
+    Function returns the short url allocator selected in the config, counters are kept in the given storage backend.
+    """
+    if SHORT_URL_ALLOCATOR == "counter":
+        return CounterCodeAllocator(
+            length=SHORT_URL_LENGTH,
+            lease_size=SHORT_URL_COUNTER_LEASE_SIZE,
+            lease_range=partial(lease_counter_range, storage)
+        )
+
+    return RandomCodeAllocator(length=SHORT_URL_LENGTH)
@@ -0,0 +1,505 @@
+import asyncio
+from app.config import (
+    CLICK_FLUSH_INTERVAL_SECONDS, CLICK_MAX_PENDING_KEYS, CLICK_ROLLUP_GRACE_SECONDS, CLICK_ROLLUP_INTERVAL_SECONDS,
+    CLICK_TOP_SIZE, HOT_LINK_SNAPSHOT_CHECK_SECONDS, HOT_LINK_SNAPSHOT_INTERVAL_SECONDS, HOT_LINK_SNAPSHOT_SIZE,
+    HOT_LINK_SNAPSHOT_WINDOW_SECONDS, STATS_MAX_BUCKETS
+)
+from app.service.async_database import db_executor, run_background_step, run_in_db_executor
+from app.service.database import hot_link_snapshot, storage
+from app.service.hotlinks import snapshot_age, snapshot_build_lock, write_snapshot
+from app.service.metrics import Collector, registry
+from app.service.storage import is_expired, key_segment
+from heapq import nlargest
+from pynamodb.exceptions import PynamoDBConnectionError
+from threading import Lock
+from time import time
+
+# Clicks are counted per minute
+MINUTE_BUCKET_SECONDS = 60
+
+# Bucket length of each resolution, minute buckets are written by the flusher, coarser ones by compaction
+RESOLUTION_SECONDS = {"minute": MINUTE_BUCKET_SECONDS, "hour": 3600, "day": 86400}
+# Resolution each coarser resolution is folded from
+FINER_RESOLUTION = {"hour": "minute", "day": "hour"}
+
+# Seconds covered by a stats request without a start, for each resolution
+DEFAULT_STATS_RANGE_SECONDS = {"minute": 3600, "hour": 86400, "day": 30 * 86400}
+
+# Pending rollup markers and top lists are split by short url, keeping each item well below the DynamoDB item size
+ROLLUP_SHARDS = 16
+
+
+def stat_key(short_url, resolution):
+    """
+    Function returns the ClickCount hash key holding the buckets of one short url at one resolution.
+    """
+    return f"{short_url}#{resolution}"
+
+
+def pending_rollup_key(resolution, shard):
+    """
+    Function returns the ClickCount hash key of the markers listing short urls with buckets to fold into resolution.
+    Bookkeeping keys end in "#rollup", which no stat key does, so they never clash with a short url.
+    """
+    return f"pending#{resolution}#{shard}#rollup"
+
+
+def top_key(resolution):
+    """
+    Function returns the ClickCount hash key of the top lists of one resolution.
+    Each bucket holds one top list per shard, at bucket_start + shard, so one query reads all shards of a bucket.
+    """
+    return f"top#{resolution}#rollup"
+
+
+def period_start(timestamp, resolution):
+    """
+    Function returns the start of the resolution bucket timestamp falls in.
+    """
+    seconds = RESOLUTION_SECONDS[resolution]
+    return int(timestamp) // seconds * seconds
+
+
+class ClickAggregator:
+    """
+    Thread-safe in-memory click counter, coalescing clicks per (short_url, minute bucket) until they are flushed.
+    Memory is bounded by max_pending_keys, clicks for new keys beyond that are dropped and counted.
+    """
+
+    def __init__(self, max_pending_keys):
+        self.max_pending_keys = max_pending_keys
+
+        # (short_url, bucket_start) --> clicks
+        self._counts = {}
+        self._lock = Lock()
+
+        self.recorded = 0
+        self.dropped = 0
+
+    def record(self, short_url, timestamp=None):
+        """
+        Counts one click on short_url, only touches memory.
+        """
+        if timestamp is None:
+            timestamp = time()
+
+        key = (short_url, int(timestamp) // MINUTE_BUCKET_SECONDS * MINUTE_BUCKET_SECONDS)
+
+        with self._lock:
+            if key in self._counts:
+                self._counts[key] += 1
+
+            elif len(self._counts) < self.max_pending_keys:
+                self._counts[key] = 1
+
+            else:
+                # Memory bound reached, drop click
+                self.dropped += 1
+                return
+
+            self.recorded += 1
+
+    def drain(self):
+        """
+        Returns all pending counts and starts counting from empty.
+        """
+        with self._lock:
+            counts = self._counts
+            self._counts = {}
+
+        return counts
+
+    def restore(self, counts):
+        """
+        Adds counts that could not be flushed back into the pending counts, within the memory bound.
+        """
+        with self._lock:
+            for key, clicks in counts.items():
+                if key in self._counts or len(self._counts) < self.max_pending_keys:
+                    self._counts[key] = self._counts.get(key, 0) + clicks
+                else:
+                    self.dropped += clicks
+
+    def stats(self):
+        """
+        Returns a snapshot of the aggregator counters.
+        """
+        with self._lock:
+            return {"pending_keys": len(self._counts), "recorded": self.recorded, "dropped": self.dropped}
+
+
+def flush_click_counts(counts):
+    """
+    Function adds aggregated click counts to the DB, one atomic add per (short_url, minute bucket).
+    The hours of the counts are marked for compaction first, so no written minute bucket is left out of its hour.
+    Returns the counts that could not be written, so they can be retried with the next flush.
+    """
+    failed = {}
+
+    # (shard, hour start) --> short urls with clicks in that hour
+    hours = {}
+    for short_url, bucket_start in counts:
+        hour_key = (key_segment(short_url, ROLLUP_SHARDS), period_start(bucket_start, "hour"))
+        hours.setdefault(hour_key, set()).add(short_url)
+
+    unmarked = set()
+    for (shard, hour_start), short_urls in hours.items():
+        try:
+            storage.add_pending_rollup(pending_rollup_key("hour", shard), hour_start, short_urls)
+
+        except PynamoDBConnectionError:
+            unmarked.update((short_url, hour_start) for short_url in short_urls)
+
+    for (short_url, bucket_start), clicks in counts.items():
+        if (short_url, period_start(bucket_start, "hour")) in unmarked:
+            failed[(short_url, bucket_start)] = clicks
+            continue
+
+        try:
+            storage.add_clicks(stat_key(short_url, "minute"), bucket_start, clicks)
+
+        except PynamoDBConnectionError:
+            failed[(short_url, bucket_start)] = clicks
+
+    return failed
+
+
+# Click counts of this worker process
+click_aggregator = ClickAggregator(max_pending_keys=CLICK_MAX_PENDING_KEYS)
+
+registry.register(Collector(
+    "clicks_total", "Redirect clicks counted in memory, by whether they were recorded or dropped.", "counter",
+    lambda: [((event,), click_aggregator.stats()[event]) for event in ("recorded", "dropped")],
+    label_names=("event",)
+))
+
+
+async def flush_clicks():
+    """
+    Flushes pending click counts on the DB thread pool, failed counts are kept for the next flush.
+    """
+    counts = click_aggregator.drain()
+
+    if not counts:
+        return
+
+    # Background writes skip request admission control, they must not be turned away when the pool is busy
+    loop = asyncio.get_running_loop()
+    failed = await loop.run_in_executor(db_executor, flush_click_counts, counts)
+
+    if failed:
+        click_aggregator.restore(failed)
+
+
+async def run_click_flusher(interval=CLICK_FLUSH_INTERVAL_SECONDS):
+    """
+    Background task flushing click counts every interval seconds until cancelled.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        await flush_clicks()
+
+
+def first_unfolded_bucket(resolution, now):
+    """
+    Function returns the start of the first resolution bucket that may not be folded yet. A bucket is folded by the
+    first compaction run after its end plus the grace time, so every earlier bucket is complete.
+    """
+    return period_start(now - CLICK_ROLLUP_GRACE_SECONDS - CLICK_ROLLUP_INTERVAL_SECONDS, resolution)
+
+
+def _update_top(resolution, bucket_start, shard, totals):
+    """
+    Merges the new totals of some short urls into the top list of one shard of a bucket.
+    Totals only grow, so short urls that fell off the list cannot come back without being folded again.
+    """
+    top_bucket = bucket_start + shard
+    stored = storage.query_top(top_key(resolution), top_bucket, top_bucket + 1)
+
+    clicks_by_url = dict(stored[0][1]) if stored else {}
+    clicks_by_url.update(totals)
+
+    top = nlargest(CLICK_TOP_SIZE, clicks_by_url.items(), key=lambda entry: entry[1])
+    storage.put_top(top_key(resolution), top_bucket, [[short_url, clicks] for short_url, clicks in top if clicks])
+
+
+def compact_click_rollups(now=None):
+    """
+    Function folds the finer buckets of every closed hour and day with pending clicks into one coarser bucket per
+    short url, and updates the top lists of those buckets. Hours are folded before days, a folded hour marks its day.
+    Buckets are recomputed from scratch, so repeated or concurrent runs and late clicks only rewrite the same totals.
+    Only the short urls listed in pending markers are read, compaction never scans.
+    Returns the number of buckets written, raises PynamoDBConnectionError if the DB fails, the rest is left pending.
+    """
+    if now is None:
+        now = time()
+
+    written = 0
+
+    for resolution in ("hour", "day"):
+        finer = FINER_RESOLUTION[resolution]
+        seconds = RESOLUTION_SECONDS[resolution]
+
+        # Buckets that ended at least the grace time ago, no more clicks are expected for them
+        until = int(now) - CLICK_ROLLUP_GRACE_SECONDS - seconds + 1
+
+        for shard in range(ROLLUP_SHARDS):
+            for bucket_start, short_urls in storage.pending_rollups(pending_rollup_key(resolution, shard), until):
+                totals = {}
+
+                for short_url in short_urls:
+                    finer_key = stat_key(short_url, finer)
+                    finer_buckets = storage.query_clicks(finer_key, bucket_start, bucket_start + seconds)
+                    totals[short_url] = sum(clicks for _, clicks in finer_buckets)
+                    storage.set_clicks(stat_key(short_url, resolution), bucket_start, totals[short_url])
+
+                _update_top(resolution, bucket_start, shard, totals)
+
+                if resolution == "hour":
+                    # Short urls keep their shard at every resolution
+                    storage.add_pending_rollup(
+                        pending_rollup_key("day", shard), period_start(bucket_start, "day"), short_urls
+                    )
+
+                storage.remove_pending_rollup(pending_rollup_key(resolution, shard), bucket_start, short_urls)
+                written += len(short_urls)
+
+    return written
+
+
+def _click_buckets(short_url, resolution, start, end, now):
+    """
+    Returns (bucket_start, clicks) of the non-empty buckets of short_url in [start, end), in time order.
+    Recent buckets that may not be folded yet are summed from the finer resolution instead, at most a few queries.
+    """
+    buckets = dict(storage.query_clicks(stat_key(short_url, resolution), start, end))
+
+    finer = FINER_RESOLUTION.get(resolution)
+    if finer is None:
+        return sorted(buckets.items())
+
+    unfolded_start = max(start, first_unfolded_bucket(resolution, now))
+
+    if unfolded_start < end:
+        buckets = {bucket_start: clicks for bucket_start, clicks in buckets.items() if bucket_start < unfolded_start}
+
+        for bucket_start, clicks in _click_buckets(short_url, finer, unfolded_start, end, now):
+            coarse_start = period_start(bucket_start, resolution)
+            buckets[coarse_start] = buckets.get(coarse_start, 0) + clicks
+
+    return sorted(buckets.items())
+
+
+def get_click_stats(short_url, resolution, start=None, end=None, now=None):
+    """
+    Function retrieves the clicks of a short url per resolution bucket ("minute", "hour" or "day") in [start, end),
+    given in seconds since the epoch. End defaults to now, start to a resolution dependent range before end.
+    Each bucket is one item of a single DynamoDB query, cost grows with the buckets requested, not with the clicks.
+    Payload holds the resolution, the bucket aligned start, end, total clicks and the non-empty buckets in time order.
+    Response, including payload & status_code, is returned to provide client with details of the API call.
+    """
+    # Initialize response
+    response = {
+        "short_url": short_url,
+        "status_code": None,
+        "payload": ''
+    }
+
+    if now is None:
+        now = time()
+
+    if resolution not in RESOLUTION_SECONDS:
+        # Bad request, unknown resolution
+        response["payload"] = "InvalidResolution"
+        response["status_code"] = 400
+        return response
+
+    end = int(now if end is None else end)
+    start = period_start(end - DEFAULT_STATS_RANGE_SECONDS[resolution] if start is None else start, resolution)
+
+    if end <= start:
+        # Bad request, empty time range
+        response["payload"] = "InvalidTimeRange"
+        response["status_code"] = 400
+        return response
+
+    if (end - start) / RESOLUTION_SECONDS[resolution] > STATS_MAX_BUCKETS:
+        # Bad request, client should pick a coarser resolution or a shorter range
+        response["payload"] = f"Maximum {STATS_MAX_BUCKETS} buckets"
+        response["status_code"] = 400
+        return response
+
+    try:
+        buckets = _click_buckets(short_url, resolution, start, end, now)
+
+    except PynamoDBConnectionError:
+        # Internal Server Error, unreachable server
+        response["payload"] = "DBConnectionError"
+        response["status_code"] = 500
+
+    else:
+        # Success, buckets retrieved
+        response["payload"] = {
+            "resolution": resolution,
+            "start": start,
+            "end": end,
+            "total": sum(clicks for _, clicks in buckets),
+            "buckets": [{"start": bucket_start, "clicks": clicks} for bucket_start, clicks in buckets]
+        }
+        response["status_code"] = 200
+
+    return response
+
+
+def get_top_urls(resolution, start=None, limit=10, now=None):
+    """
+    Function retrieves the most clicked short urls of one "hour" or "day" bucket, by default of the latest bucket
+    that is certain to be folded. Reads the top lists of all shards of the bucket with a single DynamoDB query.
+    Payload holds the resolution, the bucket start and the short urls with their clicks, most clicked first.
+    Response, including payload & status_code, is returned to provide client with details of the API call.
+    """
+    # Initialize response
+    response = {
+        "short_url": None,
+        "status_code": None,
+        "payload": ''
+    }
+
+    if now is None:
+        now = time()
+
+    if resolution not in FINER_RESOLUTION:
+        # Bad request, top lists are only kept for folded resolutions
+        response["payload"] = "InvalidResolution"
+        response["status_code"] = 400
+        return response
+
+    if start is None:
+        # Latest bucket that is certain to be folded
+        start = first_unfolded_bucket(resolution, now) - RESOLUTION_SECONDS[resolution]
+    else:
+        start = period_start(start, resolution)
+
+    try:
+        shard_tops = storage.query_top(top_key(resolution), start, start + ROLLUP_SHARDS)
+
+    except PynamoDBConnectionError:
+        # Internal Server Error, unreachable server
+        response["payload"] = "DBConnectionError"
+        response["status_code"] = 500
+
+    else:
+        # Each short url is in one shard only, so the overall top is the top of the shard tops
+        entries = [entry for _, top in shard_tops for entry in top]
+        top = nlargest(min(limit, CLICK_TOP_SIZE), entries, key=lambda entry: entry[1])
+
+        response["payload"] = {
+            "resolution": resolution,
+            "start": start,
+            "top": [{"short_url": short_url, "clicks": clicks} for short_url, clicks in top]
+        }
+        response["status_code"] = 200
+
+    return response
+
+
+async def get_click_stats_async(short_url, resolution, start=None, end=None):
+    """
+    Async variant of get_click_stats, runs on the DB thread pool.
+    """
+    return await run_in_db_executor(get_click_stats, short_url=short_url, resolution=resolution, start=start, end=end)
+
+
+async def get_top_urls_async(resolution, start=None, limit=10):
+    """
+    Async variant of get_top_urls, runs on the DB thread pool.
+    """
+    return await run_in_db_executor(get_top_urls, resolution=resolution, start=start, limit=limit)
+
+
+async def run_click_rollup_compactor(interval=CLICK_ROLLUP_INTERVAL_SECONDS):
+    """
+    Background task folding click buckets every interval seconds until cancelled.
+    Runs on the DB thread pool without admission control, a failed run leaves its buckets for the next one.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        await run_background_step("click_rollup_compactor", compact_click_rollups)
+
+
+def rebuild_hot_link_snapshot(now=None):
+    """
+    Function writes the most clicked urls of the hourly top lists of the last HOT_LINK_SNAPSHOT_WINDOW_SECONDS to the
+    hot link snapshot file. Takes one query for the top lists and batched reads for the urls, never scans.
+    Response, including payload and status_code, is returned to provide client with details of the call.
+    """
+    # Initialize response
+    response = {
+        "short_url": None,
+        "status_code": None,
+        "payload": ''
+    }
+
+    # Deletes from here on may not be seen by the reads below
+    created_at = time()
+
+    if now is None:
+        now = created_at
+
+    try:
+        shard_tops = storage.query_top(top_key("hour"), int(now) - HOT_LINK_SNAPSHOT_WINDOW_SECONDS, int(now))
+
+        clicks_by_url = {}
+        for _, top in shard_tops:
+            for short_url, clicks in top:
+                clicks_by_url[short_url] = clicks_by_url.get(short_url, 0) + clicks
+
+        hottest = nlargest(HOT_LINK_SNAPSHOT_SIZE, clicks_by_url, key=clicks_by_url.get)
+        targets = storage.get_redirect_targets(hottest)
+
+        count = write_snapshot(hot_link_snapshot.path, (
+            (short_url, *targets[short_url]) for short_url in hottest
+            if short_url in targets and not is_expired(targets[short_url][1], now)
+        ), created_at=created_at)
+
+    except PynamoDBConnectionError:
+        # Internal Server Error, unreachable server, previous snapshot stays in use
+        response["payload"] = "DBConnectionError"
+        response["status_code"] = 500
+
+    except OSError:
+        # Internal Server Error, snapshot file could not be written, previous snapshot stays in use
+        response["payload"] = "SnapshotWriteError"
+        response["status_code"] = 500
+
+    else:
+        # Success, snapshot published for all workers of the host
+        response["payload"] = f"Snapshot Written With {count} Urls"
+        response["status_code"] = 200
+
+    return response
+
+
+def refresh_hot_link_snapshot():
+    """
+    Function rebuilds the hot link snapshot once it is older than the rebuild interval, unless another worker of the
+    host is already doing so, then maps the newest snapshot into this worker.
+    """
+    with snapshot_build_lock(hot_link_snapshot.path) as locked:
+        age = snapshot_age(hot_link_snapshot.path)
+
+        if locked and (age is None or age >= HOT_LINK_SNAPSHOT_INTERVAL_SECONDS):
+            rebuild_hot_link_snapshot()
+
+    hot_link_snapshot.refresh()
+
+
+async def run_hot_link_snapshot_refresher(interval=HOT_LINK_SNAPSHOT_CHECK_SECONDS):
+    """
+    Background task mapping the hot link snapshot right away and checking for a newer one every interval seconds.
+    Runs on the DB thread pool without admission control, a failed rebuild is retried at the next check and the
+    current snapshot stays in use meanwhile.
+    """
+    while True:
+        await run_background_step("hot_link_snapshot_refresher", refresh_hot_link_snapshot)
+        await asyncio.sleep(interval)
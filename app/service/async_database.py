@@ -0,0 +1,282 @@
+import asyncio
+import logging
+from app.config import (
+    DB_EXECUTOR_ADMISSION_TIMEOUT_SECONDS, DB_EXECUTOR_MAX_PENDING, DB_EXECUTOR_MAX_WORKERS, DYNAMODB_WARM_CONNECTIONS,
+    DYNAMODB_WARM_UP_TIMEOUT_SECONDS, SHORT_URL_FILTER_REBUILD_INTERVAL_SECONDS, STORAGE_BACKEND,
+    STREAM_INVALIDATION_ENABLED, STREAM_POLL_INTERVAL_SECONDS, STREAM_POLL_JITTER
+)
+from app.service.cache import MISSING
+from app.service.database import (
+    add_custom_url_to_db, add_random_url_to_db, add_urls_to_db, apply_url_changes, delete_item, drop_cached_urls,
+    get_all_urls, get_one_url, get_url_page, load_redirect_target, peek_redirect_target, rebuild_short_url_filter,
+    storage
+)
+from app.service.metrics import Collector, registry
+from app.service.retry import run_with_deadline
+from app.service.singleflight import SingleFlight
+from app.service.streams import create_change_feed_consumer
+from botocore.exceptions import BotoCoreError, ClientError
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pynamodb.exceptions import PynamoDBException
+from random import random
+
+# Seconds to wait before trying again after a failed short url filter rebuild
+FILTER_REBUILD_RETRY_SECONDS = 60
+
+# Operational failures of a background task run (DB, network, file system), retried at its next run. Anything else
+# is a bug and ends the task
+BACKGROUND_TASK_ERRORS = (BotoCoreError, ClientError, OSError, PynamoDBException)
+
+logger = logging.getLogger(__name__)
+
+# Background task name --> failed runs, only changed on the event loop
+_background_task_failures = {}
+
+registry.register(Collector(
+    "background_task_failures_total", "Failed runs of background tasks, by task.", "counter",
+    lambda: [((task,), failures) for task, failures in _background_task_failures.items()],
+    label_names=("task",)
+))
+
+# Dedicated pool for blocking PynamoDB calls, keeps them off the event loop and the default executor
+db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_MAX_WORKERS, thread_name_prefix="db")
+
+# Consumer of the URL table stream invalidating this worker's caches, None unless enabled in the config
+change_feed = create_change_feed_consumer(
+    on_change=apply_url_changes, on_gap=drop_cached_urls
+) if STREAM_INVALIDATION_ENABLED and STORAGE_BACKEND == "dynamodb" else None
+
+if change_feed is not None:
+    registry.register(Collector(
+        "change_feed_records_total", "URL table stream records applied to the caches of this worker.", "counter",
+        lambda: [((), change_feed.stats()["records"])]
+    ))
+    registry.register(Collector(
+        "change_feed_gaps_total", "Times stream records may have been missed and the caches were dropped.",
+        "counter", lambda: [((), change_feed.stats()["gaps"])]
+    ))
+
+# Limits calls that are running or waiting for a thread, created lazily per event loop
+_admission_semaphores = {}
+
+# Concurrent lookups of the same short url share one DB call, one layer per read path
+item_lookups = SingleFlight()
+redirect_target_lookups = SingleFlight()
+
+registry.register(Collector(
+    "single_flight_calls_total",
+    "Short url lookups by read path, either executed or collapsed into a lookup already in flight.", "counter",
+    lambda: [
+        ((lookup, result), single_flight.stats()[result])
+        for lookup, single_flight in (("item", item_lookups), ("redirect_target", redirect_target_lookups))
+        for result in ("executed", "collapsed")
+    ],
+    label_names=("lookup", "result")
+))
+
+
+def _get_admission_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _admission_semaphores.get(loop)
+
+    if semaphore is None:
+        # Drop semaphores of closed loops (e.g. test clients) before adding a new one
+        for old_loop in [old_loop for old_loop in _admission_semaphores if old_loop.is_closed()]:
+            del _admission_semaphores[old_loop]
+
+        semaphore = asyncio.Semaphore(DB_EXECUTOR_MAX_WORKERS + DB_EXECUTOR_MAX_PENDING)
+        _admission_semaphores[loop] = semaphore
+
+    return semaphore
+
+
+class ServerBusy(Exception):
+    """
+    Raised when a DB call is not admitted to the DB thread pool because it is saturated.
+    """
+
+
+async def run_admitted(func, *args, **kwargs):
+    """
+    Function runs a blocking function on the DB thread pool and returns its result.
+    When too many calls are already running or queued, ServerBusy is raised after a short wait,
+    so that a slow DB applies backpressure to clients instead of growing an unbounded queue.
+    All DB calls of the function share one deadline, retries included.
+    """
+    semaphore = _get_admission_semaphore()
+
+    try:
+        await asyncio.wait_for(semaphore.acquire(), timeout=DB_EXECUTOR_ADMISSION_TIMEOUT_SECONDS)
+
+    except asyncio.TimeoutError:
+        raise ServerBusy()
+
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(db_executor, partial(run_with_deadline, partial(func, *args, **kwargs)))
+
+    finally:
+        semaphore.release()
+
+
+async def run_in_db_executor(func, *args, **kwargs):
+    """
+    Function runs a blocking service layer function on the DB thread pool and awaits its response.
+    Calls refused by admission control get a 503 response.
+    """
+    try:
+        return await run_admitted(func, *args, **kwargs)
+
+    except ServerBusy:
+        # Service Unavailable, DB pool saturated
+        return {
+            "short_url": None,
+            "status_code": 503,
+            "payload": "ServerBusy"
+        }
+
+
+async def add_custom_url_to_db_async(custom_url, original_url, expires_at=None):
+    """
+    Async variant of add_custom_url_to_db, runs on the DB thread pool.
+    """
+    return await run_in_db_executor(
+        add_custom_url_to_db, custom_url=custom_url, original_url=original_url, expires_at=expires_at
+    )
+
+
+async def add_random_url_to_db_async(original_url, expires_at=None):
+    """
+    Async variant of add_random_url_to_db, runs on the DB thread pool.
+    """
+    return await run_in_db_executor(add_random_url_to_db, original_url=original_url, expires_at=expires_at)
+
+
+async def add_urls_to_db_async(records):
+    """
+    Async variant of add_urls_to_db, runs on the DB thread pool.
+    """
+    return await run_in_db_executor(add_urls_to_db, records=records)
+
+
+async def delete_item_async(short_url):
+    """
+    Async variant of delete_item, runs on the DB thread pool.
+    """
+    return await run_in_db_executor(delete_item, short_url=short_url)
+
+
+async def get_all_urls_async():
+    """
+    Async variant of get_all_urls, runs on the DB thread pool.
+    """
+    return await run_in_db_executor(get_all_urls)
+
+
+async def get_one_url_async(short_url):
+    """
+    Async variant of get_one_url, runs on the DB thread pool.
+    Concurrent calls for the same short url share one call, each caller gets its own copy of the response.
+    """
+    if not isinstance(short_url, str):
+        return await run_in_db_executor(get_one_url, short_url=short_url)
+
+    response = await item_lookups.do(short_url, partial(run_in_db_executor, get_one_url, short_url=short_url))
+    return dict(response)
+
+
+async def find_redirect_target_async(short_url):
+    """
+    Async variant of find_redirect_target. Cache hits and Bloom filter rejections are answered on the event loop,
+    only lookups that need the DB run on the DB thread pool, concurrent ones for the same short url share one call.
+    Raises ServerBusy if the pool is saturated.
+    """
+    target = peek_redirect_target(short_url)
+
+    if target is None:
+        return await redirect_target_lookups.do(short_url, partial(run_admitted, load_redirect_target, short_url))
+
+    return None if target is MISSING else target
+
+
+async def get_url_page_async(limit, cursor=None):
+    """
+    Async variant of get_url_page, runs on the DB thread pool.
+    """
+    return await run_in_db_executor(get_url_page, limit=limit, cursor=cursor)
+
+
+async def iter_url_pages_async(page_size):
+    """
+    Async generator that walks the whole table one page at a time, yielding each page response as it is read.
+    Only one page is held in memory at a time. Iteration stops after the last page or the first failed page.
+    """
+    cursor = None
+
+    while True:
+        response = await get_url_page_async(limit=page_size, cursor=cursor)
+        yield response
+
+        cursor = response.get("next_cursor")
+        if response["status_code"] != 200 or not cursor:
+            return
+
+
+async def warm_up_storage(connections=DYNAMODB_WARM_CONNECTIONS, timeout=DYNAMODB_WARM_UP_TIMEOUT_SECONDS):
+    """
+    Opens storage connections on the DB thread pool before the first request, returns the number opened.
+    Gives up waiting after timeout seconds, returning 0, so an unreachable DB does not hold up startup.
+    """
+    loop = asyncio.get_running_loop()
+
+    try:
+        return await asyncio.wait_for(loop.run_in_executor(db_executor, storage.warm_up, connections), timeout)
+
+    except asyncio.TimeoutError:
+        return 0
+
+
+async def run_background_step(task, func, *args):
+    """
+    Runs one step of the background task named task on the DB thread pool, without admission control.
+    Returns what func returned, or None after one of BACKGROUND_TASK_ERRORS so the task carries on at its next run.
+    Every failure is logged with its traceback and counted in background_task_failures_total, others are raised.
+    """
+    try:
+        return await asyncio.get_running_loop().run_in_executor(db_executor, func, *args)
+
+    except BACKGROUND_TASK_ERRORS:
+        _background_task_failures[task] = _background_task_failures.get(task, 0) + 1
+        logger.warning("Background task %s failed, retrying at its next run", task, exc_info=True)
+        return None
+
+    except Exception:
+        _background_task_failures[task] = _background_task_failures.get(task, 0) + 1
+        logger.exception("Background task %s failed unexpectedly and stops", task)
+        raise
+
+
+async def run_short_url_filter_rebuilder(interval=SHORT_URL_FILTER_REBUILD_INTERVAL_SECONDS):
+    """
+    Background task that builds the short url Bloom filter right away and rebuilds it every interval seconds.
+    Rebuilds run on the DB thread pool directly, without admission control, as they must not be refused.
+    A failed rebuild keeps the previous filter in use and is retried sooner.
+    """
+    while True:
+        response = await run_background_step("short_url_filter_rebuilder", rebuild_short_url_filter)
+        rebuilt = response is not None and response["status_code"] == 200
+
+        await asyncio.sleep(interval if rebuilt else min(interval, FILTER_REBUILD_RETRY_SECONDS))
+
+
+async def run_change_feed_consumer(consumer, interval=STREAM_POLL_INTERVAL_SECONDS, jitter=STREAM_POLL_JITTER):
+    """
+    Background task reading the URL table stream every interval seconds, plus a random share of up to jitter of it,
+    until cancelled. The jitter spreads the reads of workers started together over the interval.
+    Reads run on the DB thread pool without admission control. A failed read is retried at the next poll, records
+    that expire in the meantime are reported as a gap by the consumer.
+    """
+    while True:
+        await run_background_step("change_feed_consumer", consumer.poll)
+        await asyncio.sleep(interval * (1 + jitter * random()))
@@ -0,0 +1,150 @@
+from hashlib import blake2b
+from math import ceil, log
+from threading import Lock
+
+# Bits per item factor of an optimally sized Bloom filter, m = -n * ln(p) / ln(2)**2
+LN2_SQUARED = log(2) ** 2
+
+
+class BloomFilter:
+    """
+    Set membership test that never misses an added key and wrongly reports absent keys with a bounded probability.
+    Sized for `capacity` keys at `false_positive_rate`, using at most `max_bytes` of memory.
+    Lookups take no lock, adds are serialized so concurrent bit updates are not lost.
+    """
+
+    def __init__(self, capacity, false_positive_rate, max_bytes):
+        capacity = max(1, capacity)
+
+        optimal_bits = ceil(-capacity * log(false_positive_rate) / LN2_SQUARED)
+        self.bit_count = max(8, min(optimal_bits, max_bytes * 8))
+        self.hash_count = max(1, round(self.bit_count / capacity * log(2)))
+
+        self._bits = bytearray(ceil(self.bit_count / 8))
+        self._lock = Lock()
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing, two 64 bit halves of one digest stand in for hash_count independent hashes
+        digest = blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+
+        return [(first + i * second) % self.bit_count for i in range(self.hash_count)]
+
+    def add(self, key):
+        positions = self._positions(key)
+
+        with self._lock:
+            for position in positions:
+                self._bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def __contains__(self, key):
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    @property
+    def size_bytes(self):
+        return len(self._bits)
+
+
+class ShortUrlFilter:
+    """
+    Bloom filter over every short url in storage, rebuilt from a full scan and updated as urls are added.
+    Until the first rebuild has finished nothing is known, so every short url might exist.
+    Deleted short urls stay in the filter until the next rebuild, which only costs a DB lookup. After reset() nothing
+    is known again until the next rebuild has finished.
+    """
+
+    def __init__(self, false_positive_rate, max_bytes, min_capacity):
+        self.false_positive_rate = false_positive_rate
+        self.max_bytes = max_bytes
+        self.min_capacity = min_capacity
+
+        self._lock = Lock()
+        self._filter = None
+        # Filter being rebuilt, receives adds made while the scan is running
+        self._building = None
+        # Urls in the last filter built, sizes the next one
+        self._known = 0
+
+        self.rejected = 0
+
+    def _new_filter(self):
+        # Twice the urls seen last time, leaves room for growth until the next rebuild
+        capacity = max(self.min_capacity, 2 * self._known)
+
+        return BloomFilter(capacity, self.false_positive_rate, self.max_bytes)
+
+    @property
+    def ready(self):
+        return self._filter is not None
+
+    def add(self, short_url):
+        with self._lock:
+            filters = [bloom for bloom in (self._filter, self._building) if bloom is not None]
+
+        for bloom in filters:
+            bloom.add(short_url)
+
+    def might_contain(self, short_url):
+        """
+        Returns False only if short_url is definitely not in storage.
+        """
+        bloom = self._filter
+
+        if bloom is None or short_url in bloom:
+            return True
+
+        self.rejected += 1
+        return False
+
+    def rebuild(self, short_urls):
+        """
+        Replaces the filter with one built from short_urls, an iterable over every short url in storage.
+        Urls added while iterating are kept. Returns the number of urls in the new filter.
+        """
+        with self._lock:
+            building = self._building = self._new_filter()
+
+        try:
+            for short_url in short_urls:
+                building.add(short_url)
+
+        except BaseException:
+            with self._lock:
+                if self._building is building:
+                    self._building = None
+            raise
+
+        with self._lock:
+            # Unless reset() was called meanwhile, urls added elsewhere during the scan may be missing from it
+            if self._building is building:
+                self._filter = building
+                self._building = None
+                self._known = building.count
+
+        return building.count
+
+    def reset(self):
+        """
+        Forgets every short url, e.g. when urls may have been added without add() being called. Every short url might
+        exist until the next rebuild started after the call has finished.
+        """
+        with self._lock:
+            self._filter = None
+            self._building = None
+
+    def stats(self):
+        """
+        Returns a snapshot of the filter counters.
+        """
+        bloom = self._filter
+
+        return {
+            "ready": bloom is not None,
+            "size_bytes": bloom.size_bytes if bloom is not None else 0,
+            "short_urls": bloom.count if bloom is not None else 0,
+            "rejected": self.rejected
+        }
@@ -0,0 +1,128 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+
+# Sentinel stored for keys that are known to be missing from the DB
+MISSING = object()
+
+# Invalidation counters, keys share one by hash so their memory stays fixed however many keys are invalidated
+INVALIDATION_STRIPES = 1024
+
+
+class TTLCache:
+    """
+    Bounded, thread-safe in-memory cache with least recently used eviction and per-entry expiry.
+    Found values and missing keys (negative entries) have separate time-to-live values.
+    Hit, miss and eviction counters are kept so cache effectiveness can be monitored.
+    Values read from the DB are cached with the token() taken before the read, so a value read before an
+    invalidation of its key is not cached after it.
+    """
+
+    def __init__(self, max_size, ttl, negative_ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        # key --> (value, expiry time), ordered from least to most recently used
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+        # Bumped by invalidate() for the keys of a stripe, and by clear() for all keys
+        self._invalidations = [0] * INVALIDATION_STRIPES
+        self._clears = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Returns the cached value for key, MISSING for a cached negative entry, or None when key is not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+
+            if expires_at <= monotonic():
+                # Entry is stale, drop it and treat as a miss
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            # Mark as most recently used
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def token(self, key):
+        """
+        Returns a token to pass to set() or set_missing() along with a value of key read after this call.
+        """
+        with self._lock:
+            return self._clears, self._invalidations[hash(key) % INVALIDATION_STRIPES]
+
+    def set(self, key, value, token=None):
+        """
+        Caches value for key using the regular time-to-live, unless key was invalidated since token was taken.
+        """
+        self._store(key, value, self.ttl, token)
+
+    def set_missing(self, key, token=None):
+        """
+        Caches key as known to be missing using the negative time-to-live, unless key was invalidated since token was
+        taken.
+        """
+        self._store(key, MISSING, self.negative_ttl, token)
+
+    def _store(self, key, value, ttl, token):
+        if self.max_size <= 0 or ttl <= 0:
+            # Cache disabled
+            return
+
+        with self._lock:
+            if token is not None and token != (self._clears, self._invalidations[hash(key) % INVALIDATION_STRIPES]):
+                # Value may predate an invalidation, e.g. of a url deleted while it was being read
+                return
+
+            self._entries[key] = (value, monotonic() + ttl)
+            self._entries.move_to_end(key)
+
+            # Evict least recently used entries until back within bounds
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """
+        Removes key from the cache, if present.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._invalidations[hash(key) % INVALIDATION_STRIPES] += 1
+
+    def clear(self):
+        """
+        Removes all entries from the cache, counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._clears += 1
+
+    def stats(self):
+        """
+        Returns a snapshot of the cache counters.
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
@@ -1,14 +1,137 @@
-from app.models.pynamo_models import Thread
+from app.config import (
+    BULK_SHORTEN_CHUNK_SIZE, DEDUP_ENABLED, HOT_LINK_SNAPSHOT_PATH, RANDOM_URL_DEFAULT_TTL_SECONDS,
+    REDIRECT_CACHE_MAX_SIZE, REDIRECT_CACHE_NEGATIVE_TTL_SECONDS, REDIRECT_CACHE_TTL_SECONDS, SHORT_URL_FILTER_ENABLED,
+    SHORT_URL_FILTER_FALSE_POSITIVE_RATE, SHORT_URL_FILTER_MAX_BYTES, SHORT_URL_FILTER_MIN_CAPACITY
+)
+from app.service.allocator import create_code_allocator
+from app.service.bloom import ShortUrlFilter
+from app.service.cache import MISSING, TTLCache
+from app.service.dedup import normalize_url, original_url_hash
+from app.service.hotlinks import HotLinkSnapshot
+from app.service.metrics import Collector, InstrumentedStorage, registry
+from app.service.retry import RetryingStorage, circuit_breaker, is_transient, retry_policy
+from app.service.storage import (
+    BATCH_EXISTS, BATCH_NOT_ATTEMPTED, BATCH_WRITTEN, UrlRecord, create_storage_backend, is_expired
+)
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from datetime import datetime, timezone
+from json import JSONDecodeError, dumps, loads
 from pynamodb.exceptions import AttributeNullError, DeleteError, DoesNotExist, PutError, PynamoDBConnectionError
-from uuid import uuid4
+from time import sleep, time
 
-SHORT_URL_LENGTH = 8
 MAX_RANDOM_URL_ATTEMPTS = 50
 
+# Store holding all urls, selected in the config
+# Calls go through the circuit breaker and are retried with backoff, every attempt is timed for /metrics
+storage = RetryingStorage(InstrumentedStorage(create_storage_backend()), retry_policy, circuit_breaker)
+
+# Hands out short urls for urls added without a custom url
+code_allocator = create_code_allocator(storage)
+
+# In-memory cache of short_url --> (original_url, expires_at) lookups, shared by all requests in this worker
+url_cache = TTLCache(
+    max_size=REDIRECT_CACHE_MAX_SIZE,
+    ttl=REDIRECT_CACHE_TTL_SECONDS,
+    negative_ttl=REDIRECT_CACHE_NEGATIVE_TTL_SECONDS
+)
+
+# Bloom filter of all short urls in storage, None unless enabled in the config
+short_url_filter = ShortUrlFilter(
+    false_positive_rate=SHORT_URL_FILTER_FALSE_POSITIVE_RATE,
+    max_bytes=SHORT_URL_FILTER_MAX_BYTES,
+    min_capacity=SHORT_URL_FILTER_MIN_CAPACITY
+) if SHORT_URL_FILTER_ENABLED else None
+
+registry.register(Collector(
+    "redirect_cache_events_total", "Redirect cache lookups and evictions.", "counter",
+    lambda: [((event,), url_cache.stats()[event]) for event in ("hits", "misses", "evictions")],
+    label_names=("event",)
+))
+registry.register(Collector(
+    "redirect_cache_size", "Short urls currently held in the redirect cache.", "gauge",
+    lambda: [((), url_cache.stats()["size"])]
+))
+registry.register(Collector(
+    "short_url_allocations_total", "Short urls handed out by the code allocator.", "counter",
+    lambda: [((), code_allocator.stats()["allocated"])]
+))
+registry.register(Collector(
+    "db_retries_total", "Retried DB calls by operation and reason (throttled or transient).", "counter",
+    lambda retrying_storage=storage: [
+        ((operation, reason), retries) for (operation, reason), retries in sorted(retrying_storage.stats().items())
+    ],
+    label_names=("operation", "reason")
+))
+registry.register(Collector(
+    "db_circuit_breaker_open", "Whether the DB circuit breaker is failing calls fast (1) or not (0).", "gauge",
+    lambda: [((), int(circuit_breaker.stats()["state"] != "closed"))]
+))
+registry.register(Collector(
+    "db_circuit_breaker_events_total", "Times the DB circuit breaker opened and DB calls it failed fast.", "counter",
+    lambda: [((event,), circuit_breaker.stats()[event]) for event in ("opened", "rejected")],
+    label_names=("event",)
+))
+registry.register(Collector(
+    "short_url_allocation_retries_total", "Generated short urls that were already taken and had to be replaced.",
+    "counter", lambda: [((), code_allocator.stats()["retries"])]
+))
+
+# Memory-mapped snapshot of the most clicked urls shared by all workers of the host, None unless enabled in the config
+hot_link_snapshot = HotLinkSnapshot(path=HOT_LINK_SNAPSHOT_PATH) if HOT_LINK_SNAPSHOT_PATH else None
+
+if hot_link_snapshot is not None:
+    registry.register(Collector(
+        "hot_link_snapshot_lookups_total", "Redirect cache misses looked up in the hot link snapshot.", "counter",
+        lambda: [((event,), hot_link_snapshot.stats()[event]) for event in ("hits", "misses")],
+        label_names=("event",)
+    ))
+    registry.register(Collector(
+        "hot_link_snapshot_entries", "Urls in the mapped hot link snapshot.", "gauge",
+        lambda: [((), hot_link_snapshot.stats()["entries"])]
+    ))
+
+if short_url_filter is not None:
+    registry.register(Collector(
+        "short_url_filter_rejections_total", "Lookups of missing short urls answered by the Bloom filter.", "counter",
+        lambda: [((), short_url_filter.stats()["rejected"])]
+    ))
+    registry.register(Collector(
+        "short_url_filter_size_bytes", "Memory used by the short url Bloom filter.", "gauge",
+        lambda: [((), short_url_filter.stats()["size_bytes"])]
+    ))
+
+
+def _expiry_timestamp(expires_at):
+    """
+    Turns an expires_at datetime into the Unix timestamp stored with a url, None (never expires) stays None.
+    """
+    return int(expires_at.timestamp()) if expires_at is not None else None
+
+
+def _item_expiry(url_item):
+    """
+    Returns the expiry of a Thread item or UrlRecord as a Unix timestamp, None if it never expires.
+    """
+    return _expiry_timestamp(url_item.expires_at)
+
+
+def _random_url_expiry(expires_at):
+    """
+    Returns the expiry timestamp of a random url, the configured default lifetime applies if expires_at is None.
+    """
+    if expires_at is None and RANDOM_URL_DEFAULT_TTL_SECONDS:
+        return int(time()) + RANDOM_URL_DEFAULT_TTL_SECONDS
+
+    return _expiry_timestamp(expires_at)
+
 
-def add_url_to_db(short_url, original_url):
+def add_url_to_db(short_url, original_url, url_hash=None, expires_at=None):
     """
-    Function that attempts to add a new key:value pair (short_url: original_url) to the DynamoDB database via PynamoDB.
+    Function that attempts to add a new key:value pair (short_url: original_url) to the database storage backend.
+    A url_hash is stored along with the pair so the original url can be looked up again in dedup mode.
+    expires_at is a Unix timestamp after which the url stops redirecting, None for never.
+    An expired short url is free to be taken again.
     Response, which includes payload and status_code, is returned to provide client with details of the API call.
     """
 
@@ -19,15 +142,17 @@ def add_url_to_db(short_url, original_url):
         "payload": ''
     }
 
-    # Create key:value pair to add to DB
-    new_item = Thread(short_url=short_url, original_url=original_url)
+    if is_expired(expires_at):
+        # Bad request, url would be expired right away
+        response["payload"] = "InvalidExpiry"
+        response["status_code"] = 400
+        return response
 
     try:
-        # Create condition to make sure Short Url isn't already in DB
-        condition = Thread.short_url.does_not_exist()
-
-        # Attempt to add item to DB
-        new_item.save(condition=condition)
+        # Attempt to add item to DB, only if Short Url isn't already in DB
+        storage.put_if_absent(
+            short_url=short_url, original_url=original_url, original_url_hash=url_hash, expires_at=expires_at
+        )
 
     except AttributeNullError:
         # Bad request, short_url is Null
@@ -39,8 +164,17 @@ def add_url_to_db(short_url, original_url):
         response["payload"] = "TypeError"
         response["status_code"] = 400
 
-    except PutError:
+    except PutError as error:
+        if is_transient(error):
+            # Internal Server Error, write failed (e.g. still throttled after retries)
+            response["payload"] = "DBConnectionError"
+            response["status_code"] = 500
+            return response
+
         # Condition failed, Short Url already exists in DB
+        if short_url_filter is not None:
+            short_url_filter.add(short_url)
+
         response["payload"] = "PutError"
         response["status_code"] = 409
 
@@ -51,6 +185,12 @@ def add_url_to_db(short_url, original_url):
 
     else:
         # Success, short Url was successfully added to DB
+        # Drop any cached DoesNotExist entry so the new url is served immediately
+        url_cache.invalidate(short_url)
+
+        if short_url_filter is not None:
+            short_url_filter.add(short_url)
+
         response["short_url"] = short_url
         response["payload"] = "Success"
         response["status_code"] = 200
@@ -58,18 +198,45 @@ def add_url_to_db(short_url, original_url):
     return response
 
 
-def add_custom_url_to_db(custom_url, original_url):
+def generate_random_short_url():
+    """
+    Function returns a new short url string from the configured code allocator.
+    """
+    return code_allocator.next_code()
+
+
+def find_existing_short_url(original_url, url_hash):
+    """
+    Function returns the short url an equivalent original url was already shortened to, None if there is none.
+    Lookup is best effort, DB errors are treated as no match so shortening can go ahead.
+    """
+    try:
+        url_item = storage.find_by_original_url_hash(url_hash)
+
+    except (DoesNotExist, PynamoDBConnectionError):
+        return None
+
+    # Guard against hash collisions, expired urls are about to be deleted
+    if normalize_url(url_item.original_url) != normalize_url(original_url) or is_expired(_item_expiry(url_item)):
+        return None
+
+    return url_item.short_url
+
+
+def add_custom_url_to_db(custom_url, original_url, expires_at=None):
     """
     Function attempts to add a new key:value pair (short_url: original_url) with custom key value.
+    An optional expires_at datetime sets when the url stops redirecting.
     Response, which includes payload and status_code, is returned to provide client with details of the API call.
     """
     # Call url adding function with custom_url parameter
-    return add_url_to_db(short_url=custom_url, original_url=original_url)
+    return add_url_to_db(short_url=custom_url, original_url=original_url, expires_at=_expiry_timestamp(expires_at))
 
 
-def add_random_url_to_db(original_url):
+def add_random_url_to_db(original_url, expires_at=None):
     """
     Function attempts to add a new key:value pair (short_url: original_url) using a randomly generated string as key.
+    An optional expires_at datetime sets when the url stops redirecting, otherwise the configured default applies.
     Response, which includes payload and status_code, is returned to provide client with details of the API call.
     """
     # Initialize response
@@ -79,24 +246,55 @@ def add_random_url_to_db(original_url):
         "payload": ''
     }
 
+    expiry = _random_url_expiry(expires_at)
+
+    if is_expired(expiry):
+        # Bad request, url would be expired right away
+        response["payload"] = "InvalidExpiry"
+        response["status_code"] = 400
+        return response
+
+    url_hash = None
+
+    # Urls with their own expiry are not shared, reusing one would change its lifetime
+    if DEDUP_ENABLED and expires_at is None:
+        # Reuse short url of an earlier shortening of the same original url, avoids writing a duplicate item
+        url_hash = original_url_hash(original_url)
+        existing_short_url = find_existing_short_url(original_url, url_hash)
+
+        if existing_short_url is not None:
+            response["short_url"] = existing_short_url
+            response["payload"] = "Success"
+            response["status_code"] = 200
+            return response
+
     # Initialize attempts to create and add random url to DB
     attempts = 1
 
     # Begin process of creating random url string, limit attempts to prevent excessive recursion/timeout
     while attempts < MAX_RANDOM_URL_ATTEMPTS:
-        # Generate secure random uuid
-        random_full_url = uuid4()
+        try:
+            # Generate random short url
+            random_short_url = generate_random_short_url()
 
-        # Truncate long uuid to shorter random string
-        random_short_url = str(random_full_url)[:SHORT_URL_LENGTH]
+        except PynamoDBConnectionError:
+            # Internal Server Error, allocator could not reach server
+            response["payload"] = "DBConnectionError"
+            response["status_code"] = 500
+            return response
 
         # Try to add url to DB
-        response = add_url_to_db(short_url=random_short_url, original_url=original_url)
+        response = add_url_to_db(
+            short_url=random_short_url, original_url=original_url, url_hash=url_hash, expires_at=expiry
+        )
 
-        # Check if url was successfully added to DB
-        if response["status_code"] == 200:
+        # Only a taken short url is worth another random one, other failures would fail again
+        if response["status_code"] != 409:
             return response
 
+        # Short url was not accepted, count it so allocator collisions can be monitored
+        code_allocator.record_retry()
+
         # Increment attempts and try again with a new random url
         attempts += 1
 
@@ -105,36 +303,241 @@ def add_random_url_to_db(original_url):
     return response
 
 
+def add_urls_to_db(records):
+    """
+    Function attempts to add many new key:value pairs (short_url: original_url) to the database in a few round trips.
+    Each record is a dict with an original_url, an optional custom_url and an optional expires_at datetime.
+    Records without custom_url get a random key and the default random url lifetime.
+    Records are written in chunks of conditional batch writes, so existing short urls are never overwritten.
+    Response payload holds one result per record, in input order, each with its own short_url, status_code & payload.
+    """
+    # Initialize response
+    response = {
+        "short_url": None,
+        "status_code": None,
+        "payload": ''
+    }
+
+    # Initialize per record results
+    results = [
+        {"short_url": None, "original_url": record["original_url"], "status_code": None, "payload": ''}
+        for record in records
+    ]
+
+    # Expiry timestamp of each record
+    expiries = [None] * len(records)
+
+    # Records waiting to be written, as [index, short_url, is_random, attempts]
+    pending = []
+    custom_urls_seen = set()
+
+    for index, record in enumerate(records):
+        custom_url = record.get("custom_url")
+
+        if custom_url:
+            expiries[index] = _expiry_timestamp(record.get("expires_at"))
+        else:
+            expiries[index] = _random_url_expiry(record.get("expires_at"))
+
+        if is_expired(expiries[index]):
+            # Bad request, url would be expired right away
+            results[index]["payload"] = "InvalidExpiry"
+            results[index]["status_code"] = 400
+            continue
+
+        if custom_url:
+            if custom_url in custom_urls_seen:
+                # Conflict, same custom url requested earlier in this batch
+                results[index]["payload"] = "PutError"
+                results[index]["status_code"] = 409
+                continue
+
+            custom_urls_seen.add(custom_url)
+            pending.append([index, custom_url, False, 1])
+
+        else:
+            try:
+                pending.append([index, generate_random_short_url(), True, 1])
+
+            except PynamoDBConnectionError:
+                # Internal Server Error, allocator could not reach server
+                results[index]["payload"] = "DBConnectionError"
+                results[index]["status_code"] = 500
+
+    while pending:
+        chunk = pending[:BULK_SHORTEN_CHUNK_SIZE]
+        pending = pending[BULK_SHORTEN_CHUNK_SIZE:]
+
+        try:
+            # Write whole chunk at once, every item must not exist yet
+            outcomes = storage.put_many_if_absent(
+                [(short_url, results[index]["original_url"], expiries[index]) for index, short_url, _, _ in chunk]
+            )
+
+        except PynamoDBConnectionError:
+            # Internal Server Error, batch failed as a whole (e.g. unreachable server)
+            for index, _, _, _ in chunk:
+                results[index]["payload"] = "DBConnectionError"
+                results[index]["status_code"] = 500
+            continue
+
+        # Longest backoff wanted by an item of this chunk that failed transiently
+        backoff = 0
+
+        # Sort out collisions and retry whatever was not written
+        for (index, short_url, is_random, attempts), outcome in zip(chunk, outcomes):
+            if outcome == BATCH_WRITTEN:
+                # Success, drop any cached DoesNotExist entry so the new url is served immediately
+                url_cache.invalidate(short_url)
+
+                if short_url_filter is not None:
+                    short_url_filter.add(short_url)
+
+                results[index]["short_url"] = short_url
+                results[index]["payload"] = "Success"
+                results[index]["status_code"] = 200
+
+            elif outcome == BATCH_NOT_ATTEMPTED:
+                # Item was not at fault, retry as is
+                pending.append([index, short_url, is_random, attempts])
+
+            elif outcome != BATCH_EXISTS:
+                if attempts < retry_policy.max_attempts:
+                    # Transient failure (e.g. throttling or transaction conflict), retry as is after a backoff
+                    pending.append([index, short_url, is_random, attempts + 1])
+                    backoff = max(backoff, retry_policy.backoff(attempts - 1))
+                else:
+                    # Internal Server Error, item kept failing
+                    results[index]["payload"] = outcome
+                    results[index]["status_code"] = 500
+
+            elif is_random and attempts < MAX_RANDOM_URL_ATTEMPTS:
+                # Random url collided, retry with a new one
+                code_allocator.record_retry()
+
+                try:
+                    pending.append([index, generate_random_short_url(), True, attempts + 1])
+
+                except PynamoDBConnectionError:
+                    # Internal Server Error, allocator could not reach server
+                    results[index]["payload"] = "DBConnectionError"
+                    results[index]["status_code"] = 500
+
+            else:
+                # Condition failed, Short Url already exists in DB
+                results[index]["payload"] = "PutError"
+                results[index]["status_code"] = 409
+
+        if backoff:
+            sleep(backoff)
+
+    # Batch processed, individual outcomes are in the per record results
+    response["payload"] = results
+    response["status_code"] = 200
+
+    return response
+
+
 def delete_item(short_url):
     """
     Function attempts to delete an existing key (short_url) in the database.
     Response, which includes payload and status_code, is returned to provide client with details of the API call.
     """
-    # Need to get actual item in order to delete item
-    response = get_one_url(short_url=short_url)
+    # Initialize response
+    response = {
+        "short_url": None,
+        "status_code": None,
+        "payload": ''
+    }
 
-    if response["status_code"] == 200:
-        # item retrieved, can now try to delete
-        try:
-            item_to_delete = response["payload"]
-            item_to_delete.delete()
+    try:
+        # Delete straight by key, a missing item is reported by the backend
+        storage.delete(short_url)
 
-        except DeleteError:
-            # Failed to delete
-            response["payload"] = "DeleteError"
-            response["status_code"] = 501
+    except TypeError:
+        # Bad request, short_url is invalid
+        response["payload"] = "TypeError"
+        response["status_code"] = 400
 
-        else:
-            # Success, url deleted
-            response["payload"] = "Successfully Deleted Item"
-            response["status_code"] = 200
+    except DoesNotExist:
+        # Not Found, Url not in DB
+        response["payload"] = "DoesNotExist"
+        response["status_code"] = 404
+
+    except DeleteError:
+        # Failed to delete
+        response["payload"] = "DeleteError"
+        response["status_code"] = 501
+
+    except PynamoDBConnectionError:
+        # Internal Server Error, unreachable server
+        response["payload"] = "DBConnectionError"
+        response["status_code"] = 500
+
+    else:
+        # Success, url deleted
+        response["short_url"] = short_url
+        response["payload"] = "Successfully Deleted Item"
+        response["status_code"] = 200
+
+    # Stop serving url from cache, also after a failure as the item may be gone anyway
+    if isinstance(short_url, str):
+        url_cache.invalidate(short_url)
+
+        if hot_link_snapshot is not None:
+            hot_link_snapshot.exclude(short_url)
 
     return response
 
 
-def get_all_urls():
+def apply_url_changes(changes):
+    """
+    Function drops short urls changed by any node or service from this worker's caches, as reported by the change feed.
+    Changes are (event name, short_url) with event names "INSERT", "MODIFY" or "REMOVE". Added urls also drop a cached
+    DoesNotExist and go into the short url filter, changed and deleted ones are hidden in the hot link snapshot.
+    """
+    for event_name, short_url in changes:
+        url_cache.invalidate(short_url)
+
+        if event_name == "INSERT":
+            if short_url_filter is not None:
+                short_url_filter.add(short_url)
+
+        elif hot_link_snapshot is not None:
+            hot_link_snapshot.exclude(short_url)
+
+
+def drop_cached_urls():
+    """
+    Function empties the redirect cache, hides the hot link snapshot and resets the short url filter, for when changes
+    made elsewhere may have been missed.
+    """
+    url_cache.clear()
+
+    if hot_link_snapshot is not None:
+        hot_link_snapshot.clear()
+
+    if short_url_filter is not None:
+        # Urls added elsewhere may be missing from the filter, none is rejected until it is rebuilt
+        short_url_filter.reset()
+
+
+def _list_urls(url_items):
+    """
+    Returns the listing entries of url_items, leaving out expired urls that storage has not removed yet.
+    """
+    now = time()
+
+    return [
+        {"short_url": url_item.short_url, "original_url": url_item.original_url}
+        for url_item in url_items if not is_expired(_item_expiry(url_item), now)
+    ]
+
+
+def get_all_urls(total_segments=None, read_capacity_per_second=None):
     """
     Function attempts to retrieve all existing key:value pairs (short_url: original_url) in the database.
+    DynamoDB is read by a parallel scan, total_segments and read_capacity_per_second default to the config values.
     Response, which includes payload and status_code, is returned to provide client with details of the API call.
     """
     # Initialize response
@@ -145,8 +548,11 @@ def get_all_urls():
     }
 
     try:
-        # Get all urls in DB
-        all_url_items = Thread.scan()
+        # Get all urls in DB, scan segments are read concurrently
+        all_url_items = storage.scan(total_segments=total_segments, read_capacity_per_second=read_capacity_per_second)
+
+        # Build url list while scanning, DB errors surface during iteration
+        urls = _list_urls(all_url_items)
 
     except PynamoDBConnectionError:
         # Internal Server Error, unreachable server
@@ -155,28 +561,108 @@ def get_all_urls():
 
     else:
         # Success, all urls retrieved
+        response["payload"] = urls
         response["status_code"] = 200
 
-        # Initialize payload format
-        response["payload"] = []
+    return response
+
+
+def _encode_cursor(next_key):
+    """
+    Turns a storage backend page key (e.g. DynamoDB's LastEvaluatedKey) into an opaque, url safe cursor string.
+    Returns None when the scan is finished.
+    """
+    if not next_key:
+        return None
 
-        # Add urls to payload
-        for url_item in all_url_items:
-            url = {
-                "short_url": url_item.short_url,
-                "original_url": url_item.original_url
-            }
+    return urlsafe_b64encode(dumps(next_key, separators=(",", ":")).encode()).decode()
 
-            # Add url to list
-            response["payload"].append(url)
+
+def _decode_cursor(cursor):
+    """
+    Turns a cursor created by _encode_cursor back into a storage backend page key, raises ValueError if malformed.
+    """
+    try:
+        next_key = loads(urlsafe_b64decode(cursor.encode()))
+
+    except (Base64Error, JSONDecodeError, UnicodeError):
+        raise ValueError("Malformed cursor")
+
+    if not next_key:
+        # Finished scans have no cursor, so this one was not issued by _encode_cursor
+        raise ValueError("Malformed cursor")
+
+    return next_key
+
+
+def get_url_page(limit, cursor=None):
+    """
+    Function attempts to retrieve one page of at most `limit` key:value pairs (short_url: original_url) from the
+    database.
+    The returned next_cursor is passed back in to fetch the following page, and is None once all urls have been read.
+    Expired urls are left out, so a page can hold fewer urls than limit.
+    Response, including payload, status_code & next_cursor, is returned to provide client with details of the API call.
+    """
+    # Initialize response
+    response = {
+        "short_url": None,
+        "status_code": None,
+        "payload": '',
+        "next_cursor": None
+    }
+
+    try:
+        # Resume scan where the previous page stopped
+        start_key = _decode_cursor(cursor) if cursor else None
+        url_items, next_key = storage.scan_page(limit=limit, start_key=start_key)
+
+    except ValueError:
+        # Bad request, cursor was not issued by this API
+        response["payload"] = "InvalidCursor"
+        response["status_code"] = 400
+
+    except PynamoDBConnectionError as error:
+        if cursor and error.cause_response_code == "ValidationException":
+            # Bad request, start key of the cursor rejected by DynamoDB
+            response["payload"] = "InvalidCursor"
+            response["status_code"] = 400
+        else:
+            # Internal Server Error, unreachable server
+            response["payload"] = "DBConnectionError"
+            response["status_code"] = 500
+
+    else:
+        # Success, page of urls retrieved
+        response["payload"] = _list_urls(url_items)
+        response["next_cursor"] = _encode_cursor(next_key)
+        response["status_code"] = 200
 
     return response
 
 
+def _snapshot_target(short_url):
+    """
+    Function returns (original_url, expires_at) of short_url from the hot link snapshot, None if it is not there.
+    Expired urls are skipped, as the short url may have been taken again since the snapshot was built.
+    """
+    if hot_link_snapshot is None:
+        return None
+
+    target = hot_link_snapshot.lookup(short_url)
+
+    if target is None or is_expired(target[1]):
+        return None
+
+    return target
+
+
 def get_one_url(short_url):
     """
     Function attempts to retrieve a specific key:value pair (short_url: original_url) from the database.
     Response, including payload, status_code, & url_item, is returned to provide client with details of the API call.
+    Lookups are served from url_cache or the hot link snapshot when possible, including recently seen DoesNotExist
+    results.
+    Expired urls get a 410 response, even before storage removes them.
     """
     # Initialize response
     response = {
@@ -185,9 +671,50 @@ def get_one_url(short_url):
         "payload": ''
     }
 
+    # Only string keys are cached, anything else is left to the DB call for its error handling
+    cacheable = isinstance(short_url, str)
+
+    if cacheable:
+        cached_target = url_cache.get(short_url)
+
+        if cached_target is None:
+            # Hot urls are served from the snapshot shared by all workers of the host
+            cached_target = _snapshot_target(short_url)
+
+        if cached_target is MISSING:
+            # Not Found, Url recently confirmed not in DB
+            response["payload"] = "DoesNotExist"
+            response["status_code"] = 404
+            return response
+
+        if cached_target is not None:
+            original_url, expires_at = cached_target
+
+            if is_expired(expires_at):
+                # Gone, url expired
+                response["payload"] = "Expired"
+                response["status_code"] = 410
+                return response
+
+            # Success, url retrieved from cache
+            expiry = datetime.fromtimestamp(expires_at, timezone.utc) if expires_at is not None else None
+            response["payload"] = UrlRecord(short_url, original_url, expiry)
+            response["short_url"] = short_url
+            response["status_code"] = 200
+            return response
+
+        if short_url_filter is not None and not short_url_filter.might_contain(short_url):
+            # Not Found, short url was never added
+            response["payload"] = "DoesNotExist"
+            response["status_code"] = 404
+            return response
+
+    # Taken before the read, so a url invalidated while it is being read is not cached
+    cache_token = url_cache.token(short_url) if cacheable else None
+
     try:
         # Get url key pair in DB
-        url_item = Thread.get(short_url)
+        url_item = storage.get(short_url)
 
     except TypeError:
         # Bad request, issue with getting item from DB
@@ -201,10 +728,24 @@ def get_one_url(short_url):
 
     except DoesNotExist:
         # Not Found, Url not in DB
+        if cacheable:
+            url_cache.set_missing(short_url, cache_token)
+
         response["payload"] = "DoesNotExist"
         response["status_code"] = 404
 
     else:
+        expires_at = _item_expiry(url_item)
+
+        if cacheable:
+            url_cache.set(short_url, (url_item.original_url, expires_at), cache_token)
+
+        if is_expired(expires_at):
+            # Gone, url expired but not yet removed by storage
+            response["payload"] = "Expired"
+            response["status_code"] = 410
+            return response
+
         # Success, url retrieved
         response["payload"] = url_item
         response["short_url"] = url_item.short_url
@@ -213,21 +754,149 @@ def get_one_url(short_url):
     return response
 
 
-def reset_db():
+def rebuild_short_url_filter():
+    """
+    Function rebuilds the short url Bloom filter from a full scan of the database.
+    Response, including payload and status_code, is returned to provide client with details of the call.
+    """
+    # Initialize response
+    response = {
+        "short_url": None,
+        "status_code": None,
+        "payload": ''
+    }
+
+    try:
+        count = short_url_filter.rebuild(url_item.short_url for url_item in storage.scan())
+
+    except PynamoDBConnectionError:
+        # Internal Server Error, unreachable server, previous filter stays in use
+        response["payload"] = "DBConnectionError"
+        response["status_code"] = 500
+
+    else:
+        # Success, filter holds every short url found
+        response["payload"] = f"Filter Rebuilt With {count} Items"
+        response["status_code"] = 200
+
+    return response
+
+
+def peek_redirect_target(short_url):
+    """
+    Function answers a redirect lookup from memory alone (cache and hot link snapshot), without touching the database.
+    Returns the cached (original_url, expires_at), MISSING if the short url is known not to exist,
+    or None if the DB must be asked.
+    """
+    cached_target = url_cache.get(short_url)
+
+    if cached_target is None:
+        cached_target = _snapshot_target(short_url)
+
+    if cached_target is not None:
+        return cached_target
+
+    if short_url_filter is not None and not short_url_filter.might_contain(short_url):
+        return MISSING
+
+    return None
+
+
+def load_redirect_target(short_url):
+    """
+    Function reads only the original url and expiry of short_url from the database and caches the result.
+    Returns (original_url, expires_at), or None if short_url does not exist.
+    Raises PynamoDBConnectionError if the DB failed.
+    """
+    # Taken before the read, so a url invalidated while it is being read is not cached
+    cache_token = url_cache.token(short_url)
+
+    try:
+        target = storage.get_redirect_target(short_url)
+
+    except DoesNotExist:
+        url_cache.set_missing(short_url, cache_token)
+        return None
+
+    url_cache.set(short_url, target, cache_token)
+    return target
+
+
+def find_redirect_target(short_url):
+    """
+    Function returns (original_url, expires_at) of short_url, or None if it does not exist. Callers check the expiry.
+    Lean variant of get_one_url for redirects: no response dict and no model instance are built.
+    Raises PynamoDBConnectionError if the DB failed.
+    """
+    target = peek_redirect_target(short_url)
+
+    if target is None:
+        return load_redirect_target(short_url)
+
+    return None if target is MISSING else target
+
+
+def purge_all_urls(total_segments=None, read_capacity_per_second=None, recreate_table=False):
+    """
+    Function attempts to remove all key:value pairs in the database in bulk.
+    On DynamoDB each scan segment is deleted by its own worker using batched deletes, with no per item get or delete.
+    With recreate_table the URL table is dropped and created again instead, which is faster for very large tables.
+    Response, including payload and status_code, is returned to provide client with details of the API call.
+    """
+    # Initialize response
+    response = {
+        "short_url": None,
+        "status_code": None,
+        "payload": ''
+    }
+
+    try:
+        if recreate_table:
+            # Drop whole table, item count is unknown
+            storage.recreate()
+            deleted = None
+
+        else:
+            # Delete all items in bulk
+            deleted = storage.purge(total_segments=total_segments, read_capacity_per_second=read_capacity_per_second)
+
+    except PynamoDBConnectionError:
+        # Internal Server Error, unreachable server or failed batch
+        response["payload"] = "DBConnectionError"
+        response["status_code"] = 500
+
+    else:
+        # Success, all urls deleted
+        if deleted is None:
+            response["payload"] = "Successfully Deleted All Items"
+        else:
+            response["payload"] = f"Successfully Deleted {deleted} Items"
+        response["status_code"] = 200
+
+    # Some items may be gone even after a failure, drop everything cached
+    url_cache.clear()
+
+    if hot_link_snapshot is not None:
+        hot_link_snapshot.clear()
+
+    return response
+
+
+def reset_db(total_segments=None, read_capacity_per_second=None, recreate_table=False):
     """
     Function attempts to remove all key:value pairs in database and reset it to original state.
+    Items are removed in bulk by purge_all_urls, see there for the parameters.
     Response, including payload and status_code, is returned to provide client with details of the API call.
     """
 
-    # Get all urls in DB
-    response = get_all_urls()
+    # Remove all entries from DB
+    response = purge_all_urls(
+        total_segments=total_segments,
+        read_capacity_per_second=read_capacity_per_second,
+        recreate_table=recreate_table
+    )
 
     if response["status_code"] == 200:
-        # Remove all entries from DB
-        for url in response["payload"]:
-            short_url = url["short_url"]
-            delete_item(short_url)
-
         # Repopulate with existing url
         response = add_custom_url_to_db(custom_url="existing_url", original_url="https://www.google.com")
 
@@ -0,0 +1,48 @@
+from hashlib import sha256
+from urllib.parse import urlsplit, urlunsplit
+
+# Ports implied by the scheme, dropped so "http://a.com:80/" and "http://a.com/" match
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url):
+    """
+    Function returns a canonical form of url so trivially different spellings of the same address compare equal:
+    scheme and host are lowercased, default ports are dropped and an empty path becomes "/".
+    Path, query and fragment are case sensitive and kept as they are, single page apps route by the fragment.
+    Urls that cannot be parsed are returned stripped.
+    """
+    url = url.strip()
+
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+
+    except ValueError:
+        return url
+
+    if not parts.scheme or not parts.hostname:
+        return url
+
+    scheme = parts.scheme.lower()
+    netloc = parts.hostname.lower()
+
+    if ":" in netloc:
+        # IPv6 literal
+        netloc = f"[{netloc}]"
+
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        netloc += f":{port}"
+
+    if parts.username is not None:
+        credentials = parts.username + (f":{parts.password}" if parts.password is not None else "")
+        netloc = f"{credentials}@{netloc}"
+
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, parts.fragment))
+
+
+def original_url_hash(url):
+    """
+    Function returns the key of url in the original url index, the SHA-256 hex digest of its normalized form.
+    """
+    return sha256(normalize_url(url).encode()).hexdigest()
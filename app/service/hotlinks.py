@@ -0,0 +1,262 @@
+import fcntl
+import mmap
+import os
+import struct
+from contextlib import contextmanager
+from hashlib import blake2b
+from threading import Lock
+from time import time
+
+# File layout, all integers little endian:
+#   header   magic, slot count (a power of 2), entry count, created at (milliseconds since the epoch)
+#   slots    slot count x (64 bit key hash, 0 for an empty slot; offset of the record)
+#   records  key length, original url length, expires at (-1 for never), key bytes, original url bytes
+# Slots are an open addressing hash table with linear probing, at most half full so probe runs stay short
+MAGIC = b"HLS1"
+HEADER = struct.Struct("<4sIIQ")
+SLOT = struct.Struct("<QI")
+RECORD = struct.Struct("<HIq")
+
+NO_EXPIRY = -1
+
+
+def _key_hash(key):
+    # 0 marks empty slots, so it is never used as a hash
+    return int.from_bytes(blake2b(key, digest_size=8).digest(), "little") or 1
+
+
+def write_snapshot(path, targets, created_at=None):
+    """
+    Function writes (short_url, original_url, expires_at) targets as a snapshot file and publishes it at path in one
+    step. Workers that mapped the previous file keep reading it until they remap, a crash leaves the old file in place.
+    Returns the number of urls written.
+    """
+    if created_at is None:
+        created_at = time()
+
+    records = bytearray()
+    # hash --> [(key, offset of record relative to the records)]
+    entries = []
+
+    for short_url, original_url, expires_at in targets:
+        key = short_url.encode()
+        value = original_url.encode()
+
+        entries.append((_key_hash(key), len(records)))
+        records += RECORD.pack(len(key), len(value), NO_EXPIRY if expires_at is None else int(expires_at))
+        records += key + value
+
+    slot_count = 8
+    while slot_count < 2 * len(entries):
+        slot_count *= 2
+
+    records_offset = HEADER.size + slot_count * SLOT.size
+    slots = bytearray(slot_count * SLOT.size)
+    mask = slot_count - 1
+
+    for key_hash, record_offset in entries:
+        index = key_hash & mask
+        while SLOT.unpack_from(slots, index * SLOT.size)[0]:
+            index = (index + 1) & mask
+
+        SLOT.pack_into(slots, index * SLOT.size, key_hash, records_offset + record_offset)
+
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+
+    with open(temporary_path, "wb") as snapshot_file:
+        snapshot_file.write(HEADER.pack(MAGIC, slot_count, len(entries), int(created_at * 1000)))
+        snapshot_file.write(slots)
+        snapshot_file.write(records)
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+
+    # Rename is atomic, readers either open the old or the new file
+    os.replace(temporary_path, path)
+    return len(entries)
+
+
+@contextmanager
+def snapshot_build_lock(path):
+    """
+    Holds an exclusive lock shared by all processes of a host while one of them builds the snapshot at path.
+    Yields whether the lock was taken, it is not waited for.
+    """
+    with open(path + ".lock", "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+        except BlockingIOError:
+            yield False
+            return
+
+        try:
+            yield True
+
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def snapshot_age(path, now=None):
+    """
+    Function returns the seconds since the snapshot at path was published, None if there is none.
+    """
+    try:
+        modified_at = os.stat(path).st_mtime
+
+    except FileNotFoundError:
+        return None
+
+    return (time() if now is None else now) - modified_at
+
+
+class _MappedSnapshot:
+    """
+    One published snapshot file, mapped read-only. Pages are shared with every other process mapping the same file.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as snapshot_file:
+            file_id = os.fstat(snapshot_file.fileno())
+            self.buffer = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.file_id = (file_id.st_ino, file_id.st_mtime_ns)
+
+        magic, self.slot_count, self.entry_count, created_at = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or len(self.buffer) < HEADER.size + self.slot_count * SLOT.size:
+            raise ValueError(f"Not a hot link snapshot: {path}")
+
+        self.created_at = created_at / 1000
+
+    def lookup(self, short_url):
+        buffer = self.buffer
+        key = short_url.encode()
+        key_hash = _key_hash(key)
+        mask = self.slot_count - 1
+        index = key_hash & mask
+
+        while True:
+            slot_hash, record_offset = SLOT.unpack_from(buffer, HEADER.size + index * SLOT.size)
+
+            if not slot_hash:
+                return None
+
+            if slot_hash == key_hash:
+                key_length, value_length, expires_at = RECORD.unpack_from(buffer, record_offset)
+                key_offset = record_offset + RECORD.size
+
+                # Only the key and the url are copied out of the mapping
+                if buffer[key_offset:key_offset + key_length] == key:
+                    value_offset = key_offset + key_length
+                    original_url = buffer[value_offset:value_offset + value_length].decode()
+                    return original_url, None if expires_at == NO_EXPIRY else expires_at
+
+            index = (index + 1) & mask
+
+
+class HotLinkSnapshot:
+    """
+    Read-only view of the hot link snapshot file, a hash table of the most clicked short url --> (original_url,
+    expires_at) mappings. Every worker of a host maps the same file, so it costs the host one copy in the page cache
+    however many workers there are, and needs no warm up after a restart.
+    refresh() picks up a newly published file, lookups of other threads keep using the old mapping until it is dropped.
+    Short urls deleted by this worker are hidden until a snapshot built after the delete is mapped, after clear() the
+    whole snapshot is.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._snapshot = None
+
+        # short_url --> time it was deleted by this worker
+        self._excluded = {}
+        # Snapshots built before this time are not served
+        self._cleared_at = 0
+
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def refresh(self):
+        """
+        Maps the file at path if it was replaced since the last call. Returns whether a new snapshot was mapped.
+        A missing or malformed file keeps the current snapshot in use.
+        """
+        try:
+            file_id = os.stat(self.path)
+
+        except FileNotFoundError:
+            return False
+
+        current = self._snapshot
+        if current is not None and current.file_id == (file_id.st_ino, file_id.st_mtime_ns):
+            return False
+
+        try:
+            snapshot = _MappedSnapshot(self.path)
+
+        except (OSError, ValueError, struct.error):
+            return False
+
+        with self._lock:
+            # Deletes the new snapshot was built after are already left out of it
+            self._excluded = {
+                short_url: deleted_at for short_url, deleted_at in self._excluded.items()
+                if deleted_at >= snapshot.created_at
+            }
+
+        # The old mapping is unmapped once no lookup holds it anymore
+        self._snapshot = snapshot
+        return True
+
+    def lookup(self, short_url):
+        """
+        Returns (original_url, expires_at) of short_url, or None if it is not in the snapshot.
+        """
+        snapshot = self._snapshot
+
+        if snapshot is None:
+            return None
+
+        if short_url in self._excluded or snapshot.created_at < self._cleared_at:
+            target = None
+        else:
+            target = snapshot.lookup(short_url)
+
+        with self._lock:
+            if target is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return target
+
+    def exclude(self, short_url):
+        """
+        Stops serving short_url from the current snapshot, e.g. after it was deleted.
+        """
+        with self._lock:
+            self._excluded[short_url] = time()
+
+    def clear(self):
+        """
+        Stops serving every url of the current snapshot, e.g. after all urls were deleted or changes may have been
+        missed. Lookups find nothing until a snapshot built after the call is mapped.
+        """
+        with self._lock:
+            self._cleared_at = time()
+            self._excluded = {}
+
+    def stats(self):
+        """
+        Returns a snapshot of the lookup counters and of the mapped file.
+        """
+        snapshot = self._snapshot
+
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": snapshot.entry_count if snapshot is not None else 0,
+                "size_bytes": len(snapshot.buffer) if snapshot is not None else 0,
+                "created_at": snapshot.created_at if snapshot is not None else None
+            }
@@ -0,0 +1,206 @@
+import asyncio
+from app.config import EVENT_LOOP_LAG_INTERVAL_SECONDS
+from bisect import bisect_left
+from threading import Lock
+from time import monotonic, perf_counter
+
+# Latency buckets in seconds, from sub-millisecond cache hits up to slow full-table requests
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _format_labels(label_names, label_values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(label_names, label_values)]
+
+    if extra:
+        pairs.append(extra)
+
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    Prometheus style histogram with one series per combination of label values.
+    Observing is a bisect and two additions under a lock, cheap enough for every request.
+    """
+
+    def __init__(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+
+        # label values --> [bucket counts..., +Inf count, sum]
+        self._series = {}
+        self._lock = Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+
+        with self._lock:
+            series = self._series.get(label_values)
+
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+
+        with self._lock:
+            snapshot = {label_values: list(series) for label_values, series in self._series.items()}
+
+        for label_values, series in sorted(snapshot.items()):
+            cumulative = 0
+
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                labels = _format_labels(self.label_names, label_values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+
+            labels = _format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+
+        return lines
+
+
+class Collector:
+    """
+    Metric whose samples are read from a callback at scrape time, e.g. counters kept by the cache or allocator.
+    The callback returns a list of (label values, value) pairs.
+    """
+
+    def __init__(self, name, documentation, metric_type, callback, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.metric_type = metric_type
+        self.callback = callback
+        self.label_names = tuple(label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+
+        for label_values, value in self.callback():
+            lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}")
+
+        return lines
+
+
+class Registry:
+    """
+    Holds all metrics of this worker and renders them in the Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+
+        for metric in self._metrics:
+            lines.extend(metric.render())
+
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds",
+    "Latency of HTTP requests by route template, method and status code.",
+    label_names=("route", "method", "status")
+))
+
+db_operation_duration = registry.register(Histogram(
+    "db_operation_duration_seconds",
+    "Latency of storage backend calls by backend, operation and outcome (ok or exception name).",
+    label_names=("backend", "operation", "outcome")
+))
+
+event_loop_lag = registry.register(Histogram(
+    "event_loop_lag_seconds",
+    "Delay between when the event loop should have woken a sleeping task and when it did."
+))
+
+
+class InstrumentedStorage:
+    """
+    Wraps a storage backend, timing every call and recording its outcome in db_operation_duration.
+    """
+
+    # Backend methods that are timed, scan is timed over the whole iteration
+    OPERATIONS = (
+        "put_if_absent", "put_many_if_absent", "get", "get_redirect_target", "get_redirect_targets",
+        "find_by_original_url_hash", "delete", "scan_page", "purge", "recreate", "increment_counter", "add_clicks",
+        "set_clicks", "query_clicks", "add_pending_rollup", "pending_rollups", "remove_pending_rollup", "put_top",
+        "query_top"
+    )
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.name = backend.name
+
+        for operation in self.OPERATIONS:
+            setattr(self, operation, self._timed(operation, getattr(backend, operation)))
+
+    def _timed(self, operation, method):
+        backend_name = self.name
+
+        def timed_method(*args, **kwargs):
+            start = perf_counter()
+            outcome = "ok"
+
+            try:
+                return method(*args, **kwargs)
+
+            except Exception as error:
+                outcome = type(error).__name__
+                raise
+
+            finally:
+                db_operation_duration.observe(perf_counter() - start, backend_name, operation, outcome)
+
+        return timed_method
+
+    def scan(self, *args, **kwargs):
+        start = perf_counter()
+        outcome = "ok"
+
+        try:
+            yield from self.backend.scan(*args, **kwargs)
+
+        except Exception as error:
+            outcome = type(error).__name__
+            raise
+
+        finally:
+            db_operation_duration.observe(perf_counter() - start, self.name, "scan", outcome)
+
+    def __getattr__(self, name):
+        # Anything not instrumented goes straight to the backend
+        return getattr(self.backend, name)
+
+
+async def monitor_event_loop_lag(interval=EVENT_LOOP_LAG_INTERVAL_SECONDS):
+    """
+    Background task measuring how late the event loop wakes up a task sleeping for interval seconds.
+    Lag means something is blocking the loop or the worker is overloaded.
+    """
+    while True:
+        start = monotonic()
+        await asyncio.sleep(interval)
+        event_loop_lag.observe(max(0.0, monotonic() - start - interval))
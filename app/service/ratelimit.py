@@ -0,0 +1,167 @@
+from app.config import (
+    LIST_URLS_MAX_CONCURRENCY, RATE_LIMIT_BACKEND, RATE_LIMIT_ENABLED, RATE_LIMIT_LIST_BURST,
+    RATE_LIMIT_LIST_PER_SECOND, RATE_LIMIT_MAX_CLIENTS, RATE_LIMIT_REDIRECT_BURST, RATE_LIMIT_REDIRECT_PER_SECOND,
+    RATE_LIMIT_REDIS_URL, RATE_LIMIT_SHORTEN_BURST, RATE_LIMIT_SHORTEN_PER_SECOND
+)
+from app.service.metrics import Collector, registry
+from collections import OrderedDict
+from time import monotonic
+
+
+class MemoryBucketStore:
+    """
+    Token buckets of this worker, bounded to max_size clients with least recently used buckets dropped first.
+    A dropped bucket starts over full, which can only let a client through earlier, never later.
+    Only used from the event loop, so it takes no lock.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+
+        # bucket key --> (tokens, monotonic time of last update)
+        self._buckets = OrderedDict()
+
+    async def take(self, key, rate, burst, cost=1):
+        """
+        Takes cost tokens from the bucket of key, refilled at rate tokens per second up to burst tokens.
+        Returns 0 if the tokens were taken, otherwise the seconds until enough tokens are available.
+        """
+        now = monotonic()
+        tokens, updated = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+
+        if tokens >= cost:
+            tokens -= cost
+            retry_after = 0
+        else:
+            retry_after = (cost - tokens) / rate
+
+        self._buckets[key] = (tokens, now)
+
+        if len(self._buckets) > self.max_size:
+            self._buckets.popitem(last=False)
+
+        return retry_after
+
+    def clear(self):
+        self._buckets.clear()
+
+
+def create_bucket_store(backend_name=None):
+    """
+    Function returns the token bucket store selected in the config: "memory" (default) or "redis".
+    """
+    if backend_name is None:
+        backend_name = RATE_LIMIT_BACKEND
+
+    if backend_name == "memory":
+        return MemoryBucketStore(max_size=RATE_LIMIT_MAX_CLIENTS)
+
+    if backend_name == "redis":
+        from app.service.ratelimit_redis import RedisBucketStore
+        return RedisBucketStore(url=RATE_LIMIT_REDIS_URL)
+
+    raise ValueError(f"Unknown rate limit backend: {backend_name}")
+
+
+class ConcurrencyLimit:
+    """
+    Counts requests of a route group in progress in this worker, turning new ones away once limit are running.
+    Only used from the event loop, so it takes no lock.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+
+    def try_acquire(self):
+        if self.limit and self.active >= self.limit:
+            return False
+
+        self.active += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+
+
+class RateLimiter:
+    """
+    Per client token bucket limits and per worker concurrency limits of route groups (e.g. "shorten", "list").
+    Counts rejected requests by group and reason for /metrics.
+    """
+
+    def __init__(self, store, limits, concurrency_limits, enabled=True):
+        self.store = store
+        # route group --> (tokens per second, burst), groups without a rate are not limited
+        self.limits = limits
+        # route group --> ConcurrencyLimit
+        self.concurrency_limits = {group: ConcurrencyLimit(limit) for group, limit in concurrency_limits.items()}
+        self.enabled = enabled
+
+        # (route group, reason) --> requests rejected
+        self.rejected = {}
+
+    async def take(self, client, group):
+        """
+        Returns 0 if client may send a request to group now, otherwise the seconds it should wait.
+        """
+        if not self.enabled:
+            return 0
+
+        rate, burst = self.limits.get(group, (0, 0))
+
+        if not rate:
+            return 0
+
+        retry_after = await self.store.take(f"{group}:{client}", rate, burst)
+
+        if retry_after:
+            self._count_rejected(group, "rate_limit")
+
+        return retry_after
+
+    def try_start(self, group):
+        """
+        Returns the ConcurrencyLimit slot taken for a request to group, None if there is no limit (or limits are
+        disabled), or False if group is already serving as many requests as it may.
+        """
+        concurrency_limit = self.concurrency_limits.get(group)
+
+        if not self.enabled or concurrency_limit is None or not concurrency_limit.limit:
+            return None
+
+        if not concurrency_limit.try_acquire():
+            self._count_rejected(group, "concurrency")
+            return False
+
+        return concurrency_limit
+
+    def _count_rejected(self, group, reason):
+        self.rejected[(group, reason)] = self.rejected.get((group, reason), 0) + 1
+
+    def stats(self):
+        """
+        Returns a snapshot of the rejected request counters.
+        """
+        return dict(self.rejected)
+
+
+rate_limiter = RateLimiter(
+    store=create_bucket_store(),
+    limits={
+        "shorten": (RATE_LIMIT_SHORTEN_PER_SECOND, RATE_LIMIT_SHORTEN_BURST),
+        "list": (RATE_LIMIT_LIST_PER_SECOND, RATE_LIMIT_LIST_BURST),
+        "redirect": (RATE_LIMIT_REDIRECT_PER_SECOND, RATE_LIMIT_REDIRECT_BURST)
+    },
+    concurrency_limits={"list": LIST_URLS_MAX_CONCURRENCY},
+    enabled=RATE_LIMIT_ENABLED
+)
+
+registry.register(Collector(
+    "rate_limited_requests_total",
+    "Requests turned away by route group and reason (rate_limit per client, concurrency per worker).",
+    "counter",
+    lambda: [((group, reason), count) for (group, reason), count in sorted(rate_limiter.stats().items())],
+    label_names=("group", "reason")
+))
@@ -0,0 +1,53 @@
+import redis.asyncio as redis
+from time import time
+
+# Prefix of bucket keys, keeps them apart from other data in the same Redis database
+KEY_PREFIX = "rate_limit:"
+
+# Refills and takes from a bucket in one atomic step, buckets expire once they would be full again
+TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated")
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    retry_after = (cost - tokens) / rate
+end
+
+redis.call("HSET", KEYS[1], "tokens", tokens, "updated", now)
+redis.call("PEXPIRE", KEYS[1], math.ceil(burst / rate * 1000))
+
+return tostring(retry_after)
+"""
+
+
+class RedisBucketStore:
+    """
+    Token buckets kept in Redis, shared by every worker and instance using the same Redis database.
+    Bucket times come from the caller's clock, so the clocks of all instances should be in sync.
+    """
+
+    def __init__(self, url):
+        self._client = redis.from_url(url)
+        self._take = self._client.register_script(TAKE_SCRIPT)
+
+    async def take(self, key, rate, burst, cost=1):
+        """
+        Same as MemoryBucketStore.take. Lets the request through if Redis cannot be reached,
+        so an outage of the limiter does not take the whole service down with it.
+        """
+        try:
+            return float(await self._take(keys=[KEY_PREFIX + key], args=[rate, burst, cost, time()]))
+
+        except redis.RedisError:
+            return 0
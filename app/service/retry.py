@@ -0,0 +1,264 @@
+from app.config import (
+    DB_CIRCUIT_BREAKER_FAILURE_THRESHOLD, DB_CIRCUIT_BREAKER_RESET_SECONDS, DB_REQUEST_DEADLINE_SECONDS,
+    DB_RETRY_BASE_BACKOFF_SECONDS, DB_RETRY_MAX_ATTEMPTS, DB_RETRY_MAX_BACKOFF_SECONDS
+)
+from pynamodb.exceptions import PynamoDBConnectionError, PynamoDBException
+from random import uniform
+from threading import Lock, local
+from time import monotonic, sleep
+
+# DynamoDB error codes of requests rejected for going over capacity, nothing was written
+THROTTLING_ERROR_CODES = frozenset((
+    "ProvisionedThroughputExceededException", "ThrottlingException", "RequestLimitExceeded"
+))
+
+# DynamoDB error codes of server side failures that are expected to go away
+TRANSIENT_ERROR_CODES = frozenset(("InternalServerError", "ServiceUnavailable", "TransactionConflictException"))
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(PynamoDBConnectionError):
+    """
+    Raised instead of calling the DB while the circuit breaker is open.
+    """
+    msg = "Circuit breaker is open, DB calls fail fast"
+
+
+class DeadlineExceeded(PynamoDBConnectionError):
+    """
+    Raised instead of calling the DB once the request deadline has passed.
+    """
+    msg = "Request deadline exceeded"
+
+
+def is_throttled(error):
+    """
+    Function returns whether error is DynamoDB turning a request away for going over capacity.
+    """
+    return isinstance(error, PynamoDBException) and error.cause_response_code in THROTTLING_ERROR_CODES
+
+
+def is_transient(error):
+    """
+    Function returns whether error is a DB failure worth retrying: throttling, a server side error, or a request
+    that got no response at all (unreachable server, timeout). Errors raised by the local backends without a cause,
+    e.g. a PutError for a taken short url, are answers of a healthy DB.
+    """
+    if not isinstance(error, PynamoDBConnectionError) or isinstance(error, (CircuitOpenError, DeadlineExceeded)):
+        return False
+
+    code = error.cause_response_code
+
+    if code is None:
+        return error.cause is not None
+
+    return code in THROTTLING_ERROR_CODES or code in TRANSIENT_ERROR_CODES
+
+
+_deadline = local()
+
+
+def run_with_deadline(func, seconds=DB_REQUEST_DEADLINE_SECONDS):
+    """
+    Function calls func with a deadline shared by every storage call func makes on this thread, including retries.
+    """
+    previous = getattr(_deadline, "value", None)
+    _deadline.value = monotonic() + seconds
+
+    try:
+        return func()
+
+    finally:
+        _deadline.value = previous
+
+
+def current_deadline():
+    """
+    Function returns the deadline set by run_with_deadline on this thread, or None outside of it.
+    """
+    return getattr(_deadline, "value", None)
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter: the wait before retry n is a random time up to min(max, base * 2**n),
+    which spreads the retries of many clients throttled at the same moment.
+    """
+
+    def __init__(self, max_attempts, base_backoff, max_backoff, deadline_seconds):
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.deadline_seconds = deadline_seconds
+
+    def backoff(self, retry):
+        return uniform(0, min(self.max_backoff, self.base_backoff * 2 ** retry))
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failed DB calls, so while the DB is unhealthy requests fail fast
+    instead of piling up on the DB thread pool. After reset_seconds a single trial call is let through (half open),
+    its outcome closes the breaker again or keeps it open for another reset_seconds.
+    """
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+        self._lock = Lock()
+        self.state = CIRCUIT_CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._trial_in_flight = False
+
+        self.opened = 0
+        self.rejected = 0
+
+    def before_call(self):
+        """
+        Raises CircuitOpenError if the call must not go to the DB.
+        """
+        with self._lock:
+            if self.state == CIRCUIT_CLOSED:
+                return
+
+            if self.state == CIRCUIT_OPEN and monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = CIRCUIT_HALF_OPEN
+
+            if self.state == CIRCUIT_HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+
+            self.rejected += 1
+
+        raise CircuitOpenError()
+
+    def record(self, failed):
+        """
+        Records the outcome of a call let through by before_call.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+            if not failed:
+                self.state = CIRCUIT_CLOSED
+                self._failures = 0
+                return
+
+            self._failures += 1
+
+            if self.state == CIRCUIT_HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != CIRCUIT_OPEN:
+                    self.opened += 1
+
+                self.state = CIRCUIT_OPEN
+                self._opened_at = monotonic()
+
+    def stats(self):
+        """
+        Returns a snapshot of the breaker state and counters.
+        """
+        with self._lock:
+            return {"state": self.state, "opened": self.opened, "rejected": self.rejected}
+
+
+class RetryingStorage:
+    """
+    Wraps a storage backend, running its calls through a circuit breaker and retrying failed calls with backoff
+    until the request deadline. Reads are retried on any transient error. Writes are only retried when throttled,
+    as after other errors they may have been applied, and a retried conditional write would then fail as a collision.
+    Full table operations (scan, purge, recreate) and anything else go straight to the backend.
+    """
+
+    READ_OPERATIONS = (
+        "get", "get_redirect_target", "get_redirect_targets", "find_by_original_url_hash", "scan_page", "query_clicks",
+        "pending_rollups", "query_top"
+    )
+    WRITE_OPERATIONS = ("put_if_absent", "put_many_if_absent", "delete", "increment_counter", "add_clicks")
+    # Writes that leave the same state when applied twice, retried like reads
+    IDEMPOTENT_WRITE_OPERATIONS = ("set_clicks", "add_pending_rollup", "remove_pending_rollup", "put_top")
+
+    def __init__(self, backend, policy, breaker):
+        self.backend = backend
+        self.policy = policy
+        self.breaker = breaker
+
+        # (operation, reason) --> retries
+        self._stats_lock = Lock()
+        self.retries = {}
+
+        for operation in self.READ_OPERATIONS + self.IDEMPOTENT_WRITE_OPERATIONS:
+            setattr(self, operation, self._retrying(operation, getattr(backend, operation), is_transient))
+
+        for operation in self.WRITE_OPERATIONS:
+            setattr(self, operation, self._retrying(operation, getattr(backend, operation), is_throttled))
+
+    def _retrying(self, operation, method, should_retry):
+        policy = self.policy
+        breaker = self.breaker
+
+        def retrying_method(*args, **kwargs):
+            deadline = current_deadline() or monotonic() + policy.deadline_seconds
+            retry = 0
+
+            while True:
+                if monotonic() >= deadline:
+                    raise DeadlineExceeded()
+
+                breaker.before_call()
+
+                try:
+                    result = method(*args, **kwargs)
+
+                except Exception as error:
+                    breaker.record(failed=is_transient(error))
+
+                    if retry + 1 >= policy.max_attempts or not should_retry(error):
+                        raise
+
+                    delay = policy.backoff(retry)
+
+                    if monotonic() + delay >= deadline:
+                        raise
+
+                    self._count_retry(operation, "throttled" if is_throttled(error) else "transient")
+                    sleep(delay)
+                    retry += 1
+
+                else:
+                    breaker.record(failed=False)
+                    return result
+
+        return retrying_method
+
+    def _count_retry(self, operation, reason):
+        with self._stats_lock:
+            self.retries[(operation, reason)] = self.retries.get((operation, reason), 0) + 1
+
+    def stats(self):
+        """
+        Returns a snapshot of the retry counters.
+        """
+        with self._stats_lock:
+            return dict(self.retries)
+
+    def __getattr__(self, name):
+        # Anything not retried goes straight to the backend
+        return getattr(self.backend, name)
+
+
+retry_policy = RetryPolicy(
+    max_attempts=DB_RETRY_MAX_ATTEMPTS,
+    base_backoff=DB_RETRY_BASE_BACKOFF_SECONDS,
+    max_backoff=DB_RETRY_MAX_BACKOFF_SECONDS,
+    deadline_seconds=DB_REQUEST_DEADLINE_SECONDS
+)
+
+circuit_breaker = CircuitBreaker(
+    failure_threshold=DB_CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    reset_seconds=DB_CIRCUIT_BREAKER_RESET_SECONDS
+)
@@ -0,0 +1,152 @@
+from app.config import SCAN_READ_CAPACITY_PER_SECOND, SCAN_TOTAL_SEGMENTS
+from app.models.pynamo_models import Thread
+from concurrent.futures import ThreadPoolExecutor
+from pynamodb.pagination import ResultIterator
+from queue import Empty, Full, Queue
+from threading import Event
+
+# Items buffered per segment between scanning threads and the consumer, bounds memory use of a scan
+SEGMENT_BUFFER_SIZE = 1000
+
+# Seconds between checks of the stop flag while a queue is full or empty
+QUEUE_POLL_SECONDS = 0.1
+
+# Marks the end of a segment in the results queue
+_SEGMENT_DONE = object()
+
+
+class _SegmentError:
+    """
+    Wraps an exception raised while scanning a segment so it can be re-raised in the consuming thread.
+    """
+
+    def __init__(self, exception):
+        self.exception = exception
+
+
+def scan_table(segment=None, total_segments=None, limit=None, last_evaluated_key=None, page_size=None,
+               rate_limit=None, attributes_to_get=None, map_fn=Thread.from_raw_data):
+    """
+    Function returns a lazy iterator over a scan of the URL table, like Thread.scan, with every raw item passed through
+    map_fn. The default builds Thread model instances, a lighter map_fn skips decoding attributes it does not need.
+    """
+    if page_size is None:
+        page_size = limit
+
+    return ResultIterator(
+        Thread._get_connection().scan,
+        (),
+        dict(
+            exclusive_start_key=last_evaluated_key,
+            segment=segment,
+            total_segments=total_segments,
+            limit=page_size,
+            attributes_to_get=attributes_to_get
+        ),
+        map_fn=map_fn,
+        limit=limit,
+        rate_limit=rate_limit
+    )
+
+
+def _scan_segment(segment, total_segments, rate_limit, page_size, attributes_to_get, map_fn, results, stop):
+    """
+    Reads one scan segment and puts its items on the results queue, followed by _SEGMENT_DONE.
+    Stops early once the stop flag is set, e.g. when the consumer is no longer reading.
+    """
+    try:
+        items = scan_table(
+            segment=segment,
+            total_segments=total_segments,
+            page_size=page_size,
+            rate_limit=rate_limit,
+            attributes_to_get=attributes_to_get,
+            map_fn=map_fn
+        )
+
+        for item in items:
+            if not put_unless_stopped(results, item, stop):
+                return
+
+    except Exception as error:
+        put_unless_stopped(results, _SegmentError(error), stop)
+        return
+
+    put_unless_stopped(results, _SEGMENT_DONE, stop)
+
+
+def put_unless_stopped(results, value, stop):
+    """
+    Puts value on the queue, waiting for room unless stop is set. Returns False if the value was not queued.
+    """
+    while not stop.is_set():
+        try:
+            results.put(value, timeout=QUEUE_POLL_SECONDS)
+            return True
+
+        except Full:
+            continue
+
+    return False
+
+
+def parallel_scan(total_segments=None, read_capacity_per_second=None, page_size=None, attributes_to_get=None,
+                  map_fn=Thread.from_raw_data):
+    """
+    Generator that reads the whole URL table as `total_segments` DynamoDB scan segments running concurrently.
+    Items of all segments are merged into one iterator in no particular order, each raw item passed through map_fn.
+    `read_capacity_per_second` is a budget shared by all segments, 0 or None means unlimited.
+    Exceptions raised by any segment, e.g. PynamoDBConnectionError, are re-raised to the caller.
+    """
+    if total_segments is None:
+        total_segments = SCAN_TOTAL_SEGMENTS
+
+    if read_capacity_per_second is None:
+        read_capacity_per_second = SCAN_READ_CAPACITY_PER_SECOND
+
+    total_segments = max(1, total_segments)
+
+    # Split read budget evenly between segments
+    rate_limit = read_capacity_per_second / total_segments if read_capacity_per_second else None
+
+    if total_segments == 1:
+        # Nothing to parallelize, scan on the calling thread
+        yield from scan_table(
+            page_size=page_size, rate_limit=rate_limit, attributes_to_get=attributes_to_get, map_fn=map_fn
+        )
+        return
+
+    results = Queue(maxsize=SEGMENT_BUFFER_SIZE * total_segments)
+    stop = Event()
+
+    executor = ThreadPoolExecutor(max_workers=total_segments, thread_name_prefix="scan")
+
+    try:
+        for segment in range(total_segments):
+            executor.submit(
+                _scan_segment, segment, total_segments, rate_limit, page_size, attributes_to_get, map_fn, results,
+                stop
+            )
+
+        segments_done = 0
+
+        while segments_done < total_segments:
+            try:
+                value = results.get(timeout=QUEUE_POLL_SECONDS)
+
+            except Empty:
+                continue
+
+            if value is _SEGMENT_DONE:
+                segments_done += 1
+
+            elif isinstance(value, _SegmentError):
+                raise value.exception
+
+            else:
+                yield value
+
+    finally:
+        # Release any segment threads still running, e.g. after an error or when the caller stopped early
+        stop.set()
+        executor.shutdown(wait=False)
@@ -0,0 +1,57 @@
+import asyncio
+from threading import Lock
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one: while a call for a key is in flight, later callers
+    await its result instead of starting their own. Meant for lookups of hot keys, e.g. a viral short url whose
+    cache entry expired, so one worker sends one DB request instead of hundreds.
+    The shared call runs as its own task, a caller that is cancelled does not cancel it for the others.
+    """
+
+    def __init__(self):
+        # key --> task of the call in flight
+        self._calls = {}
+
+        self._stats_lock = Lock()
+        self.executed = 0
+        self.collapsed = 0
+
+    async def do(self, key, call):
+        """
+        Returns the result of call(), an async function, or of the call already in flight for key.
+        Exceptions of the shared call are raised to every caller.
+        """
+        loop = asyncio.get_running_loop()
+        task = self._calls.get(key)
+
+        # Tasks of another event loop (e.g. a closed test client loop) cannot be awaited, start a new call
+        if task is not None and task.get_loop() is loop:
+            with self._stats_lock:
+                self.collapsed += 1
+
+        else:
+            task = loop.create_task(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda done_task: self._finish(key, done_task))
+
+            with self._stats_lock:
+                self.executed += 1
+
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+        # Mark exception as retrieved, all callers may have been cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        """
+        Returns a snapshot of the call counters.
+        """
+        with self._stats_lock:
+            return {"executed": self.executed, "collapsed": self.collapsed, "in_flight": len(self._calls)}
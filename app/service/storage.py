@@ -0,0 +1,228 @@
+from app.config import SQLITE_PATH, STORAGE_BACKEND
+from pynamodb.exceptions import AttributeNullError
+from time import time
+from zlib import crc32
+
+# Outcomes of StorageBackend.put_many_if_absent, one per item
+BATCH_WRITTEN = "Success"
+# Short url already taken
+BATCH_EXISTS = "PutError"
+# Item was not written because another item of the same batch failed, can be retried as is
+BATCH_NOT_ATTEMPTED = "NotAttempted"
+
+
+def validate_short_url(short_url):
+    """
+    Function rejects short urls that cannot be stored as a key, the same way PynamoDB does for the DynamoDB backend.
+    """
+    if short_url is None:
+        raise AttributeNullError("ShortUrl")
+
+    if not isinstance(short_url, str):
+        raise TypeError(f"ShortUrl must be a string, not {type(short_url).__name__}")
+
+
+def is_expired(expires_at, now=None):
+    """
+    Function returns whether a url with the given expiry (Unix timestamp in seconds, None for never) has expired.
+    """
+    return expires_at is not None and expires_at <= (time() if now is None else now)
+
+
+def key_segment(short_url, total_segments):
+    """
+    Function returns which of total_segments scan segments short_url belongs to, for backends without native segments.
+    """
+    return crc32(short_url.encode()) % total_segments
+
+
+class UrlRecord:
+    """
+    Read-only view of a stored url with just the fields reads need, lighter to build than a Thread model instance.
+    Attributes match those of Thread, expires_at is a UTC datetime or None, so either can be passed to callers.
+    """
+
+    __slots__ = ("short_url", "original_url", "expires_at")
+
+    def __init__(self, short_url, original_url, expires_at=None):
+        self.short_url = short_url
+        self.original_url = original_url
+        self.expires_at = expires_at
+
+    def __repr__(self):
+        return f"UrlRecord({self.short_url!r}, {self.original_url!r}, {self.expires_at!r})"
+
+
+class StorageBackend:
+    """
+    Interface for storing short_url --> original_url items, implemented by the DynamoDB, memory and SQLite backends.
+
+    Backends report failures with the PynamoDB exception types the service layer already handles:
+    PutError when a short url is taken, DoesNotExist for missing items, DeleteError for failed deletes and
+    PynamoDBConnectionError when the store cannot be reached. Items are returned as Thread model instances, or as
+    UrlRecords by reads that only need short_url, original_url and expires_at (get, scan_page and scan).
+
+    Expiry times are Unix timestamps in seconds. Expired items may still be returned until they are removed,
+    callers check the expiry. Expired short urls can be taken again by a new item.
+    """
+
+    name = None
+
+    def warm_up(self, connections):
+        """
+        Opens up to `connections` connections to the store ahead of the first request.
+        Failures are not raised, so the app still starts and requests report them.
+        Returns the number of connections opened.
+        """
+        return 0
+
+    def put_if_absent(self, short_url, original_url, original_url_hash=None, expires_at=None):
+        """
+        Stores a new item, raises PutError if short_url already exists and has not expired.
+        Items stored with an original_url_hash can be found again with find_by_original_url_hash.
+        """
+        raise NotImplementedError
+
+    def put_many_if_absent(self, items):
+        """
+        Stores many (short_url, original_url, expires_at) items, never overwriting existing ones that have not expired.
+        Returns one outcome per item: BATCH_WRITTEN, BATCH_EXISTS, BATCH_NOT_ATTEMPTED or a transient error code.
+        Raises PynamoDBConnectionError if the batch failed as a whole.
+        """
+        raise NotImplementedError
+
+    def get(self, short_url):
+        """
+        Returns the item stored under short_url, raises DoesNotExist if there is none.
+        """
+        raise NotImplementedError
+
+    def get_redirect_target(self, short_url):
+        """
+        Returns only (original_url, expires_at) of the item stored under short_url.
+        Raises DoesNotExist if there is none. Lighter than get for lookups that need nothing else, e.g. redirects.
+        """
+        raise NotImplementedError
+
+    def get_redirect_targets(self, short_urls):
+        """
+        Returns short_url --> (original_url, expires_at) of those short_urls that exist, read in as few requests as
+        possible.
+        """
+        raise NotImplementedError
+
+    def find_by_original_url_hash(self, original_url_hash):
+        """
+        Returns an item stored with original_url_hash, raises DoesNotExist if there is none.
+        """
+        raise NotImplementedError
+
+    def delete(self, short_url):
+        """
+        Deletes the item stored under short_url, raises DoesNotExist if there is none.
+        """
+        raise NotImplementedError
+
+    def scan_page(self, limit, start_key=None, segment=None, total_segments=None):
+        """
+        Returns (items, next_key) for at most limit items following start_key.
+        next_key is JSON serializable and None after the last page. Raises ValueError for a malformed start_key.
+        With segment and total_segments only that segment of the store is paged, like a DynamoDB parallel scan
+        segment, so disjoint parts can be read concurrently and each resumed from its own next_key.
+        """
+        raise NotImplementedError
+
+    def scan(self, total_segments=None, read_capacity_per_second=None):
+        """
+        Yields every stored item, reading up to total_segments parts of the store concurrently where supported.
+        """
+        raise NotImplementedError
+
+    def purge(self, total_segments=None, read_capacity_per_second=None):
+        """
+        Deletes every stored item in bulk, returns the number of items deleted.
+        """
+        raise NotImplementedError
+
+    def recreate(self):
+        """
+        Drops all stored items at once by recreating the underlying table.
+        """
+        raise NotImplementedError
+
+    def increment_counter(self, name, amount):
+        """
+        Atomically adds amount to the named counter, creating it at 0 first if needed. Returns the new value.
+        """
+        raise NotImplementedError
+
+    def add_clicks(self, stat_key, bucket_start, clicks):
+        """
+        Atomically adds clicks to one analytics time bucket, creating the bucket if needed.
+        """
+        raise NotImplementedError
+
+    def set_clicks(self, stat_key, bucket_start, clicks):
+        """
+        Overwrites the clicks of one analytics time bucket, creating the bucket if needed.
+        """
+        raise NotImplementedError
+
+    def query_clicks(self, stat_key, start, end):
+        """
+        Returns (bucket_start, clicks) of the buckets of stat_key starting in [start, end), in time order.
+        """
+        raise NotImplementedError
+
+    def add_pending_rollup(self, stat_key, bucket_start, short_urls):
+        """
+        Atomically adds short urls to the set of a pending rollup marker, creating the marker if needed.
+        """
+        raise NotImplementedError
+
+    def pending_rollups(self, stat_key, until):
+        """
+        Returns (bucket_start, set of short urls) of the pending rollup markers of stat_key starting before until.
+        """
+        raise NotImplementedError
+
+    def remove_pending_rollup(self, stat_key, bucket_start, short_urls):
+        """
+        Removes short urls from a pending rollup marker, dropping the marker once its set is empty.
+        Short urls added in the meantime are kept.
+        """
+        raise NotImplementedError
+
+    def put_top(self, stat_key, bucket_start, top):
+        """
+        Overwrites the top list [[short_url, clicks], ...] stored in one bucket.
+        """
+        raise NotImplementedError
+
+    def query_top(self, stat_key, start, end):
+        """
+        Returns (bucket_start, top list) of the top list buckets of stat_key starting in [start, end), in time order.
+        """
+        raise NotImplementedError
+
+
+def create_storage_backend(backend_name=None):
+    """
+    Function returns the storage backend selected in the config: "dynamodb" (default), "memory" or "sqlite".
+    """
+    if backend_name is None:
+        backend_name = STORAGE_BACKEND
+
+    if backend_name == "memory":
+        from app.service.storage_memory import MemoryBackend
+        return MemoryBackend()
+
+    if backend_name == "sqlite":
+        from app.service.storage_sqlite import SQLiteBackend
+        return SQLiteBackend(path=SQLITE_PATH)
+
+    if backend_name == "dynamodb":
+        from app.service.storage_dynamodb import DynamoDBBackend
+        return DynamoDBBackend()
+
+    raise ValueError(f"Unknown storage backend: {backend_name}")
@@ -0,0 +1,343 @@
+from app.config import SCAN_READ_CAPACITY_PER_SECOND, SCAN_TOTAL_SEGMENTS
+from app.models.pynamo_models import ClickCount, Counter, Thread
+from app.service.scan import parallel_scan, scan_table
+from app.service.storage import BATCH_EXISTS, BATCH_NOT_ATTEMPTED, BATCH_WRITTEN, StorageBackend, UrlRecord
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+from pynamodb.connection import Connection
+from pynamodb.exceptions import (
+    DeleteError, DoesNotExist, PynamoDBConnectionError, PynamoDBException, TransactWriteError
+)
+from pynamodb.transactions import TransactWrite
+from threading import Barrier, BrokenBarrierError
+from time import sleep, time
+
+# Seconds between table status checks while the URL table is being recreated
+TABLE_STATUS_POLL_SECONDS = 1
+
+# Attributes projected by reads that return UrlRecords, the rest of an item is neither sent nor decoded
+URL_RECORD_ATTRIBUTES = ["ShortUrl", "OriginalUrl", "ExpiresAt"]
+
+# Seconds warm up requests wait for each other, so they are in flight at once and each needs its own connection
+WARM_UP_BARRIER_TIMEOUT_SECONDS = 5
+
+
+def _purge_segment(segment, total_segments, rate_limit):
+    """
+    Deletes every item in one scan segment straight from the scanned keys, 25 deletes per BatchWriteItem request.
+    Returns the number of items deleted.
+    """
+    deleted = 0
+
+    # Only keys are needed to delete, skip reading the rest of each item
+    url_keys = Thread.scan(
+        segment=segment,
+        total_segments=total_segments,
+        rate_limit=rate_limit,
+        attributes_to_get=["ShortUrl"]
+    )
+
+    # Batch commits automatically every 25 items and retries unprocessed items
+    with Thread.batch_write() as batch:
+        for url_key in url_keys:
+            batch.delete(url_key)
+            deleted += 1
+
+    return deleted
+
+
+def _to_datetime(timestamp):
+    # TTLAttribute holds timezone aware datetimes
+    return datetime.fromtimestamp(timestamp, timezone.utc) if timestamp is not None else None
+
+
+def _new_item(short_url, original_url, original_url_hash=None, expires_at=None):
+    return Thread(
+        short_url=short_url,
+        original_url=original_url,
+        original_url_hash=original_url_hash,
+        expires_at=_to_datetime(expires_at)
+    )
+
+
+def _absent_or_expired():
+    """
+    Returns the write condition for new items: short url must not exist, or must have expired and be awaiting
+    deletion by DynamoDB TTL.
+    """
+    return Thread.short_url.does_not_exist() | (Thread.expires_at <= _to_datetime(int(time())))
+
+
+def url_record(item):
+    """
+    Function decodes a raw DynamoDB item (attribute name --> {type: value}) of the URL table into a UrlRecord.
+    Only the projected attributes are read, no model instance is built.
+    """
+    expires_at = item.get("ExpiresAt")
+
+    return UrlRecord(
+        item["ShortUrl"]["S"],
+        item["OriginalUrl"]["S"],
+        datetime.fromtimestamp(int(expires_at["N"]), timezone.utc) if expires_at else None
+    )
+
+
+def _open_connection(model):
+    """
+    Makes a cheap control plane call on the model's table, opening a pooled connection and caching the table schema
+    PynamoDB needs before its first request. Returns whether it succeeded.
+    """
+    try:
+        model.describe_table()
+        return True
+
+    except PynamoDBException:
+        return False
+
+
+class DynamoDBBackend(StorageBackend):
+    """
+    Stores urls in the DynamoDB URL table through the PynamoDB Thread model.
+    """
+
+    name = "dynamodb"
+
+    def __init__(self):
+        # Transactions span tables so they go through a plain connection, created once to reuse its pooled client
+        meta = Thread.Meta
+        self._transaction_connection = Connection(
+            region=meta.region,
+            host=meta.host,
+            connect_timeout_seconds=meta.connect_timeout_seconds,
+            read_timeout_seconds=meta.read_timeout_seconds,
+            max_retry_attempts=meta.max_retry_attempts,
+            max_pool_connections=meta.max_pool_connections
+        )
+
+    def warm_up(self, connections):
+        connections = max(1, connections)
+        barrier = Barrier(connections, timeout=WARM_UP_BARRIER_TIMEOUT_SECONDS)
+
+        def open_url_table_connection(_):
+            try:
+                barrier.wait()
+            except BrokenBarrierError:
+                pass
+
+            return _open_connection(Thread)
+
+        # Concurrent calls on the URL table fill its pool, counters and clicks need one connection each
+        with ThreadPoolExecutor(max_workers=connections, thread_name_prefix="warm_up") as executor:
+            opened = sum(executor.map(open_url_table_connection, range(connections)))
+
+        return opened + _open_connection(Counter) + _open_connection(ClickCount)
+
+    def put_if_absent(self, short_url, original_url, original_url_hash=None, expires_at=None):
+        new_item = _new_item(short_url, original_url, original_url_hash, expires_at)
+
+        # Condition makes sure Short Url isn't already in DB
+        new_item.save(condition=_absent_or_expired())
+
+    def put_many_if_absent(self, items):
+        try:
+            # Write all items at once, every item must not exist yet
+            with TransactWrite(connection=self._transaction_connection) as transaction:
+                condition = _absent_or_expired()
+
+                for short_url, original_url, expires_at in items:
+                    transaction.save(_new_item(short_url, original_url, expires_at=expires_at), condition=condition)
+
+        except TransactWriteError as error:
+            reasons = error.cancellation_reasons
+
+            if not reasons:
+                # Transaction failed as a whole (e.g. unreachable server)
+                raise PynamoDBConnectionError("Failed to write transaction items", error)
+
+            # Transaction cancelled, nothing was written
+            outcomes = []
+
+            for reason in reasons:
+                if reason is None or reason.code == "None":
+                    outcomes.append(BATCH_NOT_ATTEMPTED)
+                elif reason.code == "ConditionalCheckFailed":
+                    outcomes.append(BATCH_EXISTS)
+                else:
+                    # Transient failure, e.g. throttling or transaction conflict
+                    outcomes.append(reason.code)
+
+            return outcomes
+
+        return [BATCH_WRITTEN] * len(items)
+
+    def get(self, short_url):
+        # Low level GetItem projected to the attributes of a UrlRecord, skips building a model instance
+        item = Thread._get_connection().get_item(short_url, attributes_to_get=URL_RECORD_ATTRIBUTES).get("Item")
+
+        if not item:
+            raise DoesNotExist()
+
+        return url_record(item)
+
+    def get_redirect_target(self, short_url):
+        # Low level GetItem projected to the attributes needed, skips building a model instance
+        item = Thread._get_connection().get_item(
+            short_url, attributes_to_get=["OriginalUrl", "ExpiresAt"]
+        ).get("Item")
+
+        if not item:
+            raise DoesNotExist()
+
+        expires_at = item.get("ExpiresAt")
+        return item["OriginalUrl"]["S"], int(expires_at["N"]) if expires_at else None
+
+    def get_redirect_targets(self, short_urls):
+        # BatchGetItem, 100 keys per request, unprocessed keys are retried by PynamoDB
+        url_items = Thread.batch_get(list(short_urls), attributes_to_get=["ShortUrl", "OriginalUrl", "ExpiresAt"])
+
+        return {
+            url_item.short_url: (
+                url_item.original_url, int(url_item.expires_at.timestamp()) if url_item.expires_at else None
+            )
+            for url_item in url_items
+        }
+
+    def find_by_original_url_hash(self, original_url_hash):
+        # Single item query on the sparse original url index, projection holds everything needed
+        for url_item in Thread.original_url_index.query(original_url_hash, limit=1):
+            return url_item
+
+        raise DoesNotExist()
+
+    def delete(self, short_url):
+        try:
+            # Condition turns a delete of a missing item into an error instead of a silent no-op
+            Thread(short_url=short_url).delete(condition=Thread.short_url.exists())
+
+        except DeleteError as error:
+            if error.cause_response_code == "ConditionalCheckFailedException":
+                raise DoesNotExist()
+
+            raise
+
+    def scan_page(self, limit, start_key=None, segment=None, total_segments=None):
+        # Key must look like {"ShortUrl": {"S": "..."}}, anything else would be rejected by DynamoDB
+        if start_key is not None and not (
+            isinstance(start_key, dict) and list(start_key) == ["ShortUrl"]
+            and isinstance(start_key["ShortUrl"], dict) and list(start_key["ShortUrl"]) == ["S"]
+            and isinstance(start_key["ShortUrl"]["S"], str)
+        ):
+            raise ValueError("Malformed start key")
+
+        # Scan is lazy, items are only read from DB while iterating
+        url_items = scan_table(
+            segment=segment,
+            total_segments=total_segments,
+            limit=limit,
+            last_evaluated_key=start_key,
+            attributes_to_get=URL_RECORD_ATTRIBUTES,
+            map_fn=url_record
+        )
+        items = list(url_items)
+
+        return items, url_items.last_evaluated_key or None
+
+    def scan(self, total_segments=None, read_capacity_per_second=None):
+        return parallel_scan(
+            total_segments=total_segments,
+            read_capacity_per_second=read_capacity_per_second,
+            attributes_to_get=URL_RECORD_ATTRIBUTES,
+            map_fn=url_record
+        )
+
+    def purge(self, total_segments=None, read_capacity_per_second=None):
+        if total_segments is None:
+            total_segments = SCAN_TOTAL_SEGMENTS
+
+        if read_capacity_per_second is None:
+            read_capacity_per_second = SCAN_READ_CAPACITY_PER_SECOND
+
+        total_segments = max(1, total_segments)
+
+        # Split read budget evenly between segments
+        rate_limit = read_capacity_per_second / total_segments if read_capacity_per_second else None
+
+        # Delete all segments in parallel
+        with ThreadPoolExecutor(max_workers=total_segments, thread_name_prefix="purge") as executor:
+            segment_counts = executor.map(
+                partial(_purge_segment, total_segments=total_segments, rate_limit=rate_limit),
+                range(total_segments)
+            )
+            return sum(segment_counts)
+
+    def recreate(self):
+        if Thread.exists():
+            Thread.delete_table()
+
+        # Table deletion is asynchronous, wait until it is gone before creating it again
+        while Thread.exists():
+            sleep(TABLE_STATUS_POLL_SECONDS)
+
+        Thread.create_table(
+            read_capacity_units=Thread.Meta.read_capacity_units,
+            write_capacity_units=Thread.Meta.write_capacity_units,
+            wait=True
+        )
+
+    def increment_counter(self, name, amount):
+        counter = Counter(counter_name=name)
+
+        # ADD creates the counter on first use and is atomic across all nodes
+        counter.update(actions=[Counter.value.add(amount)])
+
+        return counter.value
+
+    def add_clicks(self, stat_key, bucket_start, clicks):
+        click_count = ClickCount(stat_key=stat_key, bucket_start=bucket_start)
+
+        # ADD creates the bucket on its first flush and is safe with several workers flushing the same bucket
+        click_count.update(actions=[ClickCount.clicks.add(clicks)])
+
+    def set_clicks(self, stat_key, bucket_start, clicks):
+        ClickCount(stat_key=stat_key, bucket_start=bucket_start, clicks=clicks).save()
+
+    def query_clicks(self, stat_key, start, end):
+        # Single query on the bucket range of one stat key, reads only the buckets asked for
+        click_counts = ClickCount.query(stat_key, ClickCount.bucket_start.between(start, end - 1))
+
+        return [(int(click_count.bucket_start), int(click_count.clicks)) for click_count in click_counts]
+
+    def add_pending_rollup(self, stat_key, bucket_start, short_urls):
+        # ADD to a string set is atomic, workers flushing clicks of the same bucket do not overwrite each other
+        ClickCount(stat_key=stat_key, bucket_start=bucket_start).update(
+            actions=[ClickCount.short_urls.add(set(short_urls))]
+        )
+
+    def pending_rollups(self, stat_key, until):
+        markers = ClickCount.query(stat_key, ClickCount.bucket_start < until)
+
+        return [(int(marker.bucket_start), set(marker.short_urls or ())) for marker in markers]
+
+    def remove_pending_rollup(self, stat_key, bucket_start, short_urls):
+        marker = ClickCount(stat_key=stat_key, bucket_start=bucket_start)
+
+        # DELETE from the set keeps short urls added since the marker was read, an empty set is removed by DynamoDB
+        marker.update(actions=[ClickCount.short_urls.delete(set(short_urls))])
+
+        if not marker.short_urls:
+            try:
+                # Drop the marker, unless short urls were added again in the meantime
+                marker.delete(condition=ClickCount.short_urls.does_not_exist())
+
+            except DeleteError as error:
+                if error.cause_response_code != "ConditionalCheckFailedException":
+                    raise
+
+    def put_top(self, stat_key, bucket_start, top):
+        ClickCount(stat_key=stat_key, bucket_start=bucket_start, top=top).save()
+
+    def query_top(self, stat_key, start, end):
+        tops = ClickCount.query(stat_key, ClickCount.bucket_start.between(start, end - 1))
+
+        return [(int(top.bucket_start), top.top or []) for top in tops]
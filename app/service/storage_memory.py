@@ -0,0 +1,209 @@
+from app.models.pynamo_models import Thread
+from app.service.storage import (
+    BATCH_EXISTS, BATCH_WRITTEN, StorageBackend, UrlRecord, is_expired, key_segment, validate_short_url
+)
+from datetime import datetime, timezone
+from heapq import nsmallest
+from pynamodb.exceptions import DoesNotExist, PutError
+from threading import Lock
+
+
+def _thread(short_url, entry):
+    original_url, original_url_hash, expires_at = entry
+
+    return Thread(
+        short_url=short_url,
+        original_url=original_url,
+        original_url_hash=original_url_hash,
+        expires_at=datetime.fromtimestamp(expires_at, timezone.utc) if expires_at is not None else None
+    )
+
+
+def _url_record(short_url, entry):
+    original_url, _, expires_at = entry
+
+    return UrlRecord(
+        short_url, original_url, datetime.fromtimestamp(expires_at, timezone.utc) if expires_at is not None else None
+    )
+
+
+class MemoryBackend(StorageBackend):
+    """
+    Keeps urls in a plain dict of this process, nothing is persisted or shared between workers.
+    Url reads and writes take no lock, they rely on single dict operations being atomic.
+    Meant for tests, benchmarks of the app itself and single process deployments.
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        # short_url --> (original_url, original_url_hash, expires_at)
+        # Each put stores a new tuple so it can be told apart by identity
+        self._urls = {}
+        # original_url_hash --> short_url of the first url stored with that hash
+        self._url_hashes = {}
+
+        # Counters, click buckets and replacing expired urls are read-modify-write, they share one lock
+        self._lock = Lock()
+        self._counters = {}
+        self._clicks = {}
+        # (stat_key, bucket_start) --> set of short urls / top list
+        self._pending_rollups = {}
+        self._tops = {}
+
+    def put_if_absent(self, short_url, original_url, original_url_hash=None, expires_at=None):
+        validate_short_url(short_url)
+
+        entry = (original_url, original_url_hash, expires_at)
+
+        # setdefault only stores entry if short_url is new, in a single atomic step
+        existing = self._urls.setdefault(short_url, entry)
+
+        if existing is not entry:
+            if not is_expired(existing[2]):
+                raise PutError("Short url already exists")
+
+            with self._lock:
+                # Replace expired entry, unless it was replaced or deleted in the meantime
+                if self._urls.get(short_url) is not existing:
+                    raise PutError("Short url already exists")
+
+                self._urls[short_url] = entry
+
+        if original_url_hash is not None:
+            self._url_hashes.setdefault(original_url_hash, short_url)
+
+    def put_many_if_absent(self, items):
+        outcomes = []
+
+        for short_url, original_url, expires_at in items:
+            try:
+                self.put_if_absent(short_url, original_url, expires_at=expires_at)
+                outcomes.append(BATCH_WRITTEN)
+
+            except PutError:
+                outcomes.append(BATCH_EXISTS)
+
+        return outcomes
+
+    def get(self, short_url):
+        entry = self._urls.get(short_url)
+
+        if entry is None:
+            raise DoesNotExist()
+
+        return _url_record(short_url, entry)
+
+    def get_redirect_target(self, short_url):
+        entry = self._urls.get(short_url)
+
+        if entry is None:
+            raise DoesNotExist()
+
+        return entry[0], entry[2]
+
+    def get_redirect_targets(self, short_urls):
+        entries = [(short_url, self._urls.get(short_url)) for short_url in short_urls]
+        return {short_url: (entry[0], entry[2]) for short_url, entry in entries if entry is not None}
+
+    def find_by_original_url_hash(self, original_url_hash):
+        short_url = self._url_hashes.get(original_url_hash)
+        entry = self._urls.get(short_url) if short_url is not None else None
+
+        if entry is None:
+            raise DoesNotExist()
+
+        return _thread(short_url, entry)
+
+    def delete(self, short_url):
+        entry = self._urls.pop(short_url, None)
+
+        if entry is None:
+            raise DoesNotExist()
+
+        # Drop index entry, unless the hash already points to another short url
+        if entry[1] is not None and self._url_hashes.get(entry[1]) == short_url:
+            self._url_hashes.pop(entry[1], None)
+
+    def scan_page(self, limit, start_key=None, segment=None, total_segments=None):
+        if start_key is not None and not isinstance(start_key, str):
+            raise ValueError("Malformed start key")
+
+        # Pages are in key order, only the keys of this page are sorted
+        short_urls = nsmallest(limit, (
+            key for key in list(self._urls)
+            if (start_key is None or key > start_key)
+            and (segment is None or key_segment(key, total_segments) == segment)
+        ))
+        entries = [(short_url, self._urls.get(short_url)) for short_url in short_urls]
+        items = [_url_record(short_url, entry) for short_url, entry in entries if entry]
+
+        next_key = short_urls[-1] if len(short_urls) == limit else None
+        return items, next_key
+
+    def scan(self, total_segments=None, read_capacity_per_second=None):
+        for short_url, entry in list(self._urls.items()):
+            yield _url_record(short_url, entry)
+
+    def purge(self, total_segments=None, read_capacity_per_second=None):
+        deleted = len(self._urls)
+        self._urls.clear()
+        self._url_hashes.clear()
+        return deleted
+
+    def recreate(self):
+        self._urls = {}
+        self._url_hashes = {}
+
+    def increment_counter(self, name, amount):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+            return self._counters[name]
+
+    def add_clicks(self, stat_key, bucket_start, clicks):
+        with self._lock:
+            key = (stat_key, bucket_start)
+            self._clicks[key] = self._clicks.get(key, 0) + clicks
+
+    def set_clicks(self, stat_key, bucket_start, clicks):
+        with self._lock:
+            self._clicks[(stat_key, bucket_start)] = clicks
+
+    def query_clicks(self, stat_key, start, end):
+        with self._lock:
+            return sorted(
+                (bucket_start, clicks) for (key, bucket_start), clicks in self._clicks.items()
+                if key == stat_key and start <= bucket_start < end
+            )
+
+    def add_pending_rollup(self, stat_key, bucket_start, short_urls):
+        with self._lock:
+            self._pending_rollups.setdefault((stat_key, bucket_start), set()).update(short_urls)
+
+    def pending_rollups(self, stat_key, until):
+        with self._lock:
+            return sorted(
+                (bucket_start, set(short_urls)) for (key, bucket_start), short_urls in self._pending_rollups.items()
+                if key == stat_key and bucket_start < until
+            )
+
+    def remove_pending_rollup(self, stat_key, bucket_start, short_urls):
+        with self._lock:
+            pending = self._pending_rollups.get((stat_key, bucket_start))
+
+            if pending is not None:
+                pending.difference_update(short_urls)
+
+                if not pending:
+                    del self._pending_rollups[(stat_key, bucket_start)]
+
+    def put_top(self, stat_key, bucket_start, top):
+        with self._lock:
+            self._tops[(stat_key, bucket_start)] = [list(entry) for entry in top]
+
+    def query_top(self, stat_key, start, end):
+        with self._lock:
+            return sorted(
+                (bucket_start, [list(entry) for entry in top]) for (key, bucket_start), top in self._tops.items()
+                if key == stat_key and start <= bucket_start < end
+            )
@@ -0,0 +1,311 @@
+import json
+import sqlite3
+from app.models.pynamo_models import Thread
+from app.service.storage import BATCH_EXISTS, BATCH_WRITTEN, StorageBackend, UrlRecord, key_segment, validate_short_url
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pynamodb.exceptions import DoesNotExist, PutError, PynamoDBConnectionError
+from threading import local
+from time import time
+
+# Rows fetched per round trip while scanning the whole table
+SCAN_FETCH_SIZE = 1000
+# Short urls looked up per statement by get_redirect_targets
+BATCH_READ_SIZE = 500
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS urls ("
+    "short_url TEXT PRIMARY KEY, original_url TEXT NOT NULL, original_url_hash TEXT, expires_at INTEGER)",
+    # Partial index, only urls stored with a hash are indexed
+    "CREATE INDEX IF NOT EXISTS urls_original_url_hash ON urls (original_url_hash) "
+    "WHERE original_url_hash IS NOT NULL",
+    "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS clicks ("
+    "stat_key TEXT NOT NULL, bucket_start INTEGER NOT NULL, clicks INTEGER NOT NULL, "
+    "PRIMARY KEY (stat_key, bucket_start))",
+    "CREATE TABLE IF NOT EXISTS pending_rollups ("
+    "stat_key TEXT NOT NULL, bucket_start INTEGER NOT NULL, short_url TEXT NOT NULL, "
+    "PRIMARY KEY (stat_key, bucket_start, short_url))",
+    "CREATE TABLE IF NOT EXISTS click_tops ("
+    "stat_key TEXT NOT NULL, bucket_start INTEGER NOT NULL, top TEXT NOT NULL, "
+    "PRIMARY KEY (stat_key, bucket_start))"
+)
+
+# Inserts a url, or replaces an expired one, leaving unexpired urls untouched (no row changed)
+INSERT_URL = (
+    "INSERT INTO urls (short_url, original_url, original_url_hash, expires_at) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (short_url) DO UPDATE SET original_url = excluded.original_url, "
+    "original_url_hash = excluded.original_url_hash, expires_at = excluded.expires_at "
+    "WHERE urls.expires_at IS NOT NULL AND urls.expires_at <= ?"
+)
+
+URL_COLUMNS = "short_url, original_url, original_url_hash, expires_at"
+# Columns of reads returning UrlRecords
+URL_RECORD_COLUMNS = "short_url, original_url, expires_at"
+
+
+def _thread(row):
+    short_url, original_url, original_url_hash, expires_at = row
+
+    return Thread(
+        short_url=short_url,
+        original_url=original_url,
+        original_url_hash=original_url_hash,
+        expires_at=datetime.fromtimestamp(expires_at, timezone.utc) if expires_at is not None else None
+    )
+
+
+def _url_record(row):
+    short_url, original_url, expires_at = row
+
+    return UrlRecord(
+        short_url, original_url, datetime.fromtimestamp(expires_at, timezone.utc) if expires_at is not None else None
+    )
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Stores urls in a local SQLite database file in WAL mode, so reads never wait on writes.
+    Each thread gets its own connection. Suited to single node deployments without DynamoDB.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        self._local = local()
+
+        with self._transaction() as connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+
+        if connection is None:
+            # Autocommit mode, multi statement writes open their own transaction
+            connection = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.create_function("key_segment", 2, key_segment, deterministic=True)
+            self._local.connection = connection
+
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Runs the enclosed statements in one write transaction, turning SQLite failures into PynamoDBConnectionError.
+        """
+        connection = self._connection()
+
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+
+            try:
+                yield connection
+
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+            connection.execute("COMMIT")
+
+        except sqlite3.OperationalError as error:
+            raise PynamoDBConnectionError("SQLite operation failed", error)
+
+    def _execute(self, statement, parameters=()):
+        try:
+            return self._connection().execute(statement, parameters)
+
+        except (sqlite3.InterfaceError, sqlite3.ProgrammingError) as error:
+            # Parameter of a type SQLite cannot bind
+            raise TypeError(str(error))
+
+        except sqlite3.OperationalError as error:
+            raise PynamoDBConnectionError("SQLite operation failed", error)
+
+    def put_if_absent(self, short_url, original_url, original_url_hash=None, expires_at=None):
+        validate_short_url(short_url)
+
+        cursor = self._execute(INSERT_URL, (short_url, original_url, original_url_hash, expires_at, int(time())))
+
+        if cursor.rowcount == 0:
+            raise PutError("Short url already exists")
+
+    def put_many_if_absent(self, items):
+        outcomes = []
+
+        now = int(time())
+
+        with self._transaction() as connection:
+            for short_url, original_url, expires_at in items:
+                cursor = connection.execute(INSERT_URL, (short_url, original_url, None, expires_at, now))
+                outcomes.append(BATCH_WRITTEN if cursor.rowcount == 1 else BATCH_EXISTS)
+
+        return outcomes
+
+    def get(self, short_url):
+        row = self._execute(f"SELECT {URL_RECORD_COLUMNS} FROM urls WHERE short_url = ?", (short_url,)).fetchone()
+
+        if row is None:
+            raise DoesNotExist()
+
+        return _url_record(row)
+
+    def get_redirect_target(self, short_url):
+        row = self._execute("SELECT original_url, expires_at FROM urls WHERE short_url = ?", (short_url,)).fetchone()
+
+        if row is None:
+            raise DoesNotExist()
+
+        return row
+
+    def get_redirect_targets(self, short_urls):
+        short_urls = list(short_urls)
+        targets = {}
+
+        # Chunks stay below the SQLite limit of bound parameters per statement
+        for start in range(0, len(short_urls), BATCH_READ_SIZE):
+            chunk = short_urls[start:start + BATCH_READ_SIZE]
+            placeholders = ", ".join("?" * len(chunk))
+            rows = self._execute(
+                f"SELECT short_url, original_url, expires_at FROM urls WHERE short_url IN ({placeholders})", chunk
+            )
+            targets.update((short_url, (original_url, expires_at)) for short_url, original_url, expires_at in rows)
+
+        return targets
+
+    def find_by_original_url_hash(self, original_url_hash):
+        row = self._execute(
+            f"SELECT {URL_COLUMNS} FROM urls WHERE original_url_hash = ? LIMIT 1", (original_url_hash,)
+        ).fetchone()
+
+        if row is None:
+            raise DoesNotExist()
+
+        return _thread(row)
+
+    def delete(self, short_url):
+        cursor = self._execute("DELETE FROM urls WHERE short_url = ?", (short_url,))
+
+        if cursor.rowcount == 0:
+            raise DoesNotExist()
+
+    def scan_page(self, limit, start_key=None, segment=None, total_segments=None):
+        if start_key is not None and not isinstance(start_key, str):
+            raise ValueError("Malformed start key")
+
+        if segment is None:
+            # Keyset pagination on the primary key, each page is a single index range read
+            rows = self._execute(
+                f"SELECT {URL_RECORD_COLUMNS} FROM urls WHERE short_url > ? ORDER BY short_url LIMIT ?",
+                (start_key or "", limit)
+            ).fetchall()
+
+        else:
+            # Same range read, skipping keys of other segments
+            rows = self._execute(
+                f"SELECT {URL_RECORD_COLUMNS} FROM urls WHERE short_url > ? AND key_segment(short_url, ?) = ? "
+                "ORDER BY short_url LIMIT ?",
+                (start_key or "", total_segments, segment, limit)
+            ).fetchall()
+
+        items = [_url_record(row) for row in rows]
+
+        next_key = rows[-1][0] if len(rows) == limit else None
+        return items, next_key
+
+    def scan(self, total_segments=None, read_capacity_per_second=None):
+        cursor = self._execute(f"SELECT {URL_RECORD_COLUMNS} FROM urls")
+
+        while True:
+            rows = cursor.fetchmany(SCAN_FETCH_SIZE)
+
+            if not rows:
+                return
+
+            for row in rows:
+                yield _url_record(row)
+
+    def purge(self, total_segments=None, read_capacity_per_second=None):
+        return self._execute("DELETE FROM urls").rowcount
+
+    def recreate(self):
+        with self._transaction() as connection:
+            connection.execute("DROP TABLE IF EXISTS urls")
+            connection.execute(SCHEMA[0])
+            connection.execute(SCHEMA[1])
+
+    def increment_counter(self, name, amount):
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT INTO counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                (name, amount)
+            )
+            return connection.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0]
+
+    def add_clicks(self, stat_key, bucket_start, clicks):
+        self._execute(
+            "INSERT INTO clicks (stat_key, bucket_start, clicks) VALUES (?, ?, ?) "
+            "ON CONFLICT (stat_key, bucket_start) DO UPDATE SET clicks = clicks + excluded.clicks",
+            (stat_key, bucket_start, clicks)
+        )
+
+    def set_clicks(self, stat_key, bucket_start, clicks):
+        self._execute(
+            "INSERT INTO clicks (stat_key, bucket_start, clicks) VALUES (?, ?, ?) "
+            "ON CONFLICT (stat_key, bucket_start) DO UPDATE SET clicks = excluded.clicks",
+            (stat_key, bucket_start, clicks)
+        )
+
+    def query_clicks(self, stat_key, start, end):
+        # Range read on the primary key, like a DynamoDB query
+        return self._execute(
+            "SELECT bucket_start, clicks FROM clicks WHERE stat_key = ? AND bucket_start >= ? AND bucket_start < ? "
+            "ORDER BY bucket_start",
+            (stat_key, start, end)
+        ).fetchall()
+
+    def add_pending_rollup(self, stat_key, bucket_start, short_urls):
+        with self._transaction() as connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO pending_rollups (stat_key, bucket_start, short_url) VALUES (?, ?, ?)",
+                [(stat_key, bucket_start, short_url) for short_url in short_urls]
+            )
+
+    def pending_rollups(self, stat_key, until):
+        pending = {}
+
+        for bucket_start, short_url in self._execute(
+            "SELECT bucket_start, short_url FROM pending_rollups WHERE stat_key = ? AND bucket_start < ? "
+            "ORDER BY bucket_start",
+            (stat_key, until)
+        ):
+            pending.setdefault(bucket_start, set()).add(short_url)
+
+        return list(pending.items())
+
+    def remove_pending_rollup(self, stat_key, bucket_start, short_urls):
+        with self._transaction() as connection:
+            connection.executemany(
+                "DELETE FROM pending_rollups WHERE stat_key = ? AND bucket_start = ? AND short_url = ?",
+                [(stat_key, bucket_start, short_url) for short_url in short_urls]
+            )
+
+    def put_top(self, stat_key, bucket_start, top):
+        self._execute(
+            "INSERT INTO click_tops (stat_key, bucket_start, top) VALUES (?, ?, ?) "
+            "ON CONFLICT (stat_key, bucket_start) DO UPDATE SET top = excluded.top",
+            (stat_key, bucket_start, json.dumps(top))
+        )
+
+    def query_top(self, stat_key, start, end):
+        rows = self._execute(
+            "SELECT bucket_start, top FROM click_tops WHERE stat_key = ? AND bucket_start >= ? AND bucket_start < ? "
+            "ORDER BY bucket_start",
+            (stat_key, start, end)
+        ).fetchall()
+
+        return [(bucket_start, json.loads(top)) for bucket_start, top in rows]
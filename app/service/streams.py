@@ -0,0 +1,229 @@
+from app.config import (
+    DYNAMODB_CONNECT_TIMEOUT_SECONDS, DYNAMODB_HOST, DYNAMODB_MAX_RETRY_ATTEMPTS, DYNAMODB_READ_TIMEOUT_SECONDS,
+    DYNAMODB_REGION, STREAM_POLL_INTERVAL_SECONDS, STREAM_READERS, STREAM_SHARD_READS_PER_SECOND,
+    STREAM_SHARD_REFRESH_SECONDS
+)
+from app.models.pynamo_models import Thread
+from botocore.exceptions import ClientError
+from threading import Lock
+from time import monotonic
+
+# Most stream records read per GetRecords call, the DynamoDB maximum
+RECORDS_PER_CALL = 1000
+
+# Errors after which records may have been missed, reading restarts at the latest record of the shard
+LOST_POSITION_ERRORS = ("ExpiredIteratorException", "TrimmedDataAccessException")
+
+
+class ChangeFeedConsumer:
+    """
+    Tails the DynamoDB stream of a table and hands (event name, key) of every changed item to on_change.
+    Shards open at the first poll are read from their latest record, shards found later (after a split or when the
+    table was recreated) from their oldest, so no change made after startup is missed. When changes may have been
+    missed anyway, e.g. an iterator expired while the DB was unreachable, on_gap is called instead.
+    Not thread-safe, poll() is meant to be called by one background task.
+    """
+
+    def __init__(self, streams_client, describe_table, key_name, on_change, on_gap,
+                 shard_refresh_seconds=STREAM_SHARD_REFRESH_SECONDS):
+        self.streams_client = streams_client
+        self.describe_table = describe_table
+        self.key_name = key_name
+        self.on_change = on_change
+        self.on_gap = on_gap
+        self.shard_refresh_seconds = shard_refresh_seconds
+
+        self._stream_arn = None
+        # shard id --> iterator of the next records, for shards still being read
+        self._iterators = {}
+        # Ids of every shard listed so far, also the ones that are done or were skipped
+        self._known_shards = set()
+        self._started = False
+        self._next_refresh = 0
+
+        self._stats_lock = Lock()
+        self.records = 0
+        self.gaps = 0
+
+    def _gap(self):
+        with self._stats_lock:
+            self.gaps += 1
+
+        self.on_gap()
+
+    def _shard_iterator(self, shard_id, iterator_type):
+        return self.streams_client.get_shard_iterator(
+            StreamArn=self._stream_arn, ShardId=shard_id, ShardIteratorType=iterator_type
+        )["ShardIterator"]
+
+    def _list_shards(self):
+        shards = []
+        start_shard_id = None
+
+        while True:
+            arguments = {"StreamArn": self._stream_arn}
+            if start_shard_id is not None:
+                arguments["ExclusiveStartShardId"] = start_shard_id
+
+            description = self.streams_client.describe_stream(**arguments)["StreamDescription"]
+            shards.extend(description["Shards"])
+
+            start_shard_id = description.get("LastEvaluatedShardId")
+            if start_shard_id is None:
+                return shards
+
+    def refresh_shards(self):
+        """
+        Looks up the current stream of the table and starts reading shards that were not seen before.
+        """
+        stream_arn = self.describe_table().get("LatestStreamArn")
+
+        if stream_arn != self._stream_arn:
+            if self._stream_arn is not None:
+                # Table was recreated or its stream replaced, changes in between are unknown
+                self._gap()
+
+            self._stream_arn = stream_arn
+            self._iterators = {}
+            self._known_shards = set()
+
+        self._next_refresh = monotonic() + self.shard_refresh_seconds
+
+        if stream_arn is None:
+            # Streams are not enabled on the table
+            return
+
+        shards = self._list_shards()
+
+        for shard in shards:
+            shard_id = shard["ShardId"]
+
+            if shard_id in self._known_shards:
+                continue
+
+            closed = "EndingSequenceNumber" in shard["SequenceNumberRange"]
+
+            if not self._started:
+                # Nothing is cached yet at startup, only changes from now on matter
+                if not closed:
+                    self._iterators[shard_id] = self._shard_iterator(shard_id, "LATEST")
+
+            else:
+                self._iterators[shard_id] = self._shard_iterator(shard_id, "TRIM_HORIZON")
+
+            # Only once its iterator is in place, a failed refresh tries the shard again
+            self._known_shards.add(shard_id)
+
+        self._started = True
+
+        # Shards older than the 24 hour stream retention are no longer listed
+        self._known_shards.intersection_update(shard["ShardId"] for shard in shards)
+
+    def poll(self):
+        """
+        Reads the new records of every shard once and passes their changes on. Returns the number of records read.
+        """
+        if self._stream_arn is None or monotonic() >= self._next_refresh:
+            self.refresh_shards()
+
+        read = 0
+
+        for shard_id, iterator in list(self._iterators.items()):
+            try:
+                result = self.streams_client.get_records(ShardIterator=iterator, Limit=RECORDS_PER_CALL)
+
+            except ClientError as error:
+                code = error.response.get("Error", {}).get("Code")
+
+                if code in LOST_POSITION_ERRORS:
+                    self._gap()
+                    self._iterators[shard_id] = self._shard_iterator(shard_id, "LATEST")
+                    continue
+
+                if code == "ResourceNotFoundException":
+                    # Stream is gone, look up the new one at the next poll
+                    self._next_refresh = 0
+                    return read
+
+                raise
+
+            records = result.get("Records", [])
+            changes = [
+                (record["eventName"], record["dynamodb"]["Keys"][self.key_name]["S"])
+                for record in records if self.key_name in record.get("dynamodb", {}).get("Keys", {})
+            ]
+
+            if changes:
+                self.on_change(changes)
+
+            read += len(records)
+            next_iterator = result.get("NextShardIterator")
+
+            if next_iterator is None:
+                # Shard is closed and fully read, its children are found at the next refresh
+                del self._iterators[shard_id]
+                self._next_refresh = 0
+
+            else:
+                self._iterators[shard_id] = next_iterator
+
+        with self._stats_lock:
+            self.records += read
+
+        return read
+
+    def stats(self):
+        """
+        Returns a snapshot of the consumer counters.
+        """
+        with self._stats_lock:
+            return {"records": self.records, "gaps": self.gaps, "shards": len(self._iterators)}
+
+
+def create_streams_client():
+    """
+    Function returns a DynamoDB Streams client for the region and endpoint (e.g. DynamoDB Local) of the config.
+    """
+    from botocore.config import Config
+    from botocore.session import get_session
+
+    return get_session().create_client(
+        "dynamodbstreams",
+        region_name=DYNAMODB_REGION,
+        endpoint_url=DYNAMODB_HOST,
+        config=Config(
+            connect_timeout=DYNAMODB_CONNECT_TIMEOUT_SECONDS,
+            read_timeout=DYNAMODB_READ_TIMEOUT_SECONDS,
+            retries={"max_attempts": DYNAMODB_MAX_RETRY_ATTEMPTS}
+        )
+    )
+
+
+def check_stream_read_rate(readers, poll_interval, shard_reads_per_second):
+    """
+    Function raises ValueError when readers polling every poll_interval seconds would read each shard more often
+    than shard_reads_per_second, DynamoDB would throttle all of them and invalidations would lag behind.
+    """
+    reads_per_second = readers / poll_interval if poll_interval > 0 else float("inf")
+
+    if reads_per_second > shard_reads_per_second:
+        raise ValueError(
+            f"{readers} stream readers polling every {poll_interval}s read each shard {reads_per_second:g} times a "
+            f"second, over the budget of {shard_reads_per_second:g}: raise the poll interval or lower the readers"
+        )
+
+
+def create_change_feed_consumer(on_change, on_gap):
+    """
+    Function returns a consumer of the stream of the URL table, keyed by short url.
+    Raises ValueError when the stream readers of the config would go over the read budget of a shard.
+    """
+    check_stream_read_rate(STREAM_READERS, STREAM_POLL_INTERVAL_SECONDS, STREAM_SHARD_READS_PER_SECOND)
+
+    return ChangeFeedConsumer(
+        streams_client=create_streams_client(),
+        describe_table=Thread.describe_table,
+        key_name="ShortUrl",
+        on_change=on_change,
+        on_gap=on_gap
+    )
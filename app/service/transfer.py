@@ -0,0 +1,464 @@
+import csv
+import io
+import json
+import os
+from app.config import (
+    SCAN_READ_CAPACITY_PER_SECOND, SCAN_TOTAL_SEGMENTS, TRANSFER_CHECKPOINT_INTERVAL_SECONDS,
+    TRANSFER_EXPORT_PAGE_SIZE, TRANSFER_IMPORT_CHUNK_SIZE, TRANSFER_IMPORT_WORKERS, TRANSFER_WRITE_CAPACITY_PER_SECOND
+)
+from app.models.pydantic_models import PostURL
+from app.service.database import add_urls_to_db, storage
+from app.service.scan import QUEUE_POLL_SECONDS, put_unless_stopped
+from app.service.storage import is_expired
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from json import JSONDecodeError
+from math import ceil
+from pydantic import ValidationError
+from queue import Empty, Queue
+from threading import Event, Lock
+from time import monotonic, sleep
+
+# Columns of exported files, imports read the same columns
+FIELDS = ("short_url", "original_url", "expires_at")
+
+# Import chunks waiting per worker, reading the input pauses while all workers are busy
+IMPORT_CHUNKS_PER_WORKER = 2
+
+# Scanned pages waiting per export segment, scanning pauses while the output is written
+EXPORT_PAGES_PER_SEGMENT = 2
+
+# Capacity accounting of DynamoDB: eventually consistent reads cost half a unit per 4 KB,
+# transactional writes cost two units per 1 KB of each item
+READ_UNIT_BYTES = 4096
+WRITE_UNIT_BYTES = 1024
+# Rough size of attribute names and the expiry of one item, on top of its urls
+ITEM_OVERHEAD_BYTES = 50
+
+
+class CapacityBudget:
+    """
+    Limits the capacity units per second used by a job running on several threads, 0 or None means unlimited.
+    Callers reserve units up front and sleep off any debt, so a burst of requests is spread out over time.
+    """
+
+    def __init__(self, units_per_second):
+        self.units_per_second = units_per_second
+
+        self._lock = Lock()
+        self._available = units_per_second or 0
+        self._updated = monotonic()
+
+    def acquire(self, units):
+        if not self.units_per_second:
+            return
+
+        with self._lock:
+            now = monotonic()
+
+            # Refill for the time passed, at most one second of capacity is saved up
+            self._available = min(
+                self.units_per_second, self._available + (now - self._updated) * self.units_per_second
+            )
+            self._updated = now
+            self._available -= units
+
+            wait_seconds = -self._available / self.units_per_second if self._available < 0 else 0
+
+        if wait_seconds:
+            sleep(wait_seconds)
+
+
+def _item_bytes(short_url, original_url):
+    return len((short_url or "").encode()) + len(original_url.encode()) + ITEM_OVERHEAD_BYTES
+
+
+def _read_units(url_items):
+    size = sum(_item_bytes(url_item.short_url, url_item.original_url) for url_item in url_items)
+    return ceil(size / READ_UNIT_BYTES) / 2
+
+
+def _write_units(records):
+    return sum(
+        2 * ceil(_item_bytes(record["custom_url"], record["original_url"]) / WRITE_UNIT_BYTES) for record in records
+    )
+
+
+def file_format_of(path):
+    """
+    Function returns the file format implied by the extension of path, "csv" for .csv files and "ndjson" otherwise.
+    """
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+
+def load_checkpoint(path, job):
+    """
+    Function returns the job state saved in the checkpoint at path, or None if there is none.
+    Raises ValueError if the checkpoint was written by a different job.
+    """
+    if path is None or not os.path.exists(path):
+        return None
+
+    with open(path) as checkpoint_file:
+        state = json.load(checkpoint_file)
+
+    if any(state.get(key) != value for key, value in job.items()):
+        raise ValueError(f"Checkpoint {path} belongs to a different job, remove it to start over")
+
+    return state
+
+
+def save_checkpoint(path, state):
+    """
+    Function replaces the checkpoint at path with state in one step, a crash leaves either the old or the new one.
+    """
+    if path is None:
+        return
+
+    temporary_path = path + ".tmp"
+
+    with open(temporary_path, "w") as checkpoint_file:
+        json.dump(state, checkpoint_file)
+        checkpoint_file.flush()
+        os.fsync(checkpoint_file.fileno())
+
+    os.replace(temporary_path, path)
+
+
+def remove_checkpoint(path):
+    if path is not None and os.path.exists(path):
+        os.remove(path)
+
+
+def _open_output(path, offset):
+    """
+    Opens an output file for appending at offset, dropping anything written after the last checkpoint.
+    """
+    output = open(path, "r+b" if offset else "wb")
+    output.truncate(offset)
+    output.seek(offset)
+    return output
+
+
+def _sync(output):
+    output.flush()
+    os.fsync(output.fileno())
+
+
+def read_rows(input_file, file_format):
+    """
+    Generator yielding the rows of a CSV file with a header line or of an NDJSON file as dicts.
+    NDJSON lines that are not valid JSON are yielded as their text, so they are rejected like other invalid rows.
+    """
+    if file_format == "csv":
+        yield from csv.DictReader(input_file)
+        return
+
+    for line in input_file:
+        if not line.strip():
+            continue
+
+        try:
+            yield json.loads(line)
+
+        except JSONDecodeError:
+            yield line.rstrip("\n")
+
+
+def format_rows(rows, file_format):
+    """
+    Function returns the text of rows (dicts with the FIELDS keys) in the given file format.
+    """
+    if file_format == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerows(
+            [["" if row[field] is None else row[field] for field in FIELDS] for row in rows]
+        )
+        return buffer.getvalue()
+
+    return "".join(json.dumps(row) + "\n" for row in rows)
+
+
+def _record_from_row(row):
+    """
+    Function returns the add_urls_to_db record of an input row, or None if the row is invalid.
+    """
+    if not isinstance(row, dict):
+        return None
+
+    try:
+        record = PostURL(
+            original_url=row.get("original_url"),
+            custom_url=row.get("short_url") or None,
+            expires_at=row.get("expires_at") or None
+        )
+
+    except ValidationError:
+        return None
+
+    return record.model_dump()
+
+
+def _import_chunk(rows, budget):
+    """
+    Writes one chunk of input rows, returns (row, status_code, payload) for every row in input order.
+    """
+    results = [(row, 400, "ValidationError") for row in rows]
+    records = []
+    positions = []
+
+    for position, row in enumerate(rows):
+        record = _record_from_row(row)
+
+        if record is not None:
+            records.append(record)
+            positions.append(position)
+
+    if records:
+        budget.acquire(_write_units(records))
+        response = add_urls_to_db(records)
+
+        for position, result in zip(positions, response["payload"]):
+            results[position] = (rows[position], result["status_code"], result["payload"])
+
+    return results
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def import_urls(
+    path, file_format=None, checkpoint_path=None, rejects_path=None, workers=TRANSFER_IMPORT_WORKERS,
+    chunk_size=TRANSFER_IMPORT_CHUNK_SIZE, write_capacity_per_second=TRANSFER_WRITE_CAPACITY_PER_SECOND,
+    checkpoint_interval=TRANSFER_CHECKPOINT_INTERVAL_SECONDS
+):
+    """
+    Function imports the rows of a CSV or NDJSON file with the FIELDS columns, streaming it chunk by chunk.
+    Rows without short_url get a random one, existing short urls are never overwritten.
+    Chunks are written by a pool of workers with conditional batch writes, reading the input waits while the workers
+    are busy and all workers share a budget of write_capacity_per_second.
+    Progress is saved to checkpoint_path every checkpoint_interval seconds and when the import fails, running the same
+    import again skips the chunks already written. Rows without short_url of chunks written after the last
+    checkpoint are imported again, rows with short_url are then counted as existing.
+    Rows that were not imported are appended to rejects_path as NDJSON together with their status_code and payload.
+    Returns the number of imported, existing (short url taken) and rejected rows.
+    """
+    file_format = file_format or file_format_of(path)
+    job = {"job": "import", "source": os.path.abspath(path), "format": file_format, "chunk_size": chunk_size}
+
+    state = load_checkpoint(checkpoint_path, job) or dict(
+        job, next_chunk=0, done_chunks=[], rejects_offset=0, counts={"imported": 0, "exists": 0, "rejected": 0}
+    )
+    counts = state["counts"]
+
+    # Chunks written beyond next_chunk, next_chunk moves on once every chunk before it is written
+    done_chunks = set(state["done_chunks"])
+
+    budget = CapacityBudget(write_capacity_per_second)
+    rejects = _open_output(rejects_path, state["rejects_offset"]) if rejects_path else None
+
+    last_checkpoint = monotonic()
+
+    def checkpoint(force=False):
+        nonlocal last_checkpoint
+
+        if force or monotonic() - last_checkpoint >= checkpoint_interval:
+            state["done_chunks"] = sorted(done_chunks)
+            save_checkpoint(checkpoint_path, state)
+            last_checkpoint = monotonic()
+
+    def finish(futures):
+        for future in futures:
+            chunk_index = in_flight.pop(future)
+            rejected_rows = []
+
+            for row, status_code, payload in future.result():
+                if status_code == 200:
+                    counts["imported"] += 1
+                    continue
+
+                counts["exists" if status_code == 409 else "rejected"] += 1
+                rejected_rows.append({"row": row, "status_code": status_code, "payload": payload})
+
+            if rejects and rejected_rows:
+                rejects.write("".join(json.dumps(row, default=str) + "\n" for row in rejected_rows).encode())
+                _sync(rejects)
+                state["rejects_offset"] = rejects.tell()
+
+            done_chunks.add(chunk_index)
+
+        while state["next_chunk"] in done_chunks:
+            done_chunks.remove(state["next_chunk"])
+            state["next_chunk"] += 1
+
+    # Future --> index of the chunk it writes
+    in_flight = {}
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="import")
+
+    try:
+        with open(path, newline="" if file_format == "csv" else None) as input_file:
+            for chunk_index, rows in enumerate(_chunks(read_rows(input_file, file_format), chunk_size)):
+                if chunk_index < state["next_chunk"] or chunk_index in done_chunks:
+                    # Written before the job was interrupted
+                    continue
+
+                while len(in_flight) >= workers * IMPORT_CHUNKS_PER_WORKER:
+                    finish(wait(in_flight, return_when=FIRST_COMPLETED).done)
+
+                in_flight[executor.submit(_import_chunk, rows, budget)] = chunk_index
+                checkpoint()
+
+        while in_flight:
+            finish(wait(in_flight, return_when=FIRST_COMPLETED).done)
+            checkpoint()
+
+    except BaseException:
+        # Keep progress of the chunks written so far, chunks in flight are written again on resume
+        executor.shutdown(wait=True, cancel_futures=True)
+        checkpoint(force=True)
+        raise
+
+    finally:
+        executor.shutdown(wait=False)
+
+        if rejects:
+            rejects.close()
+
+    remove_checkpoint(checkpoint_path)
+    return counts
+
+
+def _export_segment(segment, total_segments, start_key, page_size, budget, pages, stop):
+    """
+    Pages through one segment of the store and puts (segment, items, next_key) on the pages queue.
+    Exceptions are put on the queue in place of items, so the writer can re-raise them.
+    """
+    try:
+        while not stop.is_set():
+            items, start_key = storage.scan_page(
+                page_size, start_key, segment=segment, total_segments=total_segments
+            )
+            budget.acquire(_read_units(items))
+
+            if not put_unless_stopped(pages, (segment, items, start_key), stop) or start_key is None:
+                return
+
+    except Exception as error:
+        put_unless_stopped(pages, (segment, error, None), stop)
+
+
+def _export_row(url_item):
+    expires_at = url_item.expires_at
+
+    return {
+        "short_url": url_item.short_url,
+        "original_url": url_item.original_url,
+        "expires_at": expires_at.isoformat() if expires_at is not None else None
+    }
+
+
+def export_urls(
+    path, file_format=None, checkpoint_path=None, total_segments=SCAN_TOTAL_SEGMENTS,
+    page_size=TRANSFER_EXPORT_PAGE_SIZE, read_capacity_per_second=SCAN_READ_CAPACITY_PER_SECOND,
+    checkpoint_interval=TRANSFER_CHECKPOINT_INTERVAL_SECONDS
+):
+    """
+    Function exports every unexpired url to a CSV or NDJSON file with the FIELDS columns, streaming page by page.
+    The store is read as total_segments scan segments in parallel, sharing a budget of read_capacity_per_second.
+    Progress (the next key of every segment and the length of the output) is saved to checkpoint_path every
+    checkpoint_interval seconds and when the export fails, running the same export again continues from there.
+    Returns the number of exported urls and of expired urls left out.
+    """
+    file_format = file_format or file_format_of(path)
+    total_segments = max(1, total_segments)
+    job = {"job": "export", "target": os.path.abspath(path), "format": file_format, "total_segments": total_segments}
+
+    state = load_checkpoint(checkpoint_path, job) or dict(
+        job, offset=0, segments=[{"start_key": None, "done": False} for _ in range(total_segments)],
+        counts={"exported": 0, "expired": 0}
+    )
+    counts = state["counts"]
+
+    output = _open_output(path, state["offset"])
+
+    def write(text):
+        output.write(text.encode())
+        output.flush()
+        state["offset"] = output.tell()
+
+    last_checkpoint = monotonic()
+
+    def checkpoint(force=False):
+        nonlocal last_checkpoint
+
+        if force or monotonic() - last_checkpoint >= checkpoint_interval:
+            os.fsync(output.fileno())
+            save_checkpoint(checkpoint_path, state)
+            last_checkpoint = monotonic()
+
+    budget = CapacityBudget(read_capacity_per_second)
+    pages = Queue(maxsize=EXPORT_PAGES_PER_SEGMENT * total_segments)
+    stop = Event()
+
+    segments_left = [segment for segment in range(total_segments) if not state["segments"][segment]["done"]]
+    executor = ThreadPoolExecutor(max_workers=max(1, len(segments_left)), thread_name_prefix="export")
+
+    try:
+        if state["offset"] == 0 and file_format == "csv":
+            write(",".join(FIELDS) + "\n")
+
+        for segment in segments_left:
+            executor.submit(
+                _export_segment, segment, total_segments, state["segments"][segment]["start_key"], page_size,
+                budget, pages, stop
+            )
+
+        remaining = len(segments_left)
+
+        while remaining:
+            try:
+                segment, items, next_key = pages.get(timeout=QUEUE_POLL_SECONDS)
+
+            except Empty:
+                continue
+
+            if isinstance(items, Exception):
+                raise items
+
+            rows = [
+                _export_row(url_item) for url_item in items
+                if url_item.expires_at is None or not is_expired(url_item.expires_at.timestamp())
+            ]
+            counts["exported"] += len(rows)
+            counts["expired"] += len(items) - len(rows)
+
+            if rows:
+                write(format_rows(rows, file_format))
+
+            # Page is in the output, the segment continues after it
+            state["segments"][segment] = {"start_key": next_key, "done": next_key is None}
+
+            if next_key is None:
+                remaining -= 1
+
+            checkpoint()
+
+    except BaseException:
+        # Keep progress of the pages written so far
+        stop.set()
+        checkpoint(force=True)
+        raise
+
+    finally:
+        # Release segment threads still running, e.g. after an error
+        stop.set()
+        executor.shutdown(wait=False)
+        output.close()
+
+    remove_checkpoint(checkpoint_path)
+    return counts
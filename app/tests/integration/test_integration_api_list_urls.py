@@ -1,3 +1,4 @@
+import json
 import unittest
 from fastapi.testclient import TestClient
 from app.main import app
@@ -42,5 +43,34 @@ class TestListUrlsIntegrationAPI(unittest.TestCase):
         # Make sure list has at least one entry ("existing_url" will always be in the DB for testing)
         self.assertGreater(len(url_list), 0)
 
+    def test_list_urls_paginated(self):
+        response_raw = client.get(url="/api/list_urls?limit=1")
+        response = response_raw.json()
+        self.assertEqual(200, response["status_code"])
+
+        # Make sure page size is respected
+        url_list = response["payload"]
+        self.assertEqual(1, len(url_list))
+
+        # Make sure next page can be requested with the returned cursor
+        if response["next_cursor"]:
+            next_response = client.get(url="/api/list_urls", params={"limit": 1, "cursor": response["next_cursor"]})
+            self.assertEqual(200, next_response.json()["status_code"])
+
+    def test_list_urls_bad_cursor(self):
+        response_raw = client.get(url="/api/list_urls?cursor=notacursor")
+        response = response_raw.json()
+        self.assertEqual(400, response["status_code"])
+
+    def test_list_urls_stream(self):
+        response_raw = client.get(url="/api/list_urls?stream=true")
+        self.assertEqual("application/x-ndjson", response_raw.headers["content-type"])
+
+        # Make sure every line is a url ("existing_url" will always be in the DB for testing)
+        url_list = [json.loads(line) for line in response_raw.text.splitlines()]
+        self.assertGreater(len(url_list), 0)
+        self.assertIn("existing_url", [url["short_url"] for url in url_list])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,115 @@
+import gzip
+import unittest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.api.http_caching import etag_matches, redirect_cache_control
+from app.api.middleware import accepted_encoding
+from app.main import app
+from app.service import database
+from app.service.metrics import InstrumentedStorage
+from app.service.storage_memory import MemoryBackend
+
+client = TestClient(app)
+
+
+class TestHttpCachingHelpers(unittest.TestCase):
+    def test_redirect_cache_control(self):
+        self.assertIsNone(redirect_cache_control(None, max_age=0, status_code=303))
+        self.assertEqual("public, max-age=3600", redirect_cache_control(None, max_age=3600))
+
+        # Capped at the expiry of the link
+        self.assertEqual("public, max-age=60", redirect_cache_control(1060, now=1000, max_age=3600))
+        self.assertEqual("no-store", redirect_cache_control(1000, now=1000, max_age=3600))
+
+    def test_permanent_and_expiring_redirects_are_never_cached_unbounded(self):
+        # Without a max-age browsers would keep permanent redirects for good
+        for status_code in (301, 308):
+            self.assertEqual("no-store", redirect_cache_control(None, max_age=0, status_code=status_code))
+            self.assertEqual("no-store", redirect_cache_control(1060, now=1000, max_age=0, status_code=status_code))
+            self.assertEqual(
+                "public, max-age=60", redirect_cache_control(1060, now=1000, max_age=3600, status_code=status_code)
+            )
+
+        self.assertEqual("no-store", redirect_cache_control(1060, now=1000, max_age=0, status_code=302))
+
+    def test_etag_matches(self):
+        self.assertTrue(etag_matches('"abc"', '"abc"'))
+        self.assertTrue(etag_matches('"xyz", W/"abc"', '"abc"'))
+        self.assertTrue(etag_matches("*", '"abc"'))
+        self.assertFalse(etag_matches('"xyz"', '"abc"'))
+        self.assertFalse(etag_matches(None, '"abc"'))
+
+    def test_accepted_encoding(self):
+        self.assertEqual("br", accepted_encoding("gzip, deflate, br", ("br", "gzip")))
+        self.assertEqual("gzip", accepted_encoding("gzip, br;q=0", ("br", "gzip")))
+        self.assertEqual("gzip", accepted_encoding("*", ("gzip",)))
+        self.assertIsNone(accepted_encoding("identity", ("br", "gzip")))
+
+
+class TestHttpCachingAPI(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(database, "storage", InstrumentedStorage(MemoryBackend()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        database.url_cache.clear()
+        for index in range(100):
+            database.storage.put_if_absent(f"url{index:03}", f"https://www.google.com/search?q={index}")
+
+    def test_list_urls_etag(self):
+        response = client.get("/api/list_urls", params={"limit": 10})
+        etag = response.headers["etag"]
+        self.assertEqual("no-cache", response.headers["cache-control"])
+
+        # Same page again, nothing is sent
+        response = client.get("/api/list_urls", params={"limit": 10}, headers={"If-None-Match": etag})
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(b"", response.content)
+
+        # Page changed
+        database.storage.put_if_absent("url000a", "https://www.bing.com")
+        response = client.get("/api/list_urls", params={"limit": 10}, headers={"If-None-Match": etag})
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response.headers["etag"])
+
+    def test_large_responses_are_compressed(self):
+        response = client.get("/api/list_urls", headers={"Accept-Encoding": "gzip"})
+
+        self.assertEqual("gzip", response.headers["content-encoding"])
+        self.assertEqual("Accept-Encoding", response.headers["vary"])
+        self.assertTrue(response.headers["etag"].startswith('W/"'))
+        self.assertEqual(100, len(response.json()["payload"]))
+
+        # Weak ETag of the compressed response still matches
+        response = client.get(
+            "/api/list_urls", headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]}
+        )
+        self.assertEqual(304, response.status_code)
+
+    def test_streams_are_compressed(self):
+        with client.stream(
+            "GET", "/api/list_urls", params={"stream": True}, headers={"Accept-Encoding": "gzip"}
+        ) as response:
+            self.assertEqual("gzip", response.headers["content-encoding"])
+            body = gzip.decompress(b"".join(response.iter_raw()))
+
+        self.assertEqual(100, len(body.splitlines()))
+
+    def test_small_responses_are_not_compressed(self):
+        response = client.get("/api/list_urls", params={"limit": 1}, headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("content-encoding", response.headers)
+
+    def test_redirect_cache_headers(self):
+        with patch("app.api.lean_redirect.redirect_cache_control", return_value="public, max-age=60"):
+            response = client.get("/api/r/url001", follow_redirects=False)
+
+        self.assertEqual("public, max-age=60", response.headers["cache-control"])
+
+        # No caching by default
+        response = client.get("/api/redirect/url001", follow_redirects=False)
+        self.assertEqual(303, response.status_code)
+        self.assertNotIn("cache-control", response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
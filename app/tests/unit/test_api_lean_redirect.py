@@ -0,0 +1,96 @@
+import asyncio
+import unittest
+from time import time
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.api.lean_redirect import lean_redirect
+from app.api.middleware import MetricsMiddleware
+from app.main import app
+from app.service import async_database, database
+from app.service.async_database import ServerBusy
+from app.service.metrics import InstrumentedStorage, http_request_duration
+from app.service.storage_memory import MemoryBackend
+
+client = TestClient(app)
+
+
+class TestLeanRedirectAPI(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(database, "storage", InstrumentedStorage(MemoryBackend()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        database.url_cache.clear()
+        database.storage.put_if_absent("lean_url", "https://www.google.com/search?q=a b")
+
+    def test_existing_url_redirect(self):
+        response = client.get("/api/r/lean_url", follow_redirects=False)
+
+        self.assertEqual(303, response.status_code)
+        self.assertEqual("https://www.google.com/search?q=a%20b", response.headers["location"])
+        self.assertEqual(b"", response.content)
+
+    def test_head_redirect(self):
+        response = client.head("/api/r/lean_url", follow_redirects=False)
+
+        self.assertEqual(303, response.status_code)
+        self.assertEqual("https://www.google.com/search?q=a%20b", response.headers["location"])
+
+    def test_cached_redirect_skips_db(self):
+        client.get("/api/r/lean_url", follow_redirects=False)
+
+        with patch.object(database.storage, "get_redirect_target") as get_redirect_target:
+            response = client.get("/api/r/lean_url", follow_redirects=False)
+
+        self.assertEqual(303, response.status_code)
+        get_redirect_target.assert_not_called()
+
+    def test_non_existing_url_redirect(self):
+        response = client.get("/api/r/non_existing_url")
+
+        self.assertEqual(404, response.status_code)
+        self.assertEqual("DoesNotExist", response.json()["payload"])
+
+    def test_expired_url_redirect(self):
+        database.storage.put_if_absent("expired_url", "https://www.google.com", expires_at=int(time()) - 1)
+        response = client.get("/api/r/expired_url", follow_redirects=False)
+
+        self.assertEqual(410, response.status_code)
+        self.assertEqual("Expired", response.json()["payload"])
+
+    def test_server_busy(self):
+        with patch.object(async_database, "run_admitted", side_effect=ServerBusy):
+            response = client.get("/api/r/busy_url")
+
+        self.assertEqual(503, response.status_code)
+
+    def test_other_methods(self):
+        self.assertEqual(405, client.post("/api/r/lean_url").status_code)
+
+    def test_metrics_route_label(self):
+        client.get("/api/r/lean_url", follow_redirects=False)
+        client.head("/api/r/lean_url", follow_redirects=False)
+
+        rendered = "\n".join(http_request_duration.render())
+        self.assertIn('route="/api/r/{short_url}",method="GET",status="303"', rendered)
+        self.assertIn('route="/api/r/{short_url}",method="HEAD",status="303"', rendered)
+
+    def test_route_set_in_scope(self):
+        # Without an endpoint to look up, the template must come from the route the endpoint sets
+        scope = {"type": "http", "method": "GET", "path_params": {"short_url": "lean_url"}}
+        messages = []
+
+        async def receive():
+            return {"type": "http.request"}
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(MetricsMiddleware(lean_redirect)(scope, receive, send))
+
+        self.assertEqual(303, messages[0]["status"])
+        self.assertEqual("/api/r/{short_url}", scope["route"].path)
+
+
+if __name__ == '__main__':
+    unittest.main()
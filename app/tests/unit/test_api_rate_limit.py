@@ -0,0 +1,112 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.api.middleware import route_group
+from app.main import app
+from app.service import database
+from app.service.metrics import InstrumentedStorage
+from app.service.ratelimit import ConcurrencyLimit, MemoryBucketStore, rate_limiter
+from app.service.storage_memory import MemoryBackend
+
+client = TestClient(app)
+
+
+class TestMemoryBucketStore(unittest.TestCase):
+    def test_take(self):
+        store = MemoryBucketStore(max_size=10)
+
+        # Full bucket allows a burst, then the client waits for the next token
+        self.assertEqual(0, asyncio.run(store.take("client", rate=2, burst=2)))
+        self.assertEqual(0, asyncio.run(store.take("client", rate=2, burst=2)))
+        self.assertAlmostEqual(0.5, asyncio.run(store.take("client", rate=2, burst=2)), delta=0.05)
+
+        # Other clients have their own bucket
+        self.assertEqual(0, asyncio.run(store.take("other", rate=2, burst=2)))
+
+    def test_max_size(self):
+        store = MemoryBucketStore(max_size=2)
+
+        for key in ("a", "b", "c"):
+            asyncio.run(store.take(key, rate=1, burst=1))
+
+        self.assertEqual(["b", "c"], list(store._buckets))
+
+
+class TestRouteGroup(unittest.TestCase):
+    def test_route_group(self):
+        self.assertEqual("shorten", route_group("POST", "/api/shorten_url"))
+        self.assertEqual("list", route_group("GET", "/api/list_urls"))
+        self.assertEqual("redirect", route_group("GET", "/api/r/abc"))
+        self.assertIsNone(route_group("GET", "/api/shorten_url"))
+        self.assertIsNone(route_group("GET", "/metrics"))
+
+
+class TestRateLimitAPI(unittest.TestCase):
+    def setUp(self):
+        for name, value in (
+            ("enabled", True),
+            ("store", MemoryBucketStore(max_size=100)),
+            ("limits", {"shorten": (0.001, 2)}),
+            ("concurrency_limits", {"list": ConcurrencyLimit(1)})
+        ):
+            patcher = patch.object(rate_limiter, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        patcher = patch.object(database, "storage", InstrumentedStorage(MemoryBackend()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rate_limited(self):
+        for _ in range(2):
+            response = client.post("/api/shorten_url", json={"original_url": "https://www.google.com"})
+            self.assertEqual(200, response.status_code)
+
+        response = client.post("/api/shorten_url", json={"original_url": "https://www.google.com"})
+
+        self.assertEqual(429, response.status_code)
+        self.assertEqual("TooManyRequests", response.json()["payload"])
+        self.assertGreater(int(response.headers["retry-after"]), 1)
+
+    def test_clients_are_limited_separately(self):
+        for _ in range(2):
+            client.post("/api/shorten_url", json={"original_url": "https://www.google.com"})
+
+        with patch("app.api.middleware.client_address", return_value="other"):
+            response = client.post("/api/shorten_url", json={"original_url": "https://www.google.com"})
+
+        self.assertEqual(200, response.status_code)
+
+    def test_unlimited_routes(self):
+        for _ in range(5):
+            self.assertEqual(200, client.get("/").status_code)
+
+    def test_concurrency_limit(self):
+        self.assertEqual(200, client.get("/api/list_urls", params={"limit": 10}).status_code)
+
+        # Slot is released once the response is sent, a request while it is taken is turned away
+        rate_limiter.concurrency_limits["list"].active = 1
+        response = client.get("/api/list_urls", params={"limit": 10})
+        rate_limiter.concurrency_limits["list"].active = 0
+
+        self.assertEqual(503, response.status_code)
+        self.assertEqual("1", response.headers["retry-after"])
+
+    def test_disabled(self):
+        rate_limiter.enabled = False
+
+        for _ in range(3):
+            response = client.post("/api/shorten_url", json={"original_url": "https://www.google.com"})
+            self.assertEqual(200, response.status_code)
+
+        # Concurrency limit is switched off along with the rate limits
+        rate_limiter.concurrency_limits["list"].active = 1
+        response = client.get("/api/list_urls", params={"limit": 10})
+        rate_limiter.concurrency_limits["list"].active = 0
+
+        self.assertEqual(200, response.status_code)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+from app.config import BULK_SHORTEN_MAX_RECORDS
+from app.service.database import delete_item
+from fastapi.testclient import TestClient
+from app.main import app
+
+client = TestClient(app)
+
+
+class TestShortenUrlsAPI(unittest.TestCase):
+    def test_batch(self):
+        records = [{"original_url": "https://www.google.com"}, {"original_url": "https://www.google.com"}]
+        response = client.post(url="/api/shorten_urls", json=records)
+        self.assertEqual(200, response.json()["status_code"])
+
+        results = response.json()["payload"]
+        self.assertEqual(2, len(results))
+
+        # Delete items just added to DB
+        for result in results:
+            self.assertEqual(200, result["status_code"])
+            delete_item(result["short_url"])
+
+    def test_batch_with_collision(self):
+        records = [{"original_url": "https://www.google.com", "custom_url": "existing_url"}]
+        response = client.post(url="/api/shorten_urls", json=records)
+        self.assertEqual(409, response.json()["payload"][0]["status_code"])
+
+    def test_batch_too_large(self):
+        records = [{"original_url": "https://www.google.com"}] * (BULK_SHORTEN_MAX_RECORDS + 1)
+        response = client.post(url="/api/shorten_urls", json=records)
+        self.assertEqual(413, response.json()["status_code"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+from time import time
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.service import analytics
+from app.service.metrics import InstrumentedStorage
+from app.service.storage_memory import MemoryBackend
+
+client = TestClient(app)
+
+
+class TestStatsAPI(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(analytics, "storage", InstrumentedStorage(MemoryBackend()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_click_stats(self):
+        now = int(time())
+        analytics.storage.add_clicks(analytics.stat_key("stats_url", "minute"), now // 60 * 60, 3)
+
+        response = client.get("/api/stats/stats_url", params={"resolution": "minute"})
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(200, response.json()["status_code"])
+        self.assertEqual(3, response.json()["payload"]["total"])
+
+    def test_top_urls(self):
+        analytics.storage.put_top(analytics.top_key("day"), 0, [["stats_url", 5]])
+
+        # Not taken for a short url named "top"
+        response = client.get("/api/stats/top", params={"resolution": "day", "start": 0})
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([{"short_url": "stats_url", "clicks": 5}], response.json()["payload"]["top"])
+
+    def test_bad_query(self):
+        self.assertEqual(422, client.get("/api/stats/stats_url", params={"resolution": "week"}).status_code)
+        self.assertEqual(422, client.get("/api/stats/top", params={"resolution": "minute"}).status_code)
+        self.assertEqual(422, client.get("/api/stats/top", params={"limit": 0}).status_code)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+import random
+import unittest
+from app.benchmarks.load_test import KeySampler, parse_mix, percentile
+
+
+class TestLoadTestHelpers(unittest.TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(50, percentile(values, 0.50))
+        self.assertEqual(95, percentile(values, 0.95))
+        self.assertEqual(99, percentile(values, 0.99))
+        self.assertIsNone(percentile([], 0.5))
+
+    def test_zipf_sampler_is_skewed(self):
+        sampler = KeySampler(key_count=100, distribution="zipf", zipf_exponent=1.1, rng=random.Random(0))
+        samples = [sampler.sample() for _ in range(10000)]
+
+        # Hottest key is picked far more often than the coldest one
+        self.assertGreater(samples.count(0), 10 * samples.count(99))
+
+    def test_parse_mix(self):
+        self.assertEqual({"redirect": 90.0, "shorten": 10.0}, parse_mix("redirect=90,shorten=10"))
+
+
+if __name__ == '__main__':
+    unittest.main()
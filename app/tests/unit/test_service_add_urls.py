@@ -0,0 +1,46 @@
+import unittest
+import uuid
+from app.service.database import add_urls_to_db, delete_item
+
+
+class TestAddUrls(unittest.TestCase):
+    def test_mixed_batch(self):
+        # To ensure no collision, we get a full random string to simulate a custom input
+        mock_custom_string = str(uuid.uuid4())
+
+        records = [
+            {"original_url": "https://www.google.com", "custom_url": None},
+            {"original_url": "https://www.google.com", "custom_url": mock_custom_string},
+            {"original_url": "https://www.google.com", "custom_url": "existing_url"},
+            {"original_url": "https://www.google.com", "custom_url": mock_custom_string}
+        ]
+        response = add_urls_to_db(records)
+        self.assertEqual(200, response["status_code"])
+
+        # One result per record, in input order
+        results = response["payload"]
+        self.assertEqual([200, 200, 409, 409], [result["status_code"] for result in results])
+        self.assertEqual(mock_custom_string, results[1]["short_url"])
+
+        # Delete items just added to DB
+        for result in results[:2]:
+            delete_item(result["short_url"])
+
+    def test_batch_larger_than_chunk(self):
+        records = [{"original_url": f"https://www.example.com/{i}", "custom_url": None} for i in range(60)]
+        response = add_urls_to_db(records)
+        self.assertEqual(200, response["status_code"])
+
+        results = response["payload"]
+        self.assertTrue(all(result["status_code"] == 200 for result in results))
+
+        # Every record got its own short url
+        self.assertEqual(60, len({result["short_url"] for result in results}))
+
+        # Delete items just added to DB
+        for result in results:
+            delete_item(result["short_url"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+from app.service.allocator import BASE62_ALPHABET, CounterCodeAllocator, RandomCodeAllocator, encode_base62
+
+
+class TestCodeAllocators(unittest.TestCase):
+    def test_encode_base62(self):
+        self.assertEqual("00000000", encode_base62(0, 8))
+        self.assertEqual("0000000Z", encode_base62(61, 8))
+        self.assertEqual("00000010", encode_base62(62, 8))
+
+    def test_random_codes(self):
+        allocator = RandomCodeAllocator(length=8)
+        codes = [allocator.next_code() for _ in range(1000)]
+
+        self.assertTrue(all(len(code) == 8 for code in codes))
+        self.assertTrue(all(character in BASE62_ALPHABET for code in codes for character in code))
+        self.assertEqual(1000, allocator.stats()["allocated"])
+
+    def test_counter_codes_unique(self):
+        leases = []
+
+        def lease_range(lease_size):
+            # Stands in for the DB counter, hands out consecutive ranges
+            start = len(leases) * lease_size
+            leases.append(start)
+            return start, start + lease_size
+
+        allocator = CounterCodeAllocator(length=2, lease_size=100, lease_range=lease_range)
+
+        # Run past the 62**2 code space to check codes grow instead of repeating
+        codes = [allocator.next_code() for _ in range(62 ** 2 + 100)]
+
+        self.assertEqual(len(codes), len(set(codes)))
+        self.assertEqual(40, len(leases))
+        self.assertEqual(3, len(codes[-1]))
+
+    def test_record_retry(self):
+        allocator = RandomCodeAllocator(length=8)
+        allocator.record_retry()
+        self.assertEqual(1, allocator.stats()["retries"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from app.service import async_database
+from app.service.async_database import run_in_db_executor, warm_up_storage
+from pynamodb.exceptions import PynamoDBConnectionError
+
+
+def blocking_call(value):
+    # Stands in for a blocking PynamoDB call, reports which thread it ran on
+    return {"status_code": 200, "payload": value, "thread": threading.current_thread().name}
+
+
+class TestRunInDBExecutor(unittest.TestCase):
+    def test_runs_off_event_loop(self):
+        response = asyncio.run(run_in_db_executor(blocking_call, value="test"))
+        self.assertEqual(200, response["status_code"])
+        self.assertEqual("test", response["payload"])
+        self.assertTrue(response["thread"].startswith("db"))
+
+    def test_concurrent_calls(self):
+        async def run_many():
+            return await asyncio.gather(*(run_in_db_executor(blocking_call, value=i) for i in range(20)))
+
+        responses = asyncio.run(run_many())
+        self.assertEqual(list(range(20)), [response["payload"] for response in responses])
+
+
+class TestWarmUpStorage(unittest.TestCase):
+    def test_warm_up(self):
+        with patch.object(async_database.storage, "warm_up", return_value=4) as warm_up:
+            self.assertEqual(4, asyncio.run(warm_up_storage(connections=4)))
+
+        warm_up.assert_called_once_with(4)
+
+    def test_slow_warm_up_does_not_hold_up_startup(self):
+        with patch.object(async_database.storage, "warm_up", side_effect=lambda connections: time.sleep(0.5)):
+            self.assertEqual(0, asyncio.run(warm_up_storage(connections=4, timeout=0.05)))
+
+
+class TestRunBackgroundStep(unittest.TestCase):
+    def failures(self, task):
+        prefix = f'background_task_failures_total{{task="{task}"}} '
+        rows = async_database.registry.render().splitlines()
+        return next((int(row[len(prefix):]) for row in rows if row.startswith(prefix)), 0)
+
+    def test_returns_result(self):
+        response = asyncio.run(async_database.run_background_step("test_ok", blocking_call, "test"))
+        self.assertEqual("test", response["payload"])
+        self.assertTrue(response["thread"].startswith("db"))
+        self.assertEqual(0, self.failures("test_ok"))
+
+    def test_operational_error_is_logged_and_counted(self):
+        def scan():
+            raise PynamoDBConnectionError("Scan failed")
+
+        with self.assertLogs(async_database.logger, "WARNING") as logs:
+            self.assertIsNone(asyncio.run(async_database.run_background_step("test_db_error", scan)))
+
+        self.assertIn("test_db_error", logs.output[0])
+        self.assertIn("Traceback", logs.output[0])
+        self.assertEqual(1, self.failures("test_db_error"))
+
+    def test_programming_error_is_raised(self):
+        def broken():
+            return {}["status_code"]
+
+        with self.assertLogs(async_database.logger, "ERROR") as logs:
+            with self.assertRaises(KeyError):
+                asyncio.run(async_database.run_background_step("test_bug", broken))
+
+        self.assertIn("Traceback", logs.output[0])
+        self.assertEqual(1, self.failures("test_bug"))
+
+
+
+class TestChangeFeedConsumer(unittest.TestCase):
+    def test_poll_interval_is_jittered(self):
+        polls = []
+        waits = []
+
+        class Consumer:
+            def poll(self):
+                polls.append(len(polls))
+
+        async def sleep(seconds):
+            waits.append(seconds)
+
+            if len(waits) == 2:
+                raise asyncio.CancelledError()
+
+        with patch.object(async_database.asyncio, "sleep", sleep), patch.object(async_database, "random", lambda: 0.5):
+            with self.assertRaises(asyncio.CancelledError):
+                asyncio.run(async_database.run_change_feed_consumer(Consumer(), interval=2, jitter=0.2))
+
+        self.assertEqual(2, len(polls))
+        self.assertEqual([2.2, 2.2], waits)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+from unittest.mock import patch
+from app.service import database
+from app.service.bloom import BloomFilter, ShortUrlFilter
+from app.service.metrics import InstrumentedStorage
+from app.service.storage_memory import MemoryBackend
+from pynamodb.exceptions import PynamoDBConnectionError
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000, false_positive_rate=0.01, max_bytes=1024 * 1024)
+        keys = [f"key{i}" for i in range(1000)]
+
+        for key in keys:
+            bloom.add(key)
+
+        self.assertTrue(all(key in bloom for key in keys))
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(capacity=1000, false_positive_rate=0.01, max_bytes=1024 * 1024)
+
+        for i in range(1000):
+            bloom.add(f"key{i}")
+
+        false_positives = sum(f"missing{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_memory_budget(self):
+        bloom = BloomFilter(capacity=1000000, false_positive_rate=0.001, max_bytes=1024)
+        self.assertEqual(1024, bloom.size_bytes)
+
+
+class TestShortUrlFilter(unittest.TestCase):
+    def test_not_ready_until_built(self):
+        short_url_filter = ShortUrlFilter(false_positive_rate=0.01, max_bytes=1024 * 1024, min_capacity=100)
+        self.assertTrue(short_url_filter.might_contain("anything"))
+
+        short_url_filter.rebuild(["existing_url"])
+        self.assertTrue(short_url_filter.might_contain("existing_url"))
+        self.assertFalse(short_url_filter.might_contain("nonexistant"))
+        self.assertEqual(1, short_url_filter.stats()["rejected"])
+
+    def test_add_during_rebuild_is_kept(self):
+        short_url_filter = ShortUrlFilter(false_positive_rate=0.01, max_bytes=1024 * 1024, min_capacity=100)
+
+        def scanned_urls():
+            yield "existing_url"
+            # Url added by a request while the scan is running
+            short_url_filter.add("added_url")
+
+        short_url_filter.rebuild(scanned_urls())
+        self.assertTrue(short_url_filter.might_contain("added_url"))
+
+    def test_reset(self):
+        short_url_filter = ShortUrlFilter(false_positive_rate=0.01, max_bytes=1024 * 1024, min_capacity=100)
+        short_url_filter.rebuild(["existing_url"])
+
+        short_url_filter.reset()
+        self.assertFalse(short_url_filter.ready)
+        self.assertTrue(short_url_filter.might_contain("added_elsewhere"))
+
+        def scanned_urls():
+            yield "existing_url"
+            # Changes were missed while the scan was running
+            short_url_filter.reset()
+
+        # Rebuild started before the reset is not used
+        short_url_filter.rebuild(scanned_urls())
+        self.assertFalse(short_url_filter.ready)
+
+        short_url_filter.rebuild(["existing_url", "added_elsewhere"])
+        self.assertTrue(short_url_filter.might_contain("added_elsewhere"))
+        self.assertFalse(short_url_filter.might_contain("nonexistant"))
+
+
+@patch.object(database, "storage", InstrumentedStorage(MemoryBackend()))
+class TestShortUrlFilterLookups(unittest.TestCase):
+    def setUp(self):
+        self.short_url_filter = ShortUrlFilter(false_positive_rate=0.01, max_bytes=1024 * 1024, min_capacity=100)
+        patcher = patch.object(database, "short_url_filter", self.short_url_filter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_missing_url_skips_db(self):
+        self.assertEqual(200, database.rebuild_short_url_filter()["status_code"])
+
+        with patch.object(database.storage, "get") as storage_get:
+            response = database.get_one_url("filter_nonexistant")
+
+        self.assertEqual(404, response["status_code"])
+        storage_get.assert_not_called()
+
+    def test_added_url_is_found(self):
+        database.rebuild_short_url_filter()
+        database.add_custom_url_to_db(custom_url="filter_new_url", original_url="https://www.google.com")
+
+        self.assertEqual(200, database.get_one_url("filter_new_url")["status_code"])
+
+    def test_failed_rebuild_keeps_previous_filter(self):
+        database.add_custom_url_to_db(custom_url="filter_existing_url", original_url="https://www.google.com")
+        database.rebuild_short_url_filter()
+
+        scan = database.storage.scan
+
+        def failing_scan():
+            yield from scan()
+            raise PynamoDBConnectionError("Scan failed")
+
+        with patch.object(database.storage, "scan", failing_scan):
+            self.assertEqual(500, database.rebuild_short_url_filter()["status_code"])
+
+        self.assertTrue(self.short_url_filter.ready)
+        self.assertTrue(self.short_url_filter.might_contain("filter_existing_url"))
+        self.assertFalse(self.short_url_filter.might_contain("filter_nonexistant"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+from time import sleep
+from unittest.mock import patch
+from app.service import database
+from app.service.cache import MISSING, TTLCache
+from app.service.metrics import InstrumentedStorage
+from app.service.storage_memory import MemoryBackend
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_hit_and_miss(self):
+        cache = TTLCache(max_size=10, ttl=60, negative_ttl=60)
+        self.assertIsNone(cache.get("short"))
+
+        cache.set("short", "https://www.google.com")
+        self.assertEqual("https://www.google.com", cache.get("short"))
+
+        stats = cache.stats()
+        self.assertEqual(1, stats["hits"])
+        self.assertEqual(1, stats["misses"])
+
+    def test_negative_entry(self):
+        cache = TTLCache(max_size=10, ttl=60, negative_ttl=60)
+        cache.set_missing("nonexistant")
+        self.assertIs(MISSING, cache.get("nonexistant"))
+
+        # Invalidation removes negative entries, e.g. after the url is added to the DB
+        cache.invalidate("nonexistant")
+        self.assertIsNone(cache.get("nonexistant"))
+
+    def test_expiry(self):
+        cache = TTLCache(max_size=10, ttl=60, negative_ttl=0.01)
+        cache.set_missing("nonexistant")
+        sleep(0.02)
+        self.assertIsNone(cache.get("nonexistant"))
+
+    def test_token(self):
+        cache = TTLCache(max_size=10, ttl=60, negative_ttl=60)
+
+        token = cache.token("a")
+        cache.invalidate("a")
+        cache.set("a", "https://a.com", token)
+        self.assertIsNone(cache.get("a"))
+
+        token = cache.token("a")
+        cache.clear()
+        cache.set_missing("a", token)
+        self.assertIsNone(cache.get("a"))
+
+        # Token taken after the invalidation is accepted
+        token = cache.token("a")
+        cache.set("a", "https://a.com", token)
+        self.assertEqual("https://a.com", cache.get("a"))
+
+    def test_lru_eviction(self):
+        cache = TTLCache(max_size=2, ttl=60, negative_ttl=60)
+        cache.set("a", "https://a.com")
+        cache.set("b", "https://b.com")
+
+        # Touch "a" so "b" becomes the least recently used entry
+        cache.get("a")
+        cache.set("c", "https://c.com")
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual("https://a.com", cache.get("a"))
+        self.assertEqual("https://c.com", cache.get("c"))
+        self.assertEqual(1, cache.stats()["evictions"])
+
+
+class TestCacheFillRace(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(database, "storage", InstrumentedStorage(MemoryBackend()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        database.url_cache.clear()
+        database.storage.put_if_absent("raced", "https://www.google.com")
+
+    def read_then_delete(self, read):
+        # Url is read, then deleted by another request before the reader fills the cache
+        def read_and_delete(short_url):
+            result = read(short_url)
+            database.delete_item(short_url)
+            return result
+
+        return read_and_delete
+
+    def test_get_one_url(self):
+        storage_get = self.read_then_delete(database.storage.get)
+
+        with patch.object(database.storage, "get", side_effect=storage_get):
+            self.assertEqual(200, database.get_one_url("raced")["status_code"])
+
+        self.assertIsNone(database.url_cache.get("raced"))
+        self.assertEqual(404, database.get_one_url("raced")["status_code"])
+
+    def test_load_redirect_target(self):
+        get_redirect_target = self.read_then_delete(database.storage.get_redirect_target)
+
+        with patch.object(database.storage, "get_redirect_target", side_effect=get_redirect_target):
+            self.assertEqual(("https://www.google.com", None), database.load_redirect_target("raced"))
+
+        self.assertIsNone(database.url_cache.get("raced"))
+        self.assertIsNone(database.find_redirect_target("raced"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from app.service.analytics import ClickAggregator
+
+
+class TestClickAggregator(unittest.TestCase):
+    def test_coalesce_per_minute(self):
+        aggregator = ClickAggregator(max_pending_keys=10)
+
+        # Three clicks in the same minute, one in the next
+        for timestamp in [120, 130, 179, 180]:
+            aggregator.record("existing_url", timestamp=timestamp)
+
+        self.assertEqual({("existing_url", 120): 3, ("existing_url", 180): 1}, aggregator.drain())
+
+        # Drained counts are not returned twice
+        self.assertEqual({}, aggregator.drain())
+
+    def test_memory_bound(self):
+        aggregator = ClickAggregator(max_pending_keys=1)
+        aggregator.record("first", timestamp=0)
+        aggregator.record("second", timestamp=0)
+
+        # Existing keys keep counting once the bound is reached
+        aggregator.record("first", timestamp=0)
+
+        self.assertEqual({("first", 0): 2}, aggregator.drain())
+        self.assertEqual(1, aggregator.stats()["dropped"])
+
+    def test_restore_failed_flush(self):
+        aggregator = ClickAggregator(max_pending_keys=10)
+        aggregator.record("existing_url", timestamp=0)
+        counts = aggregator.drain()
+
+        aggregator.record("existing_url", timestamp=0)
+        aggregator.restore(counts)
+
+        self.assertEqual({("existing_url", 0): 2}, aggregator.drain())
+
+
+if __name__ == '__main__':
+    unittest.main()
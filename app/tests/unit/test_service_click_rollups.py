@@ -0,0 +1,168 @@
+import unittest
+from unittest.mock import patch
+from app.service import analytics
+from app.service.metrics import InstrumentedStorage
+from app.service.storage_memory import MemoryBackend
+from pynamodb.exceptions import PynamoDBConnectionError
+
+HOUR = 3600
+DAY = 86400
+
+# Late enough for every bucket of the first day to be folded
+NEXT_DAY = 2 * DAY
+
+
+class TestClickRollups(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(analytics, "storage", InstrumentedStorage(MemoryBackend()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def flush(self, clicks):
+        aggregator = analytics.ClickAggregator(max_pending_keys=100)
+
+        for short_url, timestamp in clicks:
+            aggregator.record(short_url, timestamp=timestamp)
+
+        self.assertEqual({}, analytics.flush_click_counts(aggregator.drain()))
+
+    def test_compaction(self):
+        self.flush([("first", 0), ("first", 59), ("first", 60), ("first", HOUR + 1), ("second", 2 * HOUR)])
+
+        # Hours only, the day is not over yet
+        self.assertEqual(3, analytics.compact_click_rollups(now=3 * HOUR + analytics.CLICK_ROLLUP_GRACE_SECONDS))
+        self.assertEqual(
+            [(0, 3), (HOUR, 1)], analytics.storage.query_clicks(analytics.stat_key("first", "hour"), 0, DAY)
+        )
+
+        # Days are folded from the hours, nothing is left pending
+        self.assertEqual(2, analytics.compact_click_rollups(now=NEXT_DAY))
+        self.assertEqual([(0, 4)], analytics.storage.query_clicks(analytics.stat_key("first", "day"), 0, DAY))
+        self.assertEqual(0, analytics.compact_click_rollups(now=NEXT_DAY))
+
+    def test_open_bucket_is_not_folded(self):
+        self.flush([("first", HOUR - 1)])
+
+        # Hour ended, but within the grace time
+        self.assertEqual(0, analytics.compact_click_rollups(now=HOUR + analytics.CLICK_ROLLUP_GRACE_SECONDS - 1))
+        self.assertEqual(1, analytics.compact_click_rollups(now=HOUR + analytics.CLICK_ROLLUP_GRACE_SECONDS))
+
+    def test_late_clicks_are_folded_again(self):
+        self.flush([("first", 0)])
+        analytics.compact_click_rollups(now=NEXT_DAY)
+
+        self.flush([("first", 1)])
+        analytics.compact_click_rollups(now=NEXT_DAY)
+
+        self.assertEqual([(0, 2)], analytics.storage.query_clicks(analytics.stat_key("first", "hour"), 0, DAY))
+        self.assertEqual([(0, 2)], analytics.storage.query_clicks(analytics.stat_key("first", "day"), 0, DAY))
+
+    def test_failed_marker_keeps_clicks_pending(self):
+        aggregator = analytics.ClickAggregator(max_pending_keys=100)
+        aggregator.record("first", timestamp=0)
+        counts = aggregator.drain()
+
+        with patch.object(analytics.storage, "add_pending_rollup", side_effect=PynamoDBConnectionError):
+            self.assertEqual(counts, analytics.flush_click_counts(counts))
+
+        # Nothing written that compaction would not know about
+        self.assertEqual([], analytics.storage.query_clicks(analytics.stat_key("first", "minute"), 0, DAY))
+
+    def test_click_stats(self):
+        self.flush([("first", 0), ("first", 60), ("first", HOUR), ("first", NEXT_DAY)])
+        analytics.compact_click_rollups(now=NEXT_DAY)
+
+        response = analytics.get_click_stats("first", "hour", start=0, end=DAY, now=NEXT_DAY)
+        self.assertEqual(200, response["status_code"])
+        self.assertEqual(
+            {"resolution": "hour", "start": 0, "end": DAY, "total": 3,
+             "buckets": [{"start": 0, "clicks": 2}, {"start": HOUR, "clicks": 1}]},
+            response["payload"]
+        )
+
+        # Start is aligned to the bucket it falls in
+        response = analytics.get_click_stats("first", "minute", start=30, end=120, now=NEXT_DAY)
+        self.assertEqual([{"start": 0, "clicks": 1}, {"start": 60, "clicks": 1}], response["payload"]["buckets"])
+
+    def test_recent_buckets_are_summed_from_finer_buckets(self):
+        now = NEXT_DAY + 30 * 60
+        self.flush([("first", NEXT_DAY), ("first", NEXT_DAY + 60)])
+
+        # Current hour and day are not folded yet
+        response = analytics.get_click_stats("first", "hour", start=NEXT_DAY, end=now, now=now)
+        self.assertEqual([{"start": NEXT_DAY, "clicks": 2}], response["payload"]["buckets"])
+
+        response = analytics.get_click_stats("first", "day", start=NEXT_DAY, end=now, now=now)
+        self.assertEqual([{"start": NEXT_DAY, "clicks": 2}], response["payload"]["buckets"])
+
+    def test_click_stats_bad_request(self):
+        for resolution, start, end, payload in [
+            ("week", 0, DAY, "InvalidResolution"),
+            ("hour", DAY, 0, "InvalidTimeRange"),
+            ("minute", 0, 60 * (analytics.STATS_MAX_BUCKETS + 1), f"Maximum {analytics.STATS_MAX_BUCKETS} buckets")
+        ]:
+            response = analytics.get_click_stats("first", resolution, start=start, end=end, now=NEXT_DAY)
+            self.assertEqual(400, response["status_code"])
+            self.assertEqual(payload, response["payload"])
+
+    def test_top_urls(self):
+        # Enough short urls to spread over several shards
+        self.flush([(f"url{index}", 0) for index in range(20) for _ in range(index + 1)])
+        analytics.compact_click_rollups(now=NEXT_DAY)
+
+        for resolution in ["hour", "day"]:
+            response = analytics.get_top_urls(resolution, start=0, limit=3, now=NEXT_DAY)
+            self.assertEqual(200, response["status_code"])
+            self.assertEqual(
+                [{"short_url": "url19", "clicks": 20}, {"short_url": "url18", "clicks": 19},
+                 {"short_url": "url17", "clicks": 18}],
+                response["payload"]["top"]
+            )
+
+    def test_top_urls_merge_late_clicks(self):
+        self.flush([("first", 0), ("first", 1), ("second", 0)])
+        analytics.compact_click_rollups(now=NEXT_DAY)
+
+        # Folding only "second" again keeps "first" in the top list
+        self.flush([("second", 2), ("second", 3)])
+        analytics.compact_click_rollups(now=NEXT_DAY)
+
+        response = analytics.get_top_urls("hour", start=0, now=NEXT_DAY)
+        self.assertEqual(
+            [{"short_url": "second", "clicks": 3}, {"short_url": "first", "clicks": 2}], response["payload"]["top"]
+        )
+
+    def test_top_urls_default_bucket(self):
+        self.flush([("first", 0)])
+        analytics.compact_click_rollups(now=NEXT_DAY)
+
+        # Latest day certain to be folded is the first one
+        response = analytics.get_top_urls("day", now=NEXT_DAY)
+        self.assertEqual(0, response["payload"]["start"])
+        self.assertEqual([{"short_url": "first", "clicks": 1}], response["payload"]["top"])
+
+        self.assertEqual("InvalidResolution", analytics.get_top_urls("minute", now=NEXT_DAY)["payload"])
+
+    def test_failed_compaction_keeps_buckets_pending(self):
+        self.flush([("first", 0), ("first", 60), ("second", 0)])
+        set_clicks = analytics.storage.set_clicks
+
+        def failing_set_clicks(key, bucket_start, clicks):
+            if key == analytics.stat_key("second", "hour"):
+                raise PynamoDBConnectionError("Write failed")
+
+            set_clicks(key, bucket_start, clicks)
+
+        with patch.object(analytics.storage, "set_clicks", side_effect=failing_set_clicks):
+            with self.assertRaises(PynamoDBConnectionError):
+                analytics.compact_click_rollups(now=NEXT_DAY)
+
+        # Next run folds what was left pending, nothing is counted twice
+        analytics.compact_click_rollups(now=NEXT_DAY)
+        self.assertEqual([(0, 2)], analytics.storage.query_clicks(analytics.stat_key("first", "day"), 0, DAY))
+        self.assertEqual([(0, 1)], analytics.storage.query_clicks(analytics.stat_key("second", "day"), 0, DAY))
+        self.assertEqual(0, analytics.compact_click_rollups(now=NEXT_DAY))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+from unittest.mock import patch
+from app.service import database
+from app.service.dedup import normalize_url, original_url_hash
+from app.service.metrics import InstrumentedStorage
+from app.service.storage_memory import MemoryBackend
+
+
+class TestNormalizeUrl(unittest.TestCase):
+    def test_equivalent_urls(self):
+        self.assertEqual(normalize_url("https://www.google.com/"), normalize_url("HTTPS://WWW.Google.com:443"))
+        self.assertEqual(original_url_hash("http://a.com"), original_url_hash(" http://A.com/ "))
+
+    def test_different_urls(self):
+        self.assertNotEqual(normalize_url("http://a.com/Page"), normalize_url("http://a.com/page"))
+        self.assertNotEqual(normalize_url("http://a.com:8080/"), normalize_url("http://a.com/"))
+        self.assertNotEqual(normalize_url("http://a.com/?q=1"), normalize_url("http://a.com/?q=2"))
+        self.assertNotEqual(normalize_url("http://a.com/#/settings"), normalize_url("http://a.com/#/billing"))
+
+    def test_unparseable_url(self):
+        self.assertEqual("not a url", normalize_url(" not a url "))
+
+
+@patch.object(database, "DEDUP_ENABLED", True)
+@patch.object(database, "storage", InstrumentedStorage(MemoryBackend()))
+class TestDedupRandomUrl(unittest.TestCase):
+    def test_same_url_reuses_short_url(self):
+        first = database.add_random_url_to_db(original_url="https://www.dedup.com/page")
+        second = database.add_random_url_to_db(original_url="HTTPS://www.DEDUP.com/page")
+
+        self.assertEqual(200, second["status_code"])
+        self.assertEqual(first["short_url"], second["short_url"])
+
+    def test_different_url_gets_new_short_url(self):
+        first = database.add_random_url_to_db(original_url="https://www.dedup.com/a")
+        second = database.add_random_url_to_db(original_url="https://www.dedup.com/b")
+
+        self.assertNotEqual(first["short_url"], second["short_url"])
+
+    def test_fragment_routes_get_different_short_urls(self):
+        settings = database.add_random_url_to_db(original_url="https://app.dedup.com/#/settings")
+        billing = database.add_random_url_to_db(original_url="https://app.dedup.com/#/billing")
+
+        self.assertNotEqual(settings["short_url"], billing["short_url"])
+        self.assertEqual(
+            "https://app.dedup.com/#/billing", database.get_one_url(billing["short_url"])["payload"].original_url
+        )
+
+    def test_custom_urls_are_not_reused(self):
+        database.add_custom_url_to_db(custom_url="dedup_custom", original_url="https://www.dedup.com/custom")
+        response = database.add_random_url_to_db(original_url="https://www.dedup.com/custom")
+
+        self.assertNotEqual("dedup_custom", response["short_url"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from time import time
+from unittest.mock import patch
+from app.service import database
+from app.service.metrics import InstrumentedStorage
+from app.service.storage_memory import MemoryBackend
+
+
+class TestUrlExpiry(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(database, "storage", InstrumentedStorage(MemoryBackend()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        database.url_cache.clear()
+
+    def test_url_with_expiry(self):
+        expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        database.add_custom_url_to_db(
+            custom_url="expiring", original_url="https://www.google.com", expires_at=expires_at
+        )
+
+        # Read from DB, then from cache
+        for _ in range(2):
+            response = database.get_one_url("expiring")
+            self.assertEqual(200, response["status_code"])
+            self.assertEqual(int(expires_at.timestamp()), int(response["payload"].expires_at.timestamp()))
+
+    def test_expired_url(self):
+        database.storage.put_if_absent("expired", "https://www.google.com", expires_at=int(time()) - 1)
+
+        # Read from DB, then from cache
+        for _ in range(2):
+            response = database.get_one_url("expired")
+            self.assertEqual(410, response["status_code"])
+            self.assertEqual("Expired", response["payload"])
+
+        self.assertEqual([], database.get_url_page(limit=10)["payload"])
+
+    def test_expiry_in_the_past(self):
+        response = database.add_random_url_to_db(
+            original_url="https://www.google.com", expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)
+        )
+
+        self.assertEqual(400, response["status_code"])
+        self.assertEqual("InvalidExpiry", response["payload"])
+
+    def test_expired_custom_url_is_reused(self):
+        database.storage.put_if_absent("reused", "https://www.google.com", expires_at=int(time()) - 1)
+        response = database.add_custom_url_to_db(custom_url="reused", original_url="https://www.bing.com")
+
+        self.assertEqual(200, response["status_code"])
+        self.assertEqual("https://www.bing.com", database.get_one_url("reused")["payload"].original_url)
+
+    @patch.object(database, "RANDOM_URL_DEFAULT_TTL_SECONDS", 60)
+    def test_default_ttl_for_random_urls(self):
+        response = database.add_random_url_to_db(original_url="https://www.google.com")
+        expires_at = database.get_one_url(response["short_url"])["payload"].expires_at
+
+        self.assertAlmostEqual(time() + 60, expires_at.timestamp(), delta=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
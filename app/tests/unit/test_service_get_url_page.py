@@ -0,0 +1,74 @@
+import unittest
+from base64 import urlsafe_b64encode
+from json import dumps
+from unittest.mock import patch
+from botocore.exceptions import ClientError
+from app.service import database
+from app.service.database import get_url_page
+from app.service.metrics import InstrumentedStorage
+from app.service.storage_dynamodb import DynamoDBBackend
+from app.service.storage_memory import MemoryBackend
+from pynamodb.exceptions import ScanError
+
+
+def cursor(next_key):
+    return urlsafe_b64encode(dumps(next_key).encode()).decode()
+
+
+class TestGetUrlPage(unittest.TestCase):
+    def test_successful_retrieval(self):
+        response = get_url_page(limit=1)
+        self.assertEqual(200, response["status_code"])
+        self.assertLessEqual(len(response["payload"]), 1)
+
+    def test_follow_cursor(self):
+        first_page = get_url_page(limit=1)
+        self.assertEqual(200, first_page["status_code"])
+
+        if first_page["next_cursor"]:
+            second_page = get_url_page(limit=1, cursor=first_page["next_cursor"])
+            self.assertEqual(200, second_page["status_code"])
+            self.assertNotEqual(first_page["payload"], second_page["payload"])
+
+    def test_invalid_cursor(self):
+        bad_cursors = ["not a cursor", "bm90IGpzb24", "WyJsaXN0Il0"]
+
+        for bad_cursor in bad_cursors:
+            response = get_url_page(limit=1, cursor=bad_cursor)
+            self.assertEqual(400, response["status_code"], msg=bad_cursor)
+
+
+class TestTamperedCursor(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(database, "storage", InstrumentedStorage(MemoryBackend()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        database.storage.put_if_absent("first", "https://www.google.com")
+
+    def test_malformed_start_key(self):
+        # Decodes fine, but is not a start key of the backend
+        for bad_cursor in [cursor({"ShortUrl": {"S": "first"}}), cursor(None), cursor(5)]:
+            response = get_url_page(limit=1, cursor=bad_cursor)
+            self.assertEqual((400, "InvalidCursor"), (response["status_code"], response["payload"]), msg=bad_cursor)
+
+    def test_dynamodb_start_key(self):
+        backend = DynamoDBBackend()
+
+        for start_key in ["first", {"ShortUrl": "first"}, {"ShortUrl": {"N": "1"}}, {"Other": {"S": "first"}}]:
+            with self.assertRaises(ValueError, msg=start_key):
+                backend.scan_page(limit=1, start_key=start_key)
+
+    def test_start_key_rejected_by_db(self):
+        error = ScanError("Failed to scan", ClientError({"Error": {"Code": "ValidationException"}}, "Scan"))
+
+        with patch.object(database.storage, "scan_page", side_effect=error):
+            response = get_url_page(limit=1, cursor=cursor("first"))
+            self.assertEqual((400, "InvalidCursor"), (response["status_code"], response["payload"]))
+
+            # Without a cursor the request itself was fine
+            self.assertEqual(500, get_url_page(limit=1)["status_code"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+import os
+import shutil
+import tempfile
+import unittest
+from time import time
+from unittest.mock import patch
+from app.service import analytics, database
+from app.service.hotlinks import HotLinkSnapshot, snapshot_age, snapshot_build_lock, write_snapshot
+from app.service.metrics import InstrumentedStorage
+from app.service.storage_memory import MemoryBackend
+
+
+class TestHotLinkSnapshot(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "hot_links.snapshot")
+
+    def test_lookup(self):
+        targets = [(f"url{index}", f"https://example.com/{index}", None) for index in range(1000)]
+        targets.append(("expiring", "https://www.google.com/search?q=ä", 4102444800))
+        self.assertEqual(1001, write_snapshot(self.path, targets))
+
+        snapshot = HotLinkSnapshot(self.path)
+        self.assertIsNone(snapshot.lookup("url1"))
+        self.assertTrue(snapshot.refresh())
+
+        for short_url, original_url, expires_at in targets:
+            self.assertEqual((original_url, expires_at), snapshot.lookup(short_url))
+
+        self.assertIsNone(snapshot.lookup("missing"))
+        self.assertEqual(1001, snapshot.stats()["entries"])
+        self.assertEqual(1, snapshot.stats()["misses"])
+
+    def test_refresh_picks_up_new_file(self):
+        write_snapshot(self.path, [("first", "https://www.google.com", None)])
+        snapshot = HotLinkSnapshot(self.path)
+        snapshot.refresh()
+
+        # Same file is not mapped again
+        self.assertFalse(snapshot.refresh())
+
+        write_snapshot(self.path, [("second", "https://www.bing.com", None)])
+        self.assertTrue(snapshot.refresh())
+        self.assertIsNone(snapshot.lookup("first"))
+        self.assertEqual(("https://www.bing.com", None), snapshot.lookup("second"))
+
+    def test_malformed_file_keeps_snapshot(self):
+        write_snapshot(self.path, [("first", "https://www.google.com", None)])
+        snapshot = HotLinkSnapshot(self.path)
+        snapshot.refresh()
+
+        with open(self.path + ".new", "wb") as snapshot_file:
+            snapshot_file.write(b"not a snapshot at all")
+        os.replace(self.path + ".new", self.path)
+
+        self.assertFalse(snapshot.refresh())
+        self.assertEqual(("https://www.google.com", None), snapshot.lookup("first"))
+
+    def test_exclude(self):
+        write_snapshot(self.path, [("first", "https://www.google.com", None)], created_at=time() - 10)
+        snapshot = HotLinkSnapshot(self.path)
+        snapshot.refresh()
+
+        snapshot.exclude("first")
+        self.assertIsNone(snapshot.lookup("first"))
+
+        # Stays hidden in snapshots built before the delete
+        write_snapshot(self.path, [("first", "https://www.google.com", None)], created_at=time() - 5)
+        snapshot.refresh()
+        self.assertIsNone(snapshot.lookup("first"))
+
+        # Built after the delete, so it is served again
+        write_snapshot(self.path, [("first", "https://www.bing.com", None)], created_at=time() + 1)
+        snapshot.refresh()
+        self.assertEqual(("https://www.bing.com", None), snapshot.lookup("first"))
+
+    def test_clear(self):
+        write_snapshot(self.path, [("first", "https://www.google.com", None)], created_at=time() - 10)
+        snapshot = HotLinkSnapshot(self.path)
+        snapshot.refresh()
+
+        snapshot.clear()
+        self.assertIsNone(snapshot.lookup("first"))
+
+        # Built after the clear, so it is served again
+        write_snapshot(self.path, [("first", "https://www.bing.com", None)], created_at=time() + 1)
+        snapshot.refresh()
+        self.assertEqual(("https://www.bing.com", None), snapshot.lookup("first"))
+
+    def test_build_lock(self):
+        self.assertIsNone(snapshot_age(self.path))
+
+        with snapshot_build_lock(self.path) as locked:
+            self.assertTrue(locked)
+
+            # Another worker does not get the lock while it is held
+            with snapshot_build_lock(self.path) as other_locked:
+                self.assertFalse(other_locked)
+
+        with snapshot_build_lock(self.path) as locked:
+            self.assertTrue(locked)
+
+
+class TestHotLinkSnapshotRebuild(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        snapshot = HotLinkSnapshot(os.path.join(directory, "hot_links.snapshot"))
+        storage = InstrumentedStorage(MemoryBackend())
+
+        for module, name, value in [
+            (database, "storage", storage), (analytics, "storage", storage),
+            (database, "hot_link_snapshot", snapshot), (analytics, "hot_link_snapshot", snapshot)
+        ]:
+            patcher = patch.object(module, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        database.url_cache.clear()
+
+    def test_rebuild_and_lookup(self):
+        now = int(time())
+        hour_start = now // 3600 * 3600 - 3600
+
+        database.storage.put_if_absent("hot", "https://www.google.com")
+        database.storage.put_if_absent("expired", "https://www.bing.com", expires_at=now - 1)
+        database.storage.put_top(analytics.top_key("hour"), hour_start, [["hot", 10], ["expired", 5], ["deleted", 1]])
+
+        with patch.object(analytics, "HOT_LINK_SNAPSHOT_INTERVAL_SECONDS", 0):
+            analytics.refresh_hot_link_snapshot()
+
+        self.assertEqual(1, database.hot_link_snapshot.stats()["entries"])
+
+        # Served without reaching storage
+        with patch.object(database.storage, "get", side_effect=AssertionError("DB was queried")):
+            self.assertEqual(200, database.get_one_url("hot")["status_code"])
+
+        with patch.object(database.storage, "get_redirect_target", side_effect=AssertionError("DB was queried")):
+            self.assertEqual(("https://www.google.com", None), database.find_redirect_target("hot"))
+
+        # Deleted urls are no longer served by this worker
+        database.delete_item("hot")
+        self.assertEqual(404, database.get_one_url("hot")["status_code"])
+
+    def test_purge_hides_snapshot(self):
+        database.storage.put_if_absent("hot", "https://www.google.com")
+        database.storage.put_top(analytics.top_key("hour"), int(time()) // 3600 * 3600 - 3600, [["hot", 10]])
+
+        with patch.object(analytics, "HOT_LINK_SNAPSHOT_INTERVAL_SECONDS", 0):
+            analytics.refresh_hot_link_snapshot()
+
+        self.assertEqual(200, database.purge_all_urls()["status_code"])
+
+        self.assertEqual(404, database.get_one_url("hot")["status_code"])
+        self.assertIsNone(database.find_redirect_target("hot"))
+
+    def test_failed_rebuild_keeps_snapshot(self):
+        database.storage.put_if_absent("hot", "https://www.google.com")
+        database.storage.put_top(analytics.top_key("hour"), int(time()) // 3600 * 3600 - 3600, [["hot", 10]])
+
+        with patch.object(analytics, "HOT_LINK_SNAPSHOT_INTERVAL_SECONDS", 0):
+            analytics.refresh_hot_link_snapshot()
+
+            with patch.object(analytics, "write_snapshot", side_effect=OSError("No space left on device")):
+                self.assertEqual("SnapshotWriteError", analytics.rebuild_hot_link_snapshot()["payload"])
+                analytics.refresh_hot_link_snapshot()
+
+        self.assertEqual(1, database.hot_link_snapshot.stats()["entries"])
+
+        with patch.object(database.storage, "get_redirect_target", side_effect=AssertionError("DB was queried")):
+            self.assertEqual(("https://www.google.com", None), database.find_redirect_target("hot"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from app.service.metrics import Collector, Histogram, InstrumentedStorage, Registry, db_operation_duration
+from app.service.storage_memory import MemoryBackend
+from pynamodb.exceptions import DoesNotExist
+
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram_render(self):
+        histogram = Histogram("test_seconds", "Test latencies.", label_names=("route",), buckets=(0.1, 1))
+        histogram.observe(0.05, "/a")
+        histogram.observe(0.5, "/a")
+        histogram.observe(5, "/a")
+
+        lines = histogram.render()
+        self.assertIn("# TYPE test_seconds histogram", lines)
+        self.assertIn('test_seconds_bucket{route="/a",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{route="/a",le="1"} 2', lines)
+        self.assertIn('test_seconds_bucket{route="/a",le="+Inf"} 3', lines)
+        self.assertIn('test_seconds_sum{route="/a"} 5.55', lines)
+        self.assertIn('test_seconds_count{route="/a"} 3', lines)
+
+    def test_collector_render(self):
+        registry = Registry()
+        registry.register(Collector("test_total", "Test events.", "counter", lambda: [(("hits",), 3)], ("event",)))
+
+        self.assertIn('test_total{event="hits"} 3\n', registry.render())
+
+    def test_instrumented_storage_records_outcomes(self):
+        storage = InstrumentedStorage(MemoryBackend())
+        storage.put_if_absent("short", "https://www.google.com")
+        self.assertEqual("https://www.google.com", storage.get("short").original_url)
+
+        with self.assertRaises(DoesNotExist):
+            storage.get("nonexistant")
+
+        rendered = "\n".join(db_operation_duration.render())
+        self.assertIn('backend="memory",operation="put_if_absent",outcome="ok"', rendered)
+        self.assertIn('backend="memory",operation="get",outcome="DoesNotExist"', rendered)
+
+        # Methods that are not instrumented still reach the backend
+        self.assertEqual("memory", storage.name)
@@ -0,0 +1,25 @@
+import unittest
+from app.service.scan import parallel_scan
+
+
+class TestParallelScan(unittest.TestCase):
+    def test_segments_match_sequential_scan(self):
+        sequential_urls = sorted(url_item.short_url for url_item in parallel_scan(total_segments=1))
+        parallel_urls = sorted(url_item.short_url for url_item in parallel_scan(total_segments=4))
+
+        # Every item is returned exactly once regardless of the number of segments
+        self.assertEqual(sequential_urls, parallel_urls)
+        self.assertIn("existing_url", parallel_urls)
+
+    def test_read_capacity_budget(self):
+        url_items = list(parallel_scan(total_segments=2, read_capacity_per_second=10))
+        self.assertGreater(len(url_items), 0)
+
+    def test_stop_early(self):
+        # Closing the generator early must not hang on the scanning threads
+        for _ in parallel_scan(total_segments=4):
+            break
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+from app.service.database import add_random_url_to_db, get_all_urls, purge_all_urls, reset_db
+
+
+class TestPurgeAllUrls(unittest.TestCase):
+    def test_purge(self):
+        # Make sure there is more than one item to delete
+        for _ in range(30):
+            add_random_url_to_db(original_url="https://www.google.com")
+
+        response = purge_all_urls(total_segments=4)
+        self.assertEqual(200, response["status_code"])
+
+        # Table should now be empty
+        self.assertEqual([], get_all_urls()["payload"])
+
+        # Resets DB after testing to only contain 1 entry --> "existing_url" : "https://www.google.com"
+        reset_db()
+
+    def test_recreate_table(self):
+        response = reset_db(recreate_table=True)
+        self.assertEqual(200, response["status_code"])
+
+        # Only the existing url is left after the reset
+        all_urls = get_all_urls()["payload"]
+        self.assertEqual(["existing_url"], [url["short_url"] for url in all_urls])
+
+
+if __name__ == '__main__':
+    unittest.main()
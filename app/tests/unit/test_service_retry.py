@@ -0,0 +1,147 @@
+import unittest
+from botocore.exceptions import ClientError
+from time import sleep
+from unittest.mock import MagicMock, patch
+from app.service import database
+from app.service.metrics import InstrumentedStorage
+from app.service.retry import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceeded, RetryPolicy, RetryingStorage, is_throttled, is_transient,
+    run_with_deadline
+)
+from app.service.storage_memory import MemoryBackend
+from pynamodb.exceptions import GetError, PutError, PynamoDBConnectionError
+
+
+def dynamodb_error(error_class, code):
+    return error_class("DynamoDB request failed", ClientError({"Error": {"Code": code}}, "Operation"))
+
+
+THROTTLED = dynamodb_error(PutError, "ProvisionedThroughputExceededException")
+UNREACHABLE = PynamoDBConnectionError("Connection failed", ConnectionError())
+
+
+class TestErrorClassification(unittest.TestCase):
+    def test_classification(self):
+        self.assertTrue(is_throttled(THROTTLED))
+        self.assertTrue(is_transient(THROTTLED))
+        self.assertTrue(is_transient(UNREACHABLE))
+        self.assertTrue(is_transient(dynamodb_error(GetError, "InternalServerError")))
+
+        # Answers of a healthy DB
+        self.assertFalse(is_transient(dynamodb_error(PutError, "ConditionalCheckFailedException")))
+        self.assertFalse(is_transient(PutError("Short url already exists")))
+        self.assertFalse(is_transient(CircuitOpenError()))
+
+
+class TestRetryingStorage(unittest.TestCase):
+    def setUp(self):
+        self.backend = MagicMock()
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60)
+        self.storage = RetryingStorage(
+            self.backend, RetryPolicy(max_attempts=3, base_backoff=0.001, max_backoff=0.01, deadline_seconds=5),
+            self.breaker
+        )
+
+    def test_throttled_write_is_retried(self):
+        self.backend.put_if_absent.side_effect = [THROTTLED, THROTTLED, None]
+        self.storage.put_if_absent("short", "https://www.google.com")
+
+        self.assertEqual(3, self.backend.put_if_absent.call_count)
+        self.assertEqual({("put_if_absent", "throttled"): 2}, self.storage.stats())
+
+    def test_failed_write_is_not_retried(self):
+        self.backend.put_if_absent.side_effect = UNREACHABLE
+
+        with self.assertRaises(PynamoDBConnectionError):
+            self.storage.put_if_absent("short", "https://www.google.com")
+
+        self.assertEqual(1, self.backend.put_if_absent.call_count)
+
+    def test_failed_read_is_retried(self):
+        self.backend.get_redirect_target.side_effect = [UNREACHABLE, ("https://www.google.com", None)]
+
+        self.assertEqual(("https://www.google.com", None), self.storage.get_redirect_target("short"))
+        self.assertEqual(2, self.backend.get_redirect_target.call_count)
+
+    def test_attempts_are_limited(self):
+        self.backend.get.side_effect = UNREACHABLE
+
+        with self.assertRaises(PynamoDBConnectionError):
+            self.storage.get("short")
+
+        self.assertEqual(3, self.backend.get.call_count)
+
+    def test_deadline(self):
+        self.backend.get.side_effect = UNREACHABLE
+
+        with self.assertRaises(DeadlineExceeded):
+            run_with_deadline(lambda: self.storage.get("short"), seconds=0)
+
+        self.backend.get.assert_not_called()
+
+    def test_circuit_breaker(self):
+        self.backend.get.side_effect = UNREACHABLE
+
+        # Three failed attempts open the breaker, later calls fail without reaching the backend
+        with self.assertRaises(PynamoDBConnectionError):
+            self.storage.get("short")
+
+        with self.assertRaises(CircuitOpenError):
+            self.storage.get("short")
+
+        self.assertEqual(3, self.backend.get.call_count)
+        self.assertEqual({"state": "open", "opened": 1, "rejected": 1}, self.breaker.stats())
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_half_open(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.01)
+        breaker.before_call()
+        breaker.record(failed=True)
+
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+
+        sleep(0.02)
+
+        # One trial call is let through, others keep failing fast until it finishes
+        breaker.before_call()
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+
+        breaker.record(failed=False)
+        breaker.before_call()
+        self.assertEqual("closed", breaker.stats()["state"])
+
+
+class TestRandomUrlRetries(unittest.TestCase):
+    def setUp(self):
+        self.storage = InstrumentedStorage(MemoryBackend())
+        patcher = patch.object(database, "storage", self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_db_failure_is_not_retried(self):
+        with patch.object(self.storage, "put_if_absent", side_effect=UNREACHABLE) as put_if_absent:
+            response = database.add_random_url_to_db(original_url="https://www.google.com")
+
+        self.assertEqual(500, response["status_code"])
+        self.assertEqual(1, put_if_absent.call_count)
+
+    def test_throttled_put_is_not_a_collision(self):
+        with patch.object(self.storage, "put_if_absent", side_effect=THROTTLED):
+            response = database.add_url_to_db(short_url="short", original_url="https://www.google.com")
+
+        self.assertEqual(500, response["status_code"])
+
+    def test_collision_gets_new_short_url(self):
+        self.storage.put_if_absent("taken", "https://www.google.com")
+
+        with patch.object(database, "generate_random_short_url", side_effect=["taken", "free"]):
+            response = database.add_random_url_to_db(original_url="https://www.google.com")
+
+        self.assertEqual("free", response["short_url"])
+
+
+if __name__ == '__main__':
+    unittest.main()
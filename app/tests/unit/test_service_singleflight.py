@@ -0,0 +1,71 @@
+import asyncio
+import unittest
+from app.service.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_are_collapsed(self):
+        single_flight = SingleFlight()
+        calls = []
+
+        async def lookup():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "https://www.google.com"
+
+        async def run_many():
+            return await asyncio.gather(*(single_flight.do("hot_url", lookup) for _ in range(50)))
+
+        results = asyncio.run(run_many())
+
+        self.assertEqual(["https://www.google.com"] * 50, results)
+        self.assertEqual(1, len(calls))
+        self.assertEqual({"executed": 1, "collapsed": 49, "in_flight": 0}, single_flight.stats())
+
+    def test_sequential_calls_are_not_collapsed(self):
+        single_flight = SingleFlight()
+
+        async def lookup():
+            return "https://www.google.com"
+
+        async def run_twice():
+            await single_flight.do("url", lookup)
+            await single_flight.do("url", lookup)
+
+        asyncio.run(run_twice())
+        self.assertEqual(2, single_flight.stats()["executed"])
+
+    def test_exception_reaches_every_caller(self):
+        single_flight = SingleFlight()
+
+        async def failing_lookup():
+            await asyncio.sleep(0.01)
+            raise ConnectionError()
+
+        async def run_many():
+            return await asyncio.gather(
+                *(single_flight.do("url", failing_lookup) for _ in range(3)), return_exceptions=True
+            )
+
+        results = asyncio.run(run_many())
+        self.assertTrue(all(isinstance(result, ConnectionError) for result in results))
+
+    def test_cancelled_caller_does_not_cancel_others(self):
+        single_flight = SingleFlight()
+
+        async def lookup():
+            await asyncio.sleep(0.02)
+            return "https://www.google.com"
+
+        async def run():
+            first = asyncio.ensure_future(single_flight.do("url", lookup))
+            second = asyncio.ensure_future(single_flight.do("url", lookup))
+            await asyncio.sleep(0.005)
+            first.cancel()
+            return await second
+
+        self.assertEqual("https://www.google.com", asyncio.run(run()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,236 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from time import time
+from app.service.storage import BATCH_EXISTS, BATCH_WRITTEN, UrlRecord
+from app.service.storage_memory import MemoryBackend
+from app.service.storage_sqlite import SQLiteBackend
+from pynamodb.exceptions import DoesNotExist, PutError
+
+
+class StorageBackendTests:
+    """
+    Behaviour every storage backend must share, run against each backend below.
+    """
+
+    def create_backend(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.backend = self.create_backend()
+
+    def test_put_and_get(self):
+        self.backend.put_if_absent("short", "https://www.google.com")
+        self.assertEqual("https://www.google.com", self.backend.get("short").original_url)
+
+    def test_reads_return_url_records(self):
+        self.backend.put_if_absent("short", "https://www.google.com", expires_at=4102444800)
+
+        url_items = [self.backend.get("short"), *self.backend.scan_page(limit=10)[0], *self.backend.scan()]
+
+        for url_item in url_items:
+            self.assertIsInstance(url_item, UrlRecord)
+            self.assertEqual(("short", "https://www.google.com"), (url_item.short_url, url_item.original_url))
+            self.assertEqual(4102444800, url_item.expires_at.timestamp())
+
+    def test_put_collision(self):
+        self.backend.put_if_absent("short", "https://www.google.com")
+
+        with self.assertRaises(PutError):
+            self.backend.put_if_absent("short", "https://www.google.com")
+
+        # Original item is not overwritten
+        self.assertEqual("https://www.google.com", self.backend.get("short").original_url)
+
+    def test_get_missing(self):
+        with self.assertRaises(DoesNotExist):
+            self.backend.get("nonexistant")
+
+    def test_bad_keys(self):
+        for bad_input in [None, {1}, ["testurl"]]:
+            with self.assertRaises((TypeError, ValueError), msg=bad_input):
+                self.backend.put_if_absent(bad_input, "test.com")
+
+    def test_delete(self):
+        self.backend.put_if_absent("short", "https://www.google.com")
+        self.backend.delete("short")
+
+        with self.assertRaises(DoesNotExist):
+            self.backend.delete("short")
+
+    def test_find_by_original_url_hash(self):
+        self.backend.put_if_absent("plain", "https://www.google.com")
+        self.backend.put_if_absent("hashed", "https://www.google.com", original_url_hash="hash")
+
+        self.assertEqual("hashed", self.backend.find_by_original_url_hash("hash").short_url)
+
+        # Index entry goes away with the item
+        self.backend.delete("hashed")
+        with self.assertRaises(DoesNotExist):
+            self.backend.find_by_original_url_hash("hash")
+
+    def test_put_many(self):
+        self.backend.put_if_absent("taken", "https://www.google.com")
+        outcomes = self.backend.put_many_if_absent([("new", "https://a.com", None), ("taken", "https://b.com", None)])
+
+        self.assertEqual([BATCH_WRITTEN, BATCH_EXISTS], outcomes)
+        self.assertEqual("https://www.google.com", self.backend.get("taken").original_url)
+
+    def test_get_redirect_target(self):
+        expires_at = int(time()) + 60
+        self.backend.put_if_absent("short", "https://www.google.com", expires_at=expires_at)
+        self.backend.put_if_absent("forever", "https://www.google.com")
+
+        self.assertEqual(("https://www.google.com", expires_at), self.backend.get_redirect_target("short"))
+        self.assertEqual(("https://www.google.com", None), self.backend.get_redirect_target("forever"))
+
+        with self.assertRaises(DoesNotExist):
+            self.backend.get_redirect_target("nonexistant")
+
+    def test_expired_url_is_reused(self):
+        self.backend.put_if_absent("live", "https://www.google.com", expires_at=int(time()) + 60)
+        self.backend.put_if_absent("expired", "https://www.google.com", expires_at=int(time()) - 1)
+
+        with self.assertRaises(PutError):
+            self.backend.put_if_absent("live", "https://a.com")
+
+        # Expired item is replaced, even before storage removes it
+        self.backend.put_if_absent("expired", "https://a.com")
+        self.assertEqual(("https://a.com", None), self.backend.get_redirect_target("expired"))
+
+        outcomes = self.backend.put_many_if_absent(
+            [("live", "https://b.com", None), ("expired", "https://b.com", None)]
+        )
+        self.assertEqual([BATCH_EXISTS, BATCH_EXISTS], outcomes)
+
+    def test_scan_pages(self):
+        for i in range(25):
+            self.backend.put_if_absent(f"short{i:02}", "https://www.google.com")
+
+        # Follow pages until the backend reports the end
+        short_urls = []
+        start_key = None
+
+        while True:
+            items, start_key = self.backend.scan_page(limit=10, start_key=start_key)
+            short_urls.extend(item.short_url for item in items)
+
+            if start_key is None:
+                break
+
+        self.assertEqual(sorted(f"short{i:02}" for i in range(25)), sorted(short_urls))
+        self.assertEqual(25, len(list(self.backend.scan())))
+
+    def test_scan_page_segments(self):
+        for i in range(25):
+            self.backend.put_if_absent(f"short{i:02}", "https://www.google.com")
+
+        segments = []
+
+        for segment in range(3):
+            short_urls, start_key = [], None
+
+            while True:
+                items, start_key = self.backend.scan_page(4, start_key, segment=segment, total_segments=3)
+                short_urls.extend(item.short_url for item in items)
+
+                if start_key is None:
+                    break
+
+            segments.append(set(short_urls))
+
+        # Segments are disjoint and cover every item
+        self.assertEqual(25, sum(len(short_urls) for short_urls in segments))
+        self.assertEqual({f"short{i:02}" for i in range(25)}, set().union(*segments))
+
+    def test_malformed_start_key(self):
+        with self.assertRaises(ValueError):
+            self.backend.scan_page(limit=10, start_key={"ShortUrl": "short"})
+
+    def test_purge(self):
+        for i in range(5):
+            self.backend.put_if_absent(f"short{i}", "https://www.google.com")
+
+        self.assertEqual(5, self.backend.purge())
+        self.assertEqual([], list(self.backend.scan()))
+
+    def test_get_redirect_targets(self):
+        self.backend.put_if_absent("first", "https://www.google.com")
+        self.backend.put_if_absent("second", "https://www.bing.com", expires_at=4102444800)
+
+        self.assertEqual(
+            {"first": ("https://www.google.com", None), "second": ("https://www.bing.com", 4102444800)},
+            self.backend.get_redirect_targets(["first", "second", "missing"])
+        )
+
+    def test_increment_counter(self):
+        self.assertEqual(10, self.backend.increment_counter("short_url", 10))
+        self.assertEqual(20, self.backend.increment_counter("short_url", 10))
+
+    def test_click_buckets(self):
+        self.backend.add_clicks("short_url#minute", 60, 2)
+        self.backend.add_clicks("short_url#minute", 60, 3)
+        self.backend.add_clicks("short_url#minute", 0, 1)
+        self.backend.set_clicks("short_url#minute", 120, 7)
+
+        # End is exclusive
+        self.assertEqual([(0, 1), (60, 5)], self.backend.query_clicks("short_url#minute", 0, 120))
+        self.assertEqual([(120, 7)], self.backend.query_clicks("short_url#minute", 61, 3600))
+
+    def test_pending_rollups(self):
+        self.backend.add_pending_rollup("pending#hour#0#rollup", 3600, {"first", "second"})
+        self.backend.add_pending_rollup("pending#hour#0#rollup", 3600, {"third"})
+        self.backend.add_pending_rollup("pending#hour#0#rollup", 7200, {"first"})
+
+        self.assertEqual(
+            [(3600, {"first", "second", "third"})], self.backend.pending_rollups("pending#hour#0#rollup", 7200)
+        )
+
+        # Short urls not removed stay pending
+        self.backend.remove_pending_rollup("pending#hour#0#rollup", 3600, {"first", "second"})
+        self.assertEqual([(3600, {"third"})], self.backend.pending_rollups("pending#hour#0#rollup", 7200))
+
+        self.backend.remove_pending_rollup("pending#hour#0#rollup", 3600, {"third"})
+        self.assertEqual([(7200, {"first"})], self.backend.pending_rollups("pending#hour#0#rollup", 7201))
+
+    def test_top_lists(self):
+        self.backend.put_top("top#hour#rollup", 3600, [["first", 5]])
+        self.backend.put_top("top#hour#rollup", 3600, [["first", 6], ["second", 2]])
+        self.backend.put_top("top#hour#rollup", 3601, [["third", 1]])
+
+        self.assertEqual(
+            [(3600, [["first", 6], ["second", 2]]), (3601, [["third", 1]])],
+            self.backend.query_top("top#hour#rollup", 3600, 3616)
+        )
+
+
+class TestMemoryBackend(StorageBackendTests, unittest.TestCase):
+    def create_backend(self):
+        return MemoryBackend()
+
+
+class TestSQLiteBackend(StorageBackendTests, unittest.TestCase):
+    def create_backend(self):
+        # Fresh database file per test
+        directory = tempfile.mkdtemp()
+        self.addCleanup(lambda: [os.remove(os.path.join(directory, name)) for name in os.listdir(directory)])
+        return SQLiteBackend(path=os.path.join(directory, "urls.db"))
+
+
+class TestDynamoDBBackendStartup(unittest.TestCase):
+    def test_app_imports_with_dynamodb_backend(self):
+        # Fresh interpreter, the backend is created when the app is imported
+        environment = dict(os.environ, STORAGE_BACKEND="dynamodb")
+        repository = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+        result = subprocess.run(
+            [sys.executable, "-c", "import app.main"],
+            cwd=repository, env=environment, capture_output=True, text=True, timeout=60
+        )
+
+        self.assertEqual(0, result.returncode, msg=result.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,206 @@
+import os
+import shutil
+import tempfile
+import unittest
+from time import time
+from unittest.mock import patch
+from botocore.exceptions import ClientError
+from app.service import database
+from app.service.bloom import ShortUrlFilter
+from app.service.hotlinks import HotLinkSnapshot, write_snapshot
+from app.service.streams import ChangeFeedConsumer, check_stream_read_rate
+
+
+def record(event_name, short_url):
+    return {"eventName": event_name, "dynamodb": {"Keys": {"ShortUrl": {"S": short_url}}}}
+
+
+class FakeStreamsClient:
+    """
+    In-memory stand-in for the DynamoDB Streams API, one list of records per shard.
+    Iterators are "<shard id>:<position>".
+    """
+
+    def __init__(self):
+        self.shards = {}
+        self.closed = set()
+        self.parents = {}
+        self.errors = []
+
+    def describe_stream(self, StreamArn, ExclusiveStartShardId=None):
+        shards = []
+
+        for shard_id in self.shards:
+            sequence_range = {"StartingSequenceNumber": "0"}
+            if shard_id in self.closed:
+                sequence_range["EndingSequenceNumber"] = str(len(self.shards[shard_id]))
+
+            shard = {"ShardId": shard_id, "SequenceNumberRange": sequence_range}
+            if shard_id in self.parents:
+                shard["ParentShardId"] = self.parents[shard_id]
+
+            shards.append(shard)
+
+        return {"StreamDescription": {"Shards": shards}}
+
+    def get_shard_iterator(self, StreamArn, ShardId, ShardIteratorType):
+        position = len(self.shards[ShardId]) if ShardIteratorType == "LATEST" else 0
+        return {"ShardIterator": f"{ShardId}:{position}"}
+
+    def get_records(self, ShardIterator, Limit):
+        if self.errors:
+            raise ClientError({"Error": {"Code": self.errors.pop(0)}}, "GetRecords")
+
+        shard_id, position = ShardIterator.rsplit(":", 1)
+        records = self.shards[shard_id][int(position):int(position) + Limit]
+        next_position = int(position) + len(records)
+
+        result = {"Records": records}
+        if shard_id not in self.closed or next_position < len(self.shards[shard_id]):
+            result["NextShardIterator"] = f"{shard_id}:{next_position}"
+
+        return result
+
+
+class TestChangeFeedConsumer(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeStreamsClient()
+        self.client.shards["shard-1"] = [record("INSERT", "before_start")]
+        self.stream_arn = "arn:stream/1"
+        self.changes = []
+        self.gaps = 0
+
+        def on_gap():
+            self.gaps += 1
+
+        self.consumer = ChangeFeedConsumer(
+            streams_client=self.client,
+            describe_table=lambda: {"LatestStreamArn": self.stream_arn},
+            key_name="ShortUrl",
+            on_change=self.changes.extend,
+            on_gap=on_gap,
+            shard_refresh_seconds=3600
+        )
+
+    def test_changes_after_start(self):
+        self.assertEqual(0, self.consumer.poll())
+
+        self.client.shards["shard-1"] += [record("MODIFY", "first"), record("REMOVE", "second")]
+        self.assertEqual(2, self.consumer.poll())
+        self.assertEqual([("MODIFY", "first"), ("REMOVE", "second")], self.changes)
+
+        # Records are not passed on twice
+        self.assertEqual(0, self.consumer.poll())
+
+    def test_child_shard_read_from_oldest_record(self):
+        self.consumer.poll()
+
+        # Shard splits, the child gets records before the consumer finds it
+        self.client.shards["shard-1"].append(record("REMOVE", "first"))
+        self.client.closed.add("shard-1")
+        self.client.shards["shard-2"] = [record("REMOVE", "second")]
+        self.client.parents["shard-2"] = "shard-1"
+
+        self.consumer.poll()
+        self.consumer.poll()
+
+        self.assertEqual([("REMOVE", "first"), ("REMOVE", "second")], self.changes)
+        self.assertEqual(1, self.consumer.stats()["shards"])
+
+    def test_expired_iterator_is_a_gap(self):
+        self.consumer.poll()
+        self.client.errors.append("ExpiredIteratorException")
+
+        self.consumer.poll()
+        self.assertEqual(1, self.gaps)
+
+        # Reading continues from the latest record
+        self.client.shards["shard-1"].append(record("MODIFY", "first"))
+        self.consumer.poll()
+        self.assertEqual([("MODIFY", "first")], self.changes)
+
+    def test_new_stream_is_a_gap(self):
+        self.consumer.poll()
+
+        # Table recreated, the new stream is read from its oldest record
+        self.client.errors.append("ResourceNotFoundException")
+        self.consumer.poll()
+        self.stream_arn = "arn:stream/2"
+        self.client.shards = {"shard-3": [record("INSERT", "first")]}
+
+        self.consumer.poll()
+        self.assertEqual(1, self.gaps)
+        self.assertEqual([("INSERT", "first")], self.changes)
+
+    def test_other_errors_are_raised(self):
+        self.consumer.poll()
+        self.client.errors.append("LimitExceededException")
+
+        with self.assertRaises(ClientError):
+            self.consumer.poll()
+
+        # Position is kept for the next poll
+        self.client.shards["shard-1"].append(record("MODIFY", "first"))
+        self.consumer.poll()
+        self.assertEqual([("MODIFY", "first")], self.changes)
+
+
+class TestStreamReadRate(unittest.TestCase):
+    def test_within_budget(self):
+        check_stream_read_rate(readers=5, poll_interval=1, shard_reads_per_second=5)
+        check_stream_read_rate(readers=40, poll_interval=10, shard_reads_per_second=5)
+
+    def test_over_budget_is_refused(self):
+        for readers, poll_interval in [(6, 1), (1, 0)]:
+            with self.assertRaises(ValueError):
+                check_stream_read_rate(readers=readers, poll_interval=poll_interval, shard_reads_per_second=5)
+
+
+class TestApplyUrlChanges(unittest.TestCase):
+    def setUp(self):
+        database.url_cache.clear()
+
+    def test_invalidation(self):
+        database.url_cache.set("changed", ("https://www.google.com", None))
+        database.url_cache.set_missing("added")
+
+        database.apply_url_changes([("MODIFY", "changed"), ("INSERT", "added")])
+
+        self.assertIsNone(database.url_cache.get("changed"))
+        self.assertIsNone(database.url_cache.get("added"))
+
+    def test_added_urls_reach_short_url_filter(self):
+        short_url_filter = ShortUrlFilter(false_positive_rate=0.01, max_bytes=1024, min_capacity=100)
+        short_url_filter.rebuild([])
+
+        with patch.object(database, "short_url_filter", short_url_filter):
+            database.apply_url_changes([("INSERT", "added_elsewhere")])
+
+        self.assertTrue(short_url_filter.might_contain("added_elsewhere"))
+
+    def test_gap_drops_every_cache(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "hot_links.snapshot")
+
+        write_snapshot(path, [("hot", "https://www.google.com", None)], created_at=time() - 10)
+        hot_link_snapshot = HotLinkSnapshot(path)
+        hot_link_snapshot.refresh()
+
+        short_url_filter = ShortUrlFilter(false_positive_rate=0.01, max_bytes=1024, min_capacity=100)
+        short_url_filter.rebuild(["hot"])
+        database.url_cache.set("cached", ("https://www.bing.com", None))
+
+        with patch.object(database, "hot_link_snapshot", hot_link_snapshot):
+            with patch.object(database, "short_url_filter", short_url_filter):
+                database.drop_cached_urls()
+
+        self.assertIsNone(database.url_cache.get("cached"))
+        # Url may have been deleted or changed elsewhere
+        self.assertIsNone(hot_link_snapshot.lookup("hot"))
+        # Url may have been added elsewhere
+        self.assertTrue(short_url_filter.might_contain("added_elsewhere"))
+
+
+if __name__ == '__main__':
+    unittest.main()
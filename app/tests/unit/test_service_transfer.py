@@ -0,0 +1,172 @@
+import json
+import os
+import tempfile
+import unittest
+from time import time
+from unittest.mock import patch
+from app.service import database, transfer
+from app.service.metrics import InstrumentedStorage
+from app.service.storage_memory import MemoryBackend
+from app.service.transfer import CapacityBudget, export_urls, import_urls
+from pynamodb.exceptions import PynamoDBConnectionError
+
+
+class TransferTests(unittest.TestCase):
+    def setUp(self):
+        self.backend = InstrumentedStorage(MemoryBackend())
+
+        for module in (database, transfer):
+            patcher = patch.object(module, "storage", self.backend)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        database.url_cache.clear()
+
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(lambda: [os.remove(self.path(name)) for name in os.listdir(self.directory)])
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def add_urls(self, count):
+        for index in range(count):
+            self.backend.put_if_absent(f"short{index:03}", f"https://www.google.com/{index}")
+
+
+class TestExport(TransferTests):
+    def test_export_ndjson(self):
+        self.add_urls(50)
+        self.backend.put_if_absent("expired", "https://www.google.com", expires_at=int(time()) - 1)
+
+        counts = export_urls(self.path("urls.ndjson"), checkpoint_path=self.path("checkpoint"), total_segments=3,
+                             page_size=7)
+
+        with open(self.path("urls.ndjson")) as export_file:
+            rows = [json.loads(line) for line in export_file]
+
+        self.assertEqual({"exported": 50, "expired": 1}, counts)
+        self.assertEqual({f"short{index:03}" for index in range(50)}, {row["short_url"] for row in rows})
+        self.assertFalse(os.path.exists(self.path("checkpoint")))
+
+    def test_export_csv(self):
+        self.backend.put_if_absent("short", "https://www.google.com/?a=1,2", expires_at=int(time()) + 60)
+        export_urls(self.path("urls.csv"), total_segments=2)
+
+        with open(self.path("urls.csv")) as export_file:
+            lines = export_file.read().splitlines()
+
+        self.assertEqual("short_url,original_url,expires_at", lines[0])
+        self.assertTrue(lines[1].startswith('short,"https://www.google.com/?a=1,2",'))
+
+    def test_resume_export(self):
+        self.add_urls(50)
+        scan_page = self.backend.scan_page
+        calls = []
+
+        def failing_scan_page(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 4:
+                raise PynamoDBConnectionError("Scan failed")
+            return scan_page(*args, **kwargs)
+
+        with patch.object(self.backend, "scan_page", failing_scan_page):
+            with self.assertRaises(PynamoDBConnectionError):
+                export_urls(self.path("urls.ndjson"), checkpoint_path=self.path("checkpoint"), total_segments=2,
+                            page_size=5, checkpoint_interval=0)
+
+        self.assertTrue(os.path.exists(self.path("checkpoint")))
+
+        counts = export_urls(self.path("urls.ndjson"), checkpoint_path=self.path("checkpoint"), total_segments=2,
+                             page_size=5)
+
+        with open(self.path("urls.ndjson")) as export_file:
+            short_urls = [json.loads(line)["short_url"] for line in export_file]
+
+        # Every url exactly once, pages written before the failure are not repeated
+        self.assertEqual(50, counts["exported"])
+        self.assertEqual(sorted(f"short{index:03}" for index in range(50)), sorted(short_urls))
+
+    def test_checkpoint_of_other_job(self):
+        export_urls(self.path("urls.ndjson"), checkpoint_path=self.path("checkpoint"))
+
+        with open(self.path("checkpoint"), "w") as checkpoint_file:
+            json.dump({"job": "import"}, checkpoint_file)
+
+        with self.assertRaises(ValueError):
+            export_urls(self.path("urls.ndjson"), checkpoint_path=self.path("checkpoint"))
+
+
+class TestImport(TransferTests):
+    def write_rows(self, name, rows):
+        with open(self.path(name), "w") as import_file:
+            for row in rows:
+                import_file.write((row if isinstance(row, str) else json.dumps(row)) + "\n")
+
+    def test_round_trip(self):
+        self.add_urls(30)
+        export_urls(self.path("urls.csv"))
+
+        self.backend.purge()
+        counts = import_urls(self.path("urls.csv"), workers=3, chunk_size=4)
+
+        self.assertEqual({"imported": 30, "exists": 0, "rejected": 0}, counts)
+        self.assertEqual("https://www.google.com/7", self.backend.get("short007").original_url)
+
+    def test_rejected_rows(self):
+        self.backend.put_if_absent("taken", "https://www.google.com")
+        self.write_rows("urls.ndjson", [
+            {"original_url": "https://www.random.com"},
+            {"short_url": "taken", "original_url": "https://www.bing.com"},
+            {"short_url": "no_original_url"},
+            "not json"
+        ])
+
+        counts = import_urls(self.path("urls.ndjson"), rejects_path=self.path("rejects.ndjson"), chunk_size=2)
+
+        with open(self.path("rejects.ndjson")) as rejects_file:
+            rejects = [json.loads(line) for line in rejects_file]
+
+        self.assertEqual({"imported": 1, "exists": 1, "rejected": 2}, counts)
+        self.assertEqual([400, 400, 409], sorted(reject["status_code"] for reject in rejects))
+        self.assertEqual("https://www.google.com", self.backend.get("taken").original_url)
+
+    def test_resume_import(self):
+        self.write_rows("urls.ndjson", [
+            {"short_url": f"short{index}", "original_url": f"https://www.google.com/{index}"} for index in range(6)
+        ])
+
+        # Checkpoint of an import interrupted after the first and third chunk were written
+        transfer.save_checkpoint(self.path("checkpoint"), {
+            "job": "import", "source": os.path.abspath(self.path("urls.ndjson")), "format": "ndjson",
+            "chunk_size": 2, "next_chunk": 1, "done_chunks": [2], "rejects_offset": 0,
+            "counts": {"imported": 4, "exists": 0, "rejected": 0}
+        })
+
+        counts = import_urls(self.path("urls.ndjson"), checkpoint_path=self.path("checkpoint"), chunk_size=2)
+
+        self.assertEqual({"imported": 6, "exists": 0, "rejected": 0}, counts)
+        self.assertEqual(["short2", "short3"], sorted(item.short_url for item in self.backend.scan()))
+        self.assertFalse(os.path.exists(self.path("checkpoint")))
+
+
+class TestCapacityBudget(unittest.TestCase):
+    def test_unlimited(self):
+        with patch.object(transfer, "sleep") as sleep:
+            CapacityBudget(0).acquire(1000)
+
+        sleep.assert_not_called()
+
+    def test_debt_is_slept_off(self):
+        budget = CapacityBudget(100)
+
+        with patch.object(transfer, "sleep") as sleep:
+            budget.acquire(100)
+            sleep.assert_not_called()
+
+            budget.acquire(50)
+
+        self.assertAlmostEqual(0.5, sleep.call_args.args[0], delta=0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
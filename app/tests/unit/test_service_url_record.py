@@ -0,0 +1,60 @@
+import unittest
+from unittest.mock import patch
+from app.benchmarks.decode_items import project, raw_items, run
+from app.models.pynamo_models import Thread
+from app.service import database
+from app.service.metrics import InstrumentedStorage
+from app.service.storage import UrlRecord
+from app.service.storage_memory import MemoryBackend
+from app.service.storage_dynamodb import URL_RECORD_ATTRIBUTES, url_record
+
+
+class TestUrlRecord(unittest.TestCase):
+    def test_matches_model(self):
+        items = raw_items(4)
+
+        for item, projected_item in zip(items, project(items, URL_RECORD_ATTRIBUTES)):
+            model = Thread.from_raw_data(item)
+            record = url_record(projected_item)
+
+            self.assertEqual(model.short_url, record.short_url)
+            self.assertEqual(model.original_url, record.original_url)
+            self.assertEqual(model.expires_at, record.expires_at)
+
+        # Half of the items never expire
+        self.assertIsNone(url_record(items[-1]).expires_at)
+        self.assertEqual(1900000000, url_record(items[0]).expires_at.timestamp())
+
+    def test_projection(self):
+        projected_item = project(raw_items(1), URL_RECORD_ATTRIBUTES)[0]
+        self.assertNotIn("OriginalUrlHash", projected_item)
+
+        # Records only hold the decoded fields
+        with self.assertRaises(AttributeError):
+            url_record(projected_item).original_url_hash = "hash"
+
+    def test_benchmark_report(self):
+        report = run(item_count=100, repeat=1)
+        self.assertEqual({"model", "record"}, set(report["microseconds_per_item"]))
+
+
+@patch.object(database, "storage", InstrumentedStorage(MemoryBackend()))
+class TestGetOneUrlRecords(unittest.TestCase):
+    def test_cache_hit_returns_url_record(self):
+        database.url_cache.clear()
+        database.storage.put_if_absent("record_url", "https://www.google.com", expires_at=4102444800)
+
+        from_storage = database.get_one_url("record_url")["payload"]
+
+        with patch.object(database.storage, "get", side_effect=AssertionError("DB was queried")):
+            from_cache = database.get_one_url("record_url")["payload"]
+
+        # Payload type does not depend on where the url was found
+        for url_item in (from_storage, from_cache):
+            self.assertIsInstance(url_item, UrlRecord)
+            self.assertEqual("https://www.google.com", url_item.original_url)
+            self.assertEqual(4102444800, url_item.expires_at.timestamp())
+
+
+if __name__ == '__main__':
+    unittest.main()